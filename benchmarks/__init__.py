@@ -0,0 +1,12 @@
+"""Benchmark suite of python-hl7.
+
+Run the suite and write the results as JSON, then compare two runs::
+
+    python -m benchmarks.run -o before.json
+    python -m benchmarks.run -o after.json
+    python -m benchmarks.compare before.json after.json
+
+``python -m benchmarks.memory`` measures the memory held by parsed messages
+and ``python -m benchmarks.import_time`` checks the import time against a
+budget.
+"""
@@ -0,0 +1,79 @@
+"""Compare two result files of ``python -m benchmarks.run``.
+
+Prints the median time per message of each benchmark in both runs (or the
+median of another unit, such as the bytes per input byte of
+``python -m benchmarks.memory``) and the ratio between them. Exits with
+status 1 if a benchmark is slower, or larger, by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold=0.1):
+    """Return ``(name, baseline, current, ratio)`` rows for the benchmarks of
+    both results, and the names of the ones slower than `threshold` (``0.1``
+    is 10% slower).
+    """
+    rows = []
+    regressions = []
+    before = baseline["benchmarks"]
+    after = current["benchmarks"]
+    for name in before:
+        if name not in after:
+            continue
+        old, new = before[name]["median"], after[name]["median"]
+        ratio = new / old if old else float("inf")
+        rows.append((name, old, new, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _format(value, unit):
+    if unit.startswith("s/"):
+        return "{0:>9.2f} us".format(value * 1e6)
+    return "{0:>12.2f}".format(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare", description=__doc__
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown reported as a regression (default 0.1)",
+    )
+    options = parser.parse_args(argv)
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    with open(options.current) as f:
+        current = json.load(f)
+    rows, regressions = compare(baseline, current, options.threshold)
+
+    print("{0:<24} {1:>12} {2:>12}".format("benchmark", "baseline", "current"))
+    for name, old, new, ratio in rows:
+        if name in regressions:
+            note = "slower"
+        elif ratio < 1 - options.threshold:
+            note = "faster"
+        else:
+            note = ""
+        unit = current["benchmarks"][name].get("unit", "s/message")
+        print(
+            "{0:<24} {1} {2} {3:>7.2f}x {4}".format(
+                name, _format(old, unit), _format(new, unit), ratio, note
+            ).rstrip()
+        )
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Measure how long importing python-hl7 takes, against a budget.
+
+Each scenario runs in `repeat` fresh interpreters, which time the import
+statements with :py:func:`time.perf_counter`. Short-lived processes, such as
+command line tools and serverless handlers, pay this cost on every run. The
+command exits with status 1 if the median of a scenario is over its budget.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+import hl7
+
+#: Statements timed by each scenario
+SCENARIOS = {
+    "hl7": "import hl7",
+    "parse": "import hl7; hl7.parse",
+    "client": "import hl7.client",
+    "mllp": "import hl7.mllp; hl7.mllp.HL7StreamReader",
+}
+
+#: Default budgets in milliseconds, generous enough for slow CI machines
+BUDGETS = {"hl7": 5, "parse": 60, "client": 100, "mllp": 200}
+
+_TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{0}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def time_import(statement):
+    """Return the seconds `statement` takes in a fresh interpreter"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(hl7.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    # -X frozen_modules and the bytecode cache are left to their defaults, as
+    # in production
+    output = subprocess.check_output(
+        [sys.executable, "-c", _TIMER.format(statement)], env=env
+    )
+    return float(output)
+
+
+def run(names=None, repeat=5, budgets=BUDGETS):
+    """Time the scenarios `names` (default all) and return the results as a
+    JSON serializable dict. Each result has ``over_budget`` set if its median
+    exceeds its budget in `budgets`.
+    """
+    results = {}
+    for name in names or SCENARIOS:
+        time_import(SCENARIOS[name])  # write the bytecode cache
+        samples = [time_import(SCENARIOS[name]) for _ in range(repeat)]
+        median = statistics.median(samples)
+        budget = budgets.get(name)
+        results[name] = {
+            "unit": "s/import",
+            "min": min(samples),
+            "median": median,
+            "samples": samples,
+            "budget": budget / 1000 if budget is not None else None,
+            "over_budget": budget is not None and median * 1000 > budget,
+        }
+    return {
+        "metadata": {
+            "hl7": hl7.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "repeat": repeat,
+        },
+        "benchmarks": results,
+    }
+
+
+def _budget(value):
+    name, _, milliseconds = value.partition("=")
+    if name not in SCENARIOS or not milliseconds:
+        raise argparse.ArgumentTypeError("expected SCENARIO=MILLISECONDS")
+    return name, float(milliseconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_time", description=__doc__
+    )
+    parser.add_argument("-o", "--output", help="write the JSON results to OUTPUT")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario")
+    parser.add_argument(
+        "--budget",
+        type=_budget,
+        action="append",
+        default=[],
+        metavar="SCENARIO=MS",
+        help="override the budget of a scenario, in milliseconds",
+    )
+    options = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS)
+    budgets.update(options.budget)
+    results = run(repeat=options.repeat, budgets=budgets)
+    over = []
+    for name, result in results["benchmarks"].items():
+        sys.stderr.write(
+            "{0:<8} {1:>8.2f} ms (budget {2:g} ms){3}\n".format(
+                name,
+                result["median"] * 1000,
+                budgets[name],
+                " OVER BUDGET" if result["over_budget"] else "",
+            )
+        )
+        if result["over_budget"]:
+            over.append(name)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Measure the memory held by parsed messages and write the results as JSON.
+
+Each workload is parsed with :py:mod:`tracemalloc` tracing the allocations.
+The results are the bytes still allocated once the workload is parsed
+(``retained``) and the highest allocation while parsing (``peak``), per byte
+of input, along with the :py:func:`hl7.sizeof` breakdown by level, if available. The
+``median`` of each result is the retained bytes per input byte, so runs can
+be compared with ``python -m benchmarks.compare``. Workloads parsed with APIs
+missing from the python-hl7 being measured are skipped.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+
+import hl7
+
+from .workloads import Generator
+
+
+def workloads(count=1000, seed=0):
+    """Return the workloads by name, each a ``(parse function, texts)`` pair.
+    The parse function is ``None`` if it is missing from :py:mod:`hl7`.
+    """
+    generator = Generator(seed)
+    messages = generator.messages(count)
+    large = range(max(1, count // 100))
+    return {
+        "messages": (hl7.parse, messages),
+        "oru_500": (hl7.parse, [generator.oru(observations=500) for _ in large]),
+        "adt_repeating": (
+            hl7.parse,
+            [generator.adt(identifiers=50, next_of_kin=50) for _ in large],
+        ),
+        "attachments": (
+            hl7.parse,
+            [
+                generator.oru(observations=5, attachments=2, attachment_size=64 * 1024)
+                for _ in large
+            ],
+        ),
+        "file": (
+            hl7.parse_file,
+            [generator.file(len(large), 100, "ORU", observations=20)],
+        ),
+        "raw_messages": (getattr(hl7, "parse_raw", None), messages),
+    }
+
+
+def measure(parse, texts):
+    """Parse `texts` while tracing allocations and return the result dict"""
+    input_bytes = sum(len(text.encode("utf-8")) for text in texts)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        parsed = [parse(text) for text in texts]
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retained = current - before
+    result = {
+        "unit": "B/input byte",
+        "median": retained / input_bytes,
+        "peak": (peak - before) / input_bytes,
+        "input_bytes": input_bytes,
+        "retained_bytes": retained,
+    }
+    if hasattr(hl7, "sizeof"):
+        result["sizeof"] = hl7.sizeof(parsed).as_dict()
+    return result
+
+
+def run(count=1000, seed=0, progress=None):
+    """Measure all the workloads and return the results as a JSON
+    serializable dict
+    """
+    results = {}
+    skipped = {}
+    for name, (parse, texts) in workloads(count, seed).items():
+        if parse is None:
+            skipped[name] = "missing parse function"
+            if progress is not None:
+                progress(name, {"skipped": skipped[name]})
+            continue
+        results[name] = measure(parse, texts)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        "metadata": {
+            "hl7": hl7.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "count": count,
+            "seed": seed,
+        },
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory", description=__doc__
+    )
+    parser.add_argument("-o", "--output", help="write the JSON results to OUTPUT")
+    parser.add_argument("--count", type=int, default=1000, help="messages per run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    options = parser.parse_args(argv)
+
+    def progress(name, result):
+        if "skipped" in result:
+            sys.stderr.write("{0:<16} skipped, {1}\n".format(name, result["skipped"]))
+            return
+        sys.stderr.write(
+            "{0:<16} {1:>8.1f} B/input byte retained {2:>8.1f} peak\n".format(
+                name, result["median"], result["peak"]
+            )
+        )
+
+    results = run(options.count, options.seed, progress)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
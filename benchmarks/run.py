@@ -0,0 +1,386 @@
+"""Run the python-hl7 benchmarks and write the results as JSON.
+
+Each benchmark processes a workload of synthetic messages from
+:py:mod:`benchmarks.workloads` and is timed `repeat` times after a warm up
+run. Times are reported in seconds per message. Benchmarks of APIs missing
+from the python-hl7 being measured, e.g. an earlier release, are skipped.
+"""
+
+import argparse
+import asyncio
+import datetime
+import importlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import hl7
+from hl7.client import read_stream
+from hl7.mllp import open_hl7_connection, start_hl7_server
+
+from .workloads import MESSAGE_TYPES, Generator, unique_timestamps
+
+#: Benchmark setup functions by name, see :py:func:`benchmark`
+BENCHMARKS = {}
+#: The APIs needed by the benchmarks, by name
+REQUIRES = {}
+
+_TEXT = "Result: 5.1 mmol/L | see note ^ABC & DEF ~ repeat \\ escaped"
+
+
+def benchmark(name, requires=()):
+    """Register a setup function, which takes a :py:class:`Workload` and
+    returns the function to time, or a ``(function, number of messages)``
+    pair if it does not process :py:attr:`Workload.messages`.
+
+    `requires` are the dotted names of the APIs used by the benchmark that
+    earlier releases of python-hl7 lack, e.g. ``"hl7.parse_raw"``.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = setup
+        REQUIRES[name] = requires
+        return setup
+
+    return register
+
+
+def _available(dotted):
+    """Whether the module or attribute named `dotted` exists"""
+    parts = dotted.split(".")
+    for i in range(len(parts), 0, -1):
+        try:
+            obj = importlib.import_module(".".join(parts[:i]))
+        except ImportError:
+            continue
+        for part in parts[i:]:
+            if not hasattr(obj, part):
+                return False
+            obj = getattr(obj, part)
+        return True
+    return False
+
+
+def missing(name):
+    """The APIs needed by the benchmark `name` that are missing"""
+    return [dotted for dotted in REQUIRES[name] if not _available(dotted)]
+
+
+class Workload:
+    """The messages shared by the benchmarks, in the forms they need"""
+
+    def __init__(self, count, seed, types=MESSAGE_TYPES):
+        generator = Generator(seed)
+        self.messages = generator.messages(count, types)
+        self.parsed = [hl7.parse(m) for m in self.messages]
+        self.dates = [str(p["MSH.7"]) for p in self.parsed]
+        self.batch = "BHS|^~\\&|BENCH\r" + "".join(self.messages) + "BTS|%d\r" % count
+        self.file = "FHS|^~\\&|BENCH\r" + self.batch + "FTS|1\r"
+        self.stream = b"".join(
+            b"\x0b" + m.encode() + b"\x1c\x0d" for m in self.messages
+        )
+        self.escaped = [p.escape(_TEXT) for p in self.parsed]
+        # fewer, production sized messages to show how the parser scales
+        large = range(max(1, count // 100))
+        self.oru = [generator.oru(observations=500) for _ in large]
+        self.adt = [generator.adt(identifiers=50, next_of_kin=50) for _ in large]
+        self.attachments = [
+            generator.oru(observations=5, attachments=2, attachment_size=64 * 1024)
+            for _ in large
+        ]
+        self.corpus_file = Generator(seed, separators="#$*!@").file(
+            len(large), 100, "ORU", observations=20
+        )
+
+    def __len__(self):
+        return len(self.messages)
+
+
+@benchmark("parse")
+def _parse(workload):
+    messages = workload.messages
+    return lambda: [hl7.parse(m) for m in messages]
+
+
+@benchmark("parse_batch")
+def _parse_batch(workload):
+    return lambda: hl7.parse_batch(workload.batch)
+
+
+@benchmark("parse_file")
+def _parse_file(workload):
+    return lambda: hl7.parse_file(workload.file)
+
+
+@benchmark("parse_oru_500")
+def _parse_oru(workload):
+    messages = workload.oru
+    return lambda: [hl7.parse(m) for m in messages], len(messages)
+
+
+@benchmark("parse_adt_repeating")
+def _parse_adt(workload):
+    messages = workload.adt
+    return lambda: [hl7.parse(m) for m in messages], len(messages)
+
+
+@benchmark("parse_attachments")
+def _parse_attachments(workload):
+    messages = workload.attachments
+    return lambda: [hl7.parse(m) for m in messages], len(messages)
+
+
+@benchmark("parse_corpus_file")
+def _parse_corpus_file(workload):
+    text = workload.corpus_file
+    return lambda: hl7.parse_file(text), max(1, len(workload) // 100) * 100
+
+
+@benchmark("parse_raw", requires=("hl7.parse_raw",))
+def _parse_raw(workload):
+    messages = workload.messages
+    return lambda: [hl7.parse_raw(m) for m in messages]
+
+
+@benchmark("parse_raw_oru_500", requires=("hl7.parse_raw",))
+def _parse_raw_oru(workload):
+    messages = workload.oru
+    return lambda: [hl7.parse_raw(m) for m in messages], len(messages)
+
+
+@benchmark("serialize")
+def _serialize(workload):
+    parsed = workload.parsed
+    return lambda: [str(p) for p in parsed]
+
+
+@benchmark("extract_field")
+def _extract_field(workload):
+    parsed = workload.parsed
+
+    def run():
+        for p in parsed:
+            p.extract_field("PID", 1, 3, 1, 1)
+            p.extract_field("PID", 1, 5, 1, 2)
+
+    return run
+
+
+@benchmark("getitem")
+def _getitem(workload):
+    parsed = workload.parsed
+
+    def run():
+        for p in parsed:
+            p["PID.3"]
+            p["PID.5.1.2"]
+
+    return run
+
+
+@benchmark("escape")
+def _escape(workload):
+    parsed = workload.parsed
+    return lambda: [p.escape(_TEXT) for p in parsed]
+
+
+@benchmark("unescape")
+def _unescape(workload):
+    pairs = list(zip(workload.parsed, workload.escaped))
+    return lambda: [p.unescape(e) for p, e in pairs]
+
+
+@benchmark("parse_datetime")
+def _parse_datetime(workload):
+    # Cycling through more distinct timestamps than parse_datetime caches
+    # (4096), so each one is parsed again
+    timestamps = itertools.cycle(unique_timestamps(len(workload) + 4096))
+    count = len(workload)
+
+    def run():
+        for d in itertools.islice(timestamps, count):
+            hl7.parse_datetime(d)
+
+    return run
+
+
+@benchmark("parse_datetime_cached")
+def _parse_datetime_repeated(workload):
+    dates = workload.dates
+    return lambda: [hl7.parse_datetime(d) for d in dates]
+
+
+@benchmark("create_ack")
+def _create_ack(workload):
+    parsed = workload.parsed
+    return lambda: [p.create_ack() for p in parsed]
+
+
+@benchmark("read_stream")
+def _read_stream(workload):
+    stream = workload.stream
+    return lambda: list(read_stream(io.BytesIO(stream)))
+
+
+async def _loopback(messages, batched=False):
+    async def handle(reader, writer):
+        try:
+            while True:
+                message = await reader.readmessage()
+                writer.writemessage(message.create_ack())
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    # The generated messages are not all ASCII
+    server = await start_hl7_server(handle, "127.0.0.1", 0, encoding="utf-8")
+    async with server:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await open_hl7_connection("127.0.0.1", port, encoding="utf-8")
+
+        async def send():
+            if batched:
+                await writer.sendmessages(messages)
+                return
+            for message in messages:
+                writer.writemessage(message)
+                await writer.drain()
+
+        async def receive():
+            for _ in messages:
+                await reader.readmessage()
+
+        await asyncio.gather(send(), receive())
+        writer.close()
+        await writer.wait_closed()
+
+
+@benchmark("mllp_loopback")
+def _mllp_loopback(workload):
+    parsed = workload.parsed
+    return lambda: asyncio.run(_loopback(parsed))
+
+
+@benchmark("mllp_loopback_batched", requires=("hl7.mllp.HL7StreamWriter.sendmessages",))
+def _mllp_loopback_batched(workload):
+    parsed = workload.parsed
+    return lambda: asyncio.run(_loopback(parsed, batched=True))
+
+
+def _time(func, repeat):
+    func()  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(names=None, count=1000, seed=0, repeat=5, progress=None):
+    """Run the benchmarks `names` (default all) and return the results as a
+    JSON serializable dict. The benchmarks skipped because of missing APIs
+    are listed under ``"skipped"``, with the reason.
+    """
+    workload = Workload(count, seed)
+    results = {}
+    skipped = {}
+    for name in names or BENCHMARKS:
+        unavailable = missing(name)
+        if unavailable:
+            skipped[name] = "missing " + ", ".join(unavailable)
+            if progress is not None:
+                progress(name, {"skipped": skipped[name]})
+            continue
+        func = BENCHMARKS[name](workload)
+        number = len(workload)
+        if isinstance(func, tuple):
+            func, number = func
+        samples = [s / number for s in _time(func, repeat)]
+        results[name] = {
+            "unit": "s/message",
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "samples": samples,
+        }
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        "metadata": {
+            "hl7": hl7.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "count": count,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+
+
+def _names(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    for name in names:
+        if name not in BENCHMARKS:
+            raise argparse.ArgumentTypeError("unknown benchmark {0}".format(name))
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__
+    )
+    parser.add_argument("-o", "--output", help="write the JSON results to OUTPUT")
+    parser.add_argument(
+        "-b",
+        "--benchmarks",
+        type=_names,
+        default=None,
+        help="comma separated benchmarks to run (default: all)",
+    )
+    parser.add_argument("--count", type=int, default=1000, help="messages per run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs")
+    parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks and exit"
+    )
+    options = parser.parse_args(argv)
+
+    if options.list:
+        print("\n".join(BENCHMARKS))
+        return
+
+    def progress(name, result):
+        if "skipped" in result:
+            sys.stderr.write("{0:<24} skipped, {1}\n".format(name, result["skipped"]))
+            return
+        sys.stderr.write(
+            "{0:<24} {1:>10.2f} us/message (+- {2:.2f})\n".format(
+                name, result["median"] * 1e6, result["stdev"] * 1e6
+            )
+        )
+
+    results = run(
+        options.benchmarks, options.count, options.seed, options.repeat, progress
+    )
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
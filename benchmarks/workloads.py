@@ -0,0 +1,265 @@
+"""Synthetic messages for the benchmarks.
+
+The messages are generated here rather than with :py:mod:`hl7.bench` or
+:py:mod:`hl7.testing`, without using the library at all, so the same
+workloads can be run against earlier releases of python-hl7. The same seed
+always generates the same messages.
+"""
+
+import base64
+import datetime
+import random
+
+MESSAGE_TYPES = ("ADT", "ORU", "ORM")
+
+_FAMILY_NAMES = ("SMITH", "JOHNSON", "O'BRIEN", "GARCIA", "NGUYEN", "MÜLLER")
+_GIVEN_NAMES = ("JAMES", "MARY", "ROBERT", "ZOË", "WEI", "AMARA", "JOSÉ")
+_RELATIONSHIPS = (("SPO", "Spouse"), ("CHD", "Child"), ("PAR", "Parent"))
+_AUTHORITIES = ("HOSP", "CLINIC", "SSA", "LAB", "HIE")
+# (code, name, units, low, high)
+_OBSERVATIONS = (
+    ("2345-7", "GLUCOSE", "mg/dL", 70, 105),
+    ("2951-2", "SODIUM", "mmol/L", 135, 145),
+    ("2823-3", "POTASSIUM", "mmol/L", 3.5, 5.1),
+    ("718-7", "HEMOGLOBIN", "g/dL", 12, 17),
+)
+_NOTES = (
+    "Specimen slightly hemolyzed | results may be affected",
+    "Repeat in 2~3 days & compare with baseline",
+    "Ratio A^B within range \\ no action",
+)
+
+
+class Generator:
+    """Generator of ADT, ORU and ORM messages, batches and files, as strings.
+
+    `separators` are the field separator followed by the component,
+    repetition, escape and sub-component characters (MSH-1 and MSH-2).
+    """
+
+    def __init__(self, seed=0, separators="|^~\\&"):
+        self.random = random.Random(seed)
+        self.separators = separators
+        self.field, self.component, self.repetition, self.esc, self.subcomponent = (
+            separators
+        )
+        self._control_id = 0
+
+    def _escape(self, text):
+        esc = self.esc
+        replacements = {
+            esc: esc + "E" + esc,
+            self.field: esc + "F" + esc,
+            self.component: esc + "S" + esc,
+            self.subcomponent: esc + "T" + esc,
+            self.repetition: esc + "R" + esc,
+        }
+        return "".join(replacements.get(c, c) for c in text)
+
+    def _segment(self, name, *fields):
+        """Render a segment from `fields`, each a string, or a list of
+        repetitions that are strings or lists of components
+        """
+        rendered = [name]
+        for field in fields:
+            if not isinstance(field, str):
+                field = self.repetition.join(
+                    r if isinstance(r, str) else self.component.join(r) for r in field
+                )
+            rendered.append(field)
+        return self.field.join(rendered)
+
+    def _msh(self, message_type, timestamp):
+        self._control_id += 1
+        return self._segment(
+            "MSH",
+            self.separators[1:],
+            "BENCH",
+            "FACILITY",
+            "RECEIVER",
+            "FACILITY",
+            timestamp,
+            "",
+            [message_type],
+            "BENCH{0}".format(self._control_id),
+            "P",
+            "2.5.1",
+        )
+
+    def _timestamp(self):
+        moment = datetime.datetime(2024, 1, 1) + datetime.timedelta(
+            seconds=self.random.randrange(365 * 24 * 3600)
+        )
+        return moment.strftime("%Y%m%d%H%M%S")
+
+    def _name(self):
+        rnd = self.random
+        return [
+            self._escape(rnd.choice(_FAMILY_NAMES)),
+            self._escape(rnd.choice(_GIVEN_NAMES)),
+            rnd.choice("ABCDEFGHJKLMNPRSTW"),
+        ]
+
+    def _pid(self, identifiers):
+        rnd = self.random
+        ids = [
+            [
+                str(rnd.randrange(10**9)),
+                "",
+                "",
+                self.subcomponent.join((rnd.choice(_AUTHORITIES), str(i), "ISO")),
+                "MR" if i == 0 else rnd.choice(("PI", "AN", "SS")),
+            ]
+            for i in range(identifiers)
+        ]
+        birth = datetime.date(1930, 1, 1) + datetime.timedelta(
+            days=rnd.randrange(32000)
+        )
+        return self._segment(
+            "PID",
+            "1",
+            "",
+            ids,
+            "",
+            [self._name(), self._name()],
+            "",
+            birth.strftime("%Y%m%d"),
+            rnd.choice("MFU"),
+        )
+
+    def adt(self, identifiers=2, next_of_kin=0):
+        """An ADT^A01 message with `identifiers` repetitions of PID-3 and
+        `next_of_kin` NK1 segments
+        """
+        rnd = self.random
+        timestamp = self._timestamp()
+        segments = [
+            self._msh(["ADT", "A01", "ADT_A01"], timestamp),
+            self._segment("EVN", "A01", timestamp),
+            self._pid(identifiers),
+        ]
+        for i in range(next_of_kin):
+            segments.append(
+                self._segment(
+                    "NK1",
+                    str(i + 1),
+                    [self._name()],
+                    [rnd.choice(_RELATIONSHIPS)],
+                    "",
+                    "(555)555-{0:04d}".format(rnd.randrange(10000)),
+                )
+            )
+        segments.append(self._segment("PV1", "1", "I", [["WARD1", "101"]]))
+        return "\r".join(segments) + "\r"
+
+    def oru(self, observations=8, notes=0.1, attachments=0, attachment_size=4096):
+        """An ORU^R01 message with `observations` OBX segments, a fraction
+        `notes` of them escaped formatted text, and `attachments` more OBX
+        segments of `attachment_size` base64 encoded random bytes
+        """
+        rnd = self.random
+        timestamp = self._timestamp()
+        segments = [
+            self._msh(["ORU", "R01", "ORU_R01"], timestamp),
+            self._pid(2),
+            self._segment("OBR", "1", str(rnd.randrange(10**6)), "", [["80053"]]),
+        ]
+        br = self.esc + ".br" + self.esc
+        for i in range(observations):
+            if rnd.random() < notes:
+                text = br.join(
+                    self._escape(rnd.choice(_NOTES)) for _ in range(rnd.randint(1, 3))
+                )
+                segments.append(
+                    self._segment("OBX", str(i + 1), "FT", [["NOTE"]], "", text)
+                )
+                continue
+            code, name, units, low, high = rnd.choice(_OBSERVATIONS)
+            value = round(rnd.uniform(low * 0.8, high * 1.2), 1)
+            segments.append(
+                self._segment(
+                    "OBX",
+                    str(i + 1),
+                    "NM",
+                    [[code, name, "LN"]],
+                    "",
+                    str(value),
+                    units,
+                    "{0}-{1}".format(low, high),
+                    "L" if value < low else "H" if value > high else "N",
+                    "",
+                    "",
+                    "F",
+                    "",
+                    "",
+                    timestamp,
+                )
+            )
+        for i in range(attachments):
+            data = rnd.getrandbits(8 * attachment_size).to_bytes(
+                attachment_size, "little"
+            )
+            value = [
+                "",
+                "application",
+                "pdf",
+                "Base64",
+                base64.b64encode(data).decode(),
+            ]
+            segments.append(
+                self._segment(
+                    "OBX", str(observations + i + 1), "ED", [["PDF"]], "", [value]
+                )
+            )
+        return "\r".join(segments) + "\r"
+
+    def orm(self):
+        """An ORM^O01 new order message"""
+        timestamp = self._timestamp()
+        segments = [
+            self._msh(["ORM", "O01", "ORM_O01"], timestamp),
+            self._pid(2),
+            self._segment("ORC", "NW", str(self.random.randrange(10**6))),
+            self._segment("OBR", "1", "", "", [["85025", "CBC"]], "", "", timestamp),
+        ]
+        return "\r".join(segments) + "\r"
+
+    def message(self, message_type, **kwds):
+        """An ``"ADT"``, ``"ORU"`` or ``"ORM"`` message; `kwds` are passed to
+        :py:meth:`adt`, :py:meth:`oru` or :py:meth:`orm`
+        """
+        return getattr(self, message_type.lower())(**kwds)
+
+    def messages(self, count, types=MESSAGE_TYPES):
+        """Return `count` small messages, cycling randomly through `types`"""
+        rnd = self.random
+        sizes = {
+            "ADT": lambda: {"next_of_kin": rnd.randrange(3)},
+            "ORU": lambda: {"observations": rnd.randrange(3, 12)},
+            "ORM": dict,
+        }
+        messages = []
+        for _ in range(count):
+            message_type = rnd.choice(types)
+            messages.append(self.message(message_type, **sizes[message_type]()))
+        return messages
+
+    def file(self, batches, size, message_type, **kwds):
+        """A FHS/FTS file of `batches` BHS/BTS batches of `size` messages"""
+        header = self.separators[1:]
+        parts = [self._segment("FHS", header, "BENCH") + "\r"]
+        for _ in range(batches):
+            parts.append(self._segment("BHS", header, "BENCH") + "\r")
+            parts.extend(self.message(message_type, **kwds) for _ in range(size))
+            parts.append(self._segment("BTS", str(size)) + "\r")
+        parts.append(self._segment("FTS", str(batches)) + "\r")
+        return "".join(parts)
+
+
+def unique_timestamps(count):
+    """Return `count` distinct HL7 timestamps"""
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        (start + datetime.timedelta(seconds=37 * i)).strftime("%Y%m%d%H%M%S")
+        for i in range(count)
+    ]
@@ -5,29 +5,7 @@
 * Source Code: http://github.com/johnpaulett/python-hl7
 """
 
-from .accessor import Accessor
-from .containers import (
-    Batch,
-    Component,
-    Container,
-    Factory,
-    Field,
-    File,
-    Message,
-    Repetition,
-    Segment,
-    Sequence,
-)
-from .datatypes import parse_datetime
-from .exceptions import (
-    HL7Exception,
-    MalformedBatchException,
-    MalformedFileException,
-    MalformedSegmentException,
-    ParseException,
-)
-from .parser import parse, parse_batch, parse_file, parse_hl7
-from .util import generate_message_control_id, isbatch, isfile, ishl7, split_file
+import importlib
 
 __version__ = "0.4.6.dev0"
 __author__ = "John Paulett"
@@ -44,6 +22,7 @@ __all__ = [
     "parse_hl7",
     "parse_batch",
     "parse_file",
+    "parse_raw",
     "Sequence",
     "Container",
     "File",
@@ -58,12 +37,86 @@ __all__ = [
     "ishl7",
     "isbatch",
     "isfile",
+    "classify",
     "split_file",
+    "iter_split",
     "generate_message_control_id",
     "parse_datetime",
+    "parse_datetimes",
+    "sizeof",
     "HL7Exception",
     "MalformedBatchException",
     "MalformedFileException",
     "MalformedSegmentException",
     "ParseException",
 ]
+
+# The public names are imported on first use, so that ``import hl7`` is cheap
+# for short-lived processes and does not import the network code at all.
+_LAZY = {
+    "parse": "parser",
+    "parse_hl7": "parser",
+    "parse_batch": "parser",
+    "parse_file": "parser",
+    "parse_raw": "raw",
+    "Sequence": "containers",
+    "Container": "containers",
+    "File": "containers",
+    "Batch": "containers",
+    "Message": "containers",
+    "Segment": "containers",
+    "Field": "containers",
+    "Repetition": "containers",
+    "Component": "containers",
+    "Factory": "containers",
+    "Accessor": "accessor",
+    "ishl7": "util",
+    "isbatch": "util",
+    "isfile": "util",
+    "classify": "util",
+    "split_file": "util",
+    "iter_split": "util",
+    "generate_message_control_id": "util",
+    "parse_datetime": "datatypes",
+    "parse_datetimes": "datatypes",
+    "sizeof": "memory",
+    "HL7Exception": "exceptions",
+    "MalformedBatchException": "exceptions",
+    "MalformedFileException": "exceptions",
+    "MalformedSegmentException": "exceptions",
+    "ParseException": "exceptions",
+}
+
+_SUBMODULES = {
+    "accessor",
+    "bench",
+    "client",
+    "containers",
+    "datatypes",
+    "exceptions",
+    "instrument",
+    "memory",
+    "mllp",
+    "parser",
+    "queue",
+    "raw",
+    "testing",
+    "util",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
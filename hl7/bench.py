@@ -0,0 +1,352 @@
+"""Synthetic HL7 traffic and benchmarks for python-hl7.
+
+``hl7-bench send`` drives synthetic ADT/ORU/ORM messages over MLLP, either to
+a running receiver or to an in-process :py:func:`hl7.mllp.start_hl7_server`,
+and reports the ACK latency histogram and throughput. ``hl7-bench parse``
+times the library's own parse, serialize and access paths.
+"""
+
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import hl7
+from hl7.testing.corpus import Corpus
+
+MESSAGE_TYPES = ("ADT", "ORU", "ORM")
+
+# The size of the generated messages, by type; see hl7.testing.Corpus
+_SIZES = {
+    "ADT": lambda rnd: {"identifiers": 2, "next_of_kin": rnd.randrange(3)},
+    "ORU": lambda rnd: {"observations": rnd.randrange(3, 12), "notes": 0.1},
+    "ORM": lambda rnd: {},
+}
+
+
+def generate_message(message_type, rnd=random, control_id=None):
+    """Return a synthetic HL7 message of `message_type` (``ADT``, ``ORU`` or
+    ``ORM``) as a string, generated by :py:class:`hl7.testing.Corpus` with
+    randomized data drawn from `rnd` (a :py:class:`random.Random`, for
+    reproducible output).
+    """
+    if message_type not in _SIZES:
+        raise ValueError("Unknown message type {0}".format(message_type))
+    corpus = Corpus(rnd if isinstance(rnd, random.Random) else None)
+    return corpus.message(
+        message_type, control_id=control_id, **_SIZES[message_type](corpus.random)
+    )
+
+
+def generate_messages(count, types=MESSAGE_TYPES, seed=None):
+    """Yield `count` synthetic messages, cycling randomly through `types`.
+    The same `seed` always produces the same messages.
+    """
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield generate_message(rnd.choice(types), rnd, control_id="BENCH{0}".format(i))
+
+
+class LatencyHistogram:
+    """Histogram of latencies with logarithmic buckets (4 per power of two),
+    cheap to update from a hot loop.
+    """
+
+    _BUCKETS_PER_DOUBLING = 4
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        return int(math.log2(micros) * self._BUCKETS_PER_DOUBLING)
+
+    def _bound(self, bucket):
+        """Upper bound, in seconds, of `bucket`"""
+        return 2 ** ((bucket + 1) / self._BUCKETS_PER_DOUBLING) / 1e6
+
+    def record(self, seconds):
+        bucket = self._bucket(seconds)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Approximate latency (upper bound of the bucket) in seconds below
+        which `percent` % of the recorded values fall.
+        """
+        if not self.count:
+            return 0.0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bound(bucket), self.max)
+        return self.max
+
+    def format(self, width=40):
+        """Text rendering of the histogram, one line per bucket"""
+        if not self.count:
+            return "no samples\n"
+        peak = max(self.counts.values())
+        lines = []
+        for bucket in sorted(self.counts):
+            n = self.counts[bucket]
+            lines.append(
+                "{0:>10.3f} ms | {1:<{2}} {3}".format(
+                    self._bound(bucket) * 1000,
+                    "#" * max(1, n * width // peak),
+                    width,
+                    n,
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+
+class _NullSink:
+    def write(self, block, connection_id=0):
+        pass
+
+
+async def _send_connection(
+    host, port, blocks, window, pace, histogram, codes, encoding
+):
+    from hl7.client import ack_code
+    from hl7.mllp import open_hl7_connection, send_pipelined
+
+    reader, writer = await open_hl7_connection(host, port, encoding=encoding)
+    sent = deque()
+
+    async def paced():
+        for block in blocks:
+            await pace()
+            sent.append(time.perf_counter())
+            yield block
+
+    try:
+        async for ack in send_pipelined(reader, writer, paced(), window):
+            histogram.record(time.perf_counter() - sent.popleft())
+            code = ack_code(ack)
+            codes[code] = codes.get(code, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(
+    messages,
+    host=None,
+    port=None,
+    *,
+    connections=1,
+    window=1,
+    rate=None,
+    encoding="utf-8",
+):
+    """Send `messages` (strings) over `connections` MLLP connections, with up to
+    `window` messages awaiting an ACK per connection and at most `rate`
+    messages per second in total (``None`` for as fast as possible).
+
+    If `host` and `port` are ``None``, an in-process receiver answering ``AA``
+    is started on a free local port.
+
+    Returns a dict with the ``messages`` count, the ``seconds`` elapsed, the
+    ``rate`` achieved, the ACK ``codes`` seen and the
+    :py:class:`hl7.bench.LatencyHistogram` as ``latency``.
+    """
+    from hl7.mllp.receiver import start_receiver
+
+    blocks = iter([m.encode(encoding) for m in messages])
+    histogram = LatencyHistogram()
+    codes = {}
+    loop = asyncio.get_running_loop()
+    next_send = loop.time()
+
+    async def pace():
+        nonlocal next_send
+        if rate:
+            now = loop.time()
+            scheduled = max(next_send, now)
+            next_send = scheduled + 1.0 / rate
+            if scheduled > now:
+                await asyncio.sleep(scheduled - now)
+
+    server = None
+    if host is None and port is None:
+        server = await start_receiver(_NullSink(), "127.0.0.1", 0, encoding=encoding)
+        host, port = server.sockets[0].getsockname()[:2]
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _send_connection(
+                    host, port, blocks, window, pace, histogram, codes, encoding
+                )
+                for _ in range(connections)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return {
+        "messages": histogram.count,
+        "seconds": elapsed,
+        "rate": histogram.count / elapsed if elapsed else 0.0,
+        "codes": codes,
+        "latency": histogram,
+    }
+
+
+def _time(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+def bench_library(messages, number=5):
+    """Time the library's own code paths over `messages` (strings), `number`
+    times each. Returns a dict of operation name to seconds per message.
+    """
+    parsed = [hl7.parse(m) for m in messages]
+    dates = [str(p["MSH.7"]) for p in parsed]
+    count = len(messages)
+
+    def parse():
+        for m in messages:
+            hl7.parse(m)
+
+    def serialize():
+        for p in parsed:
+            str(p)
+
+    def access():
+        for p in parsed:
+            p["PID.3"]
+            p["PID.5.1"]
+
+    def ack():
+        for p in parsed:
+            p.create_ack()
+
+    def datetimes():
+        for d in dates:
+            hl7.parse_datetime(d)
+
+    return {
+        name: _time(func, number) / count
+        for name, func in (
+            ("parse", parse),
+            ("serialize", serialize),
+            ("extract_field", access),
+            ("create_ack", ack),
+            ("parse_datetime", datetimes),
+        )
+    }
+
+
+def _parse_types(value):
+    import argparse
+
+    types = tuple(t.strip().upper() for t in value.split(","))
+    for t in types:
+        if t not in MESSAGE_TYPES:
+            raise argparse.ArgumentTypeError("unknown message type {0}".format(t))
+    return types
+
+
+def main(argv=None):
+    """Command line entry point of ``hl7-bench``"""
+    import argparse
+
+    script_name = os.path.basename(sys.argv[0])
+    parser = argparse.ArgumentParser(prog=script_name, description=__doc__)
+    parser.add_argument(
+        "--count", type=int, default=10000, help="number of messages to generate"
+    )
+    parser.add_argument(
+        "--types",
+        type=_parse_types,
+        default=MESSAGE_TYPES,
+        help="comma separated message types to generate (ADT,ORU,ORM)",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    send = commands.add_parser("send", help="send messages over MLLP")
+    send.add_argument(
+        "--host", default=None, help="receiver host (default: in-process receiver)"
+    )
+    send.add_argument("-p", "--port", type=int, default=None, help="receiver port")
+    send.add_argument("-c", "--connections", type=int, default=1)
+    send.add_argument(
+        "-w",
+        "--window",
+        type=int,
+        default=1,
+        help="messages awaiting ACK per connection",
+    )
+    send.add_argument(
+        "-r", "--rate", type=float, default=None, help="target messages per second"
+    )
+
+    library = commands.add_parser("parse", help="time parse/serialize paths")
+    library.add_argument("--number", type=int, default=5, help="repetitions")
+
+    options = parser.parse_args(argv)
+    messages = list(generate_messages(options.count, options.types, options.seed))
+
+    if options.command == "send":
+        if (options.host is None) != (options.port is None):
+            parser.error("--host and --port must be given together")
+        result = asyncio.run(
+            run_load(
+                messages,
+                options.host,
+                options.port,
+                connections=options.connections,
+                window=options.window,
+                rate=options.rate,
+            )
+        )
+        latency = result["latency"]
+        print(
+            "{0} messages in {1:.3f} s: {2:.1f} msg/s".format(
+                result["messages"], result["seconds"], result["rate"]
+            )
+        )
+        codes = sorted(result["codes"].items(), key=str)
+        print("ACK codes: " + ", ".join("{0}={1}".format(c, n) for c, n in codes))
+        print(
+            "latency ms: p50={0:.3f} p95={1:.3f} p99={2:.3f} max={3:.3f}".format(
+                *(
+                    1000 * v
+                    for v in (
+                        latency.percentile(50),
+                        latency.percentile(95),
+                        latency.percentile(99),
+                        latency.max,
+                    )
+                )
+            )
+        )
+        sys.stdout.write(latency.format())
+    else:
+        results = bench_library(messages, options.number)
+        for name, seconds in results.items():
+            print("{0:<16} {1:>10.2f} us/message".format(name, seconds * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
-import argparse
-import io
+import importlib
+import math
 import os.path
+import re
 import socket
 import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
 
 import hl7
 
@@ -13,12 +18,93 @@ CR = b"\x0d"  # <CR>, \r
 FF = b"\x0c"  # <FF>, new page form feed
 
 RECV_BUFFER = 4096
+MAX_READ_SIZE = 1024 * 1024
+
+# Magic bytes of the compressed formats accepted by open_input, with the
+# standard library module able to read them
+_COMPRESSION_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "lzma"),
+    (b"BZh", "bz2"),
+)
 
 
 class MLLPException(Exception):
     pass
 
 
+class MLLPFramer:
+    """Incrementally splits a byte stream into frames ending with one of the
+    *terminators* (by default the MLLP end block, *<EB><CR>*).
+
+    Data is appended with :py:meth:`feed` and complete frames, including their
+    terminator, are returned by :py:meth:`next_frame`. The buffer is a
+    ``bytearray`` and the search for a terminator resumes where the previous
+    one stopped, so the cost is linear in the size of the stream however the
+    frames are split between reads.
+    """
+
+    def __init__(self, terminators=(EB + CR,)):
+        self._buffer = bytearray()
+        # Unconsumed data starts at self._start, the next search at self._scan
+        self._start = 0
+        self._scan = 0
+        # A terminator may straddle the end of the buffer
+        self._overlap = max(len(t) for t in terminators) - 1
+        if len(terminators) == 1:
+            self._find = self._find_one(terminators[0])
+        else:
+            self._find = self._find_any(terminators)
+
+    @staticmethod
+    def _find_one(terminator):
+        def find(buffer, start):
+            end = buffer.find(terminator, start)
+            return (end, end + len(terminator)) if end >= 0 else None
+
+        return find
+
+    @staticmethod
+    def _find_any(terminators):
+        pattern = re.compile(b"|".join(re.escape(t) for t in terminators))
+
+        def find(buffer, start):
+            match = pattern.search(buffer, start)
+            return match.span() if match else None
+
+        return find
+
+    def feed(self, data):
+        """Append *data* to the buffer"""
+        if self._start:
+            # Drop the frames already returned
+            del self._buffer[: self._start]
+            self._scan -= self._start
+            self._start = 0
+        self._buffer += data
+
+    def next_frame(self):
+        """Return the next complete frame, including its terminator, or
+        ``None`` if the buffer does not contain one yet.
+        """
+        found = self._find(self._buffer, self._scan)
+        if found is None:
+            self._scan = max(len(self._buffer) - self._overlap, self._start)
+            return None
+        end = found[1]
+        frame = bytes(self._buffer[self._start : end])
+        self._start = self._scan = end
+        return frame
+
+    @property
+    def pending(self):
+        """The buffered bytes that are not part of a complete frame yet"""
+        return bytes(self._buffer[self._start :])
+
+    def __len__(self):
+        return len(self._buffer) - self._start
+
+
 class MLLPClient:
     """
     A basic, blocking, HL7 MLLP client based upon :py:mod:`socket`.
@@ -39,13 +125,41 @@ class MLLPClient:
     MLLPClient takes an optional ``encoding`` parameter, defaults to UTF-8,
     for encoding unicode messages [#]_.
 
+    ``timeout`` sets the socket timeout in seconds (``None``, the default,
+    blocks forever). ``nodelay`` (default ``True``) disables Nagle's algorithm
+    via ``TCP_NODELAY`` and ``keepalive`` (default ``False``) enables
+    ``SO_KEEPALIVE`` for long-lived connections.
+
+    Responses are read until the MLLP end block (*<EB><CR>*), so each call
+    returns exactly one framed response, even if it arrived in several TCP
+    segments or together with the next response.
+
     .. [#] http://wiki.hl7.org/index.php?title=Character_Set_used_in_v2_messages
     """
 
-    def __init__(self, host, port, encoding="utf-8"):
+    def __init__(
+        self,
+        host,
+        port,
+        encoding="utf-8",
+        timeout=None,
+        nodelay=True,
+        keepalive=False,
+    ):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if timeout is not None:
+            self.socket.settimeout(timeout)
+        if nodelay:
+            # MLLP is request/response with small ACKs, so Nagle's algorithm
+            # only adds latency
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if keepalive:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         self.socket.connect((host, port))
         self.encoding = encoding
+        # Holds bytes received from the server that are not yet part of a
+        # returned response, e.g. the start of the next ACK
+        self._framer = MLLPFramer()
 
     def __enter__(self):
         return self
@@ -66,6 +180,76 @@ class MLLPClient:
         according to  :py:attr:`hl7.client.MLLPClient.encoding`
 
         """
+        return self.send(self._wrap(message))
+
+    def send_many(self, messages, window=16):
+        """Send each of *messages* (see :py:meth:`send_message` for the accepted
+        types) and return the list of responses, in the same order.
+
+        Up to *window* messages are written before waiting for the first
+        response, see :py:meth:`send_pipelined`.
+        """
+        return list(self.send_pipelined(messages, window))
+
+    def send_pipelined(self, messages, window=16):
+        """Send each of *messages* (see :py:meth:`send_message` for the accepted
+        types) and yield the responses as they arrive, in the same order.
+
+        Up to *window* messages are written before waiting for the first
+        response, so the round trip latency is not paid for each message.
+        The server must answer the messages in the order they were sent, as
+        required by MLLP.
+
+        *messages* is consumed lazily: the next message is only taken once
+        the response to the one *window* messages before it has been handled
+        by the caller, so a generator can stop sending (e.g. after a negative
+        ACK) or pace the messages.
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        return self._send_pipelined(messages, window)
+
+    def _send_pipelined(self, messages, window):
+        outstanding = 0
+        for message in messages:
+            self.socket.sendall(self._wrap(message))
+            outstanding += 1
+            if outstanding >= window:
+                yield self.read_response()
+                outstanding -= 1
+        while outstanding:
+            yield self.read_response()
+            outstanding -= 1
+
+    def send(self, data):
+        """Low-level, direct access to the socket.send (data must be already
+        wrapped in an MLLP container).  Blocks until the server returns.
+        """
+        # upload the data
+        self.socket.sendall(data)
+        # wait for the ACK/NACK
+        return self.read_response()
+
+    def read_response(self):
+        """Block until a complete MLLP framed response (*<SB>...<EB><CR>*) has
+        been received and return it, including the framing characters.
+
+        Raises :py:class:`hl7.client.MLLPException` if the server closes the
+        connection before the response is complete.
+        """
+        while True:
+            response = self._framer.next_frame()
+            if response is not None:
+                return response
+            data = self.socket.recv(RECV_BUFFER)
+            if not data:
+                raise MLLPException(
+                    "connection closed before response was complete: %r"
+                    % self._framer.pending
+                )
+            self._framer.feed(data)
+
+    def _wrap(self, message):
         if isinstance(message, bytes):
             # Assume we have the correct encoding
             binary = message
@@ -76,17 +260,7 @@ class MLLPClient:
             binary = message.encode(self.encoding)
 
         # wrap in MLLP message container
-        data = SB + binary + EB + CR
-        return self.send(data)
-
-    def send(self, data):
-        """Low-level, direct access to the socket.send (data must be already
-        wrapped in an MLLP container).  Blocks until the server returns.
-        """
-        # upload the data
-        self.socket.sendall(data)
-        # wait for the ACK/NACK
-        return self.socket.recv(RECV_BUFFER)
+        return SB + binary + EB + CR
 
 
 # wrappers to make testing easier
@@ -111,62 +285,241 @@ def stderr():
     return sys.stderr
 
 
-def read_stream(stream):
-    """Buffer the stream and yield individual, stripped messages"""
-    _buffer = b""
+@contextmanager
+def open_input(filename):
+    """Open *filename* for reading as a binary stream, transparently
+    decompressing gzip, xz and bzip2 files. The compression is detected from
+    the magic bytes at the start of the file, not from the file name.
+
+    The file is read incrementally, so it can be much larger than the
+    available memory.
+    """
+    with open(filename, "rb") as f:
+        magic = f.peek(6)[:6]
+        for prefix, module in _COMPRESSION_MAGIC:
+            if magic.startswith(prefix):
+                with importlib.import_module(module).open(f) as decompressed:
+                    yield decompressed
+                return
+        yield f
+
+
+def read_stream(stream, read_size=RECV_BUFFER, max_read_size=MAX_READ_SIZE):
+    """Buffer the stream and yield individual, stripped messages.
+
+    Messages are usually terminated by *<EB>*, but *<FF>* is accepted as well.
+    The stream is read *read_size* bytes at a time; the read size doubles, up
+    to *max_read_size*, while a single message is larger than it.
+    """
+    framer = MLLPFramer(terminators=(EB, FF))
 
     while True:
-        data = stream.read(RECV_BUFFER)
+        data = stream.read(read_size)
         if data == b"":
             break
-        # usually should be broken up by EB, but I have seen FF separating
-        # messages
-        messages = (_buffer + data).split(EB if FF not in data else FF)
+        framer.feed(data)
+
+        found = False
+        while True:
+            frame = framer.next_frame()
+            if frame is None:
+                break
+            found = True
+            # strip the terminator, then the rest of the MLLP framing
+            message = frame[:-1].strip(SB + CR)
+            if message:
+                yield message
 
-        # whatever is in the last chunk is an uncompleted message, so put back
-        # into the buffer
-        _buffer = messages.pop(-1)
+        if not found and len(framer) >= read_size:
+            read_size = min(read_size * 2, max_read_size)
 
-        for m in messages:
-            yield m.strip(SB + CR)
+    if len(framer.pending.strip()) > 0:
+        raise MLLPException("buffer not terminated: %s" % framer.pending)
 
-    if len(_buffer.strip()) > 0:
-        raise MLLPException("buffer not terminated: %s" % _buffer)
 
+def read_loose(stream, read_size=64 * 1024):
+    """Turn a HL7-like blob of text into a real HL7 messages.
 
-def read_loose(stream):
-    """Turn a HL7-like blob of text into a real HL7 messages"""
+    The stream is read *read_size* bytes at a time and messages are yielded as
+    soon as the start of the next one is found, so the memory used is bounded
+    by the size of the largest message.
+    """
     # look for the START_BLOCK to delineate messages
     START_BLOCK = rb"MSH|^~\&|"
-
-    # load all the data
-    data = stream.read()
-
-    # Take out all the typical MLLP separators. In Python 3, iterating
-    # through a bytestring returns ints, so we need to filter out the int
-    # versions of the separators, then convert back from a list of ints to
-    # a bytestring.
+    # Take out all the typical MLLP separators.
     # WARNING: There is an assumption here that we can treat the data as single bytes
     #   when filtering out the separators.
-    separators = [bs[0] for bs in [EB, FF, SB]]
-    data = bytes(b for b in data if b not in separators)
-    # Windows & Unix new lines to segment separators
-    data = data.replace(b"\r\n", b"\r").replace(b"\n", b"\r")
-
-    for m in data.split(START_BLOCK):
-        if not m:
+    separators = EB + FF + SB
+
+    buffer = bytearray()
+    # The current message starts at buffer[start], the search for the
+    # START_BLOCK resumes at buffer[scan]
+    start = 0
+    scan = 0
+    # A trailing \r is held back until we know if the next chunk starts with \n
+    carry = b""
+    eof = False
+    while not eof:
+        data = stream.read(read_size)
+        eof = not data
+        data = carry + data.translate(None, separators)
+        carry = b""
+        if not eof and data[-1:] == CR:
+            data, carry = data[:-1], CR
+        # Windows & Unix new lines to segment separators
+        data = data.replace(b"\r\n", b"\r").replace(b"\n", b"\r")
+
+        if start:
+            del buffer[:start]
+            scan -= start
+            start = 0
+        buffer += data
+
+        while True:
+            found = buffer.find(START_BLOCK, scan)
+            if found < 0:
+                # The START_BLOCK may straddle the next chunk
+                scan = max(len(buffer) - len(START_BLOCK) + 1, start)
+                break
+            m = bytes(buffer[start:found])
+            start = scan = found + len(START_BLOCK)
             # the first element will not have any data from the split
-            continue
+            if m:
+                # strip any trailing whitespace and re-insert the START_BLOCK,
+                # which was removed via the split
+                yield START_BLOCK + m.strip(CR + b"\n ")
+
+    m = bytes(buffer[start:])
+    if m:
+        yield START_BLOCK + m.strip(CR + b"\n ")
+
+
+def ack_code(response):
+    """Return the acknowledgment code (MSA-1) of a framed *response* as a
+    string, or ``None`` if it does not contain an MSA segment.
+    """
+    for segment in response.strip(SB + EB + CR).split(CR):
+        segment = segment.strip()
+        if segment[:3] == b"MSA" and len(segment) > 3:
+            fields = segment.split(segment[3:4])
+            return fields[1].decode("ascii", "replace") if len(fields) > 1 else ""
+    return None
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of the already sorted, non-empty *ordered*"""
+    index = max(math.ceil(percent / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class _SendStats:
+    """Thread-safe collection of the ACK latencies and codes seen by mllp_send"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.codes = Counter()
+        self.start = time.perf_counter()
+
+    def record(self, latency, code):
+        with self._lock:
+            self.latencies.append(latency)
+            self.codes[code] += 1
+
+    def summary(self, connections):
+        elapsed = time.perf_counter() - self.start
+        count = len(self.latencies)
+        lines = [
+            "sent {0} messages in {1:.3f} s ({2:.1f} msg/s) over {3} connection(s)".format(
+                count, elapsed, count / elapsed if elapsed > 0 else 0.0, connections
+            ),
+            "ACK codes: "
+            + (
+                ", ".join(
+                    "{0}={1}".format(code if code is not None else "unknown", n)
+                    for code, n in sorted(
+                        self.codes.items(), key=lambda item: str(item[0])
+                    )
+                )
+                or "none"
+            ),
+        ]
+        if count:
+            ordered = sorted(self.latencies)
+            lines.append(
+                "ACK latency ms: p50={0:.2f} p95={1:.2f} p99={2:.2f} max={3:.2f}".format(
+                    *(
+                        1000 * value
+                        for value in (
+                            _percentile(ordered, 50),
+                            _percentile(ordered, 95),
+                            _percentile(ordered, 99),
+                            ordered[-1],
+                        )
+                    )
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+
+class _RateLimiter:
+    """Spaces out calls to :py:meth:`wait` to at most *rate* per second, shared
+    between threads.
+    """
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(self._next, now)
+            self._next = scheduled + self._interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+
+class _LockedIterator:
+    """Allows several threads to consume the same iterator"""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self._lock = threading.Lock()
 
-        # strip any trailing whitespace
-        m = m.strip(CR + b"\n ")
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            return next(self._iterator)
+
+
+def _send_connection(host, port, messages, window, limiter, stats, on_response):
+    """Send *messages* over a new connection, keeping up to *window* messages
+    waiting for their ACK.
+    """
+    sent = deque()
+
+    def timed():
+        for message in messages:
+            if limiter is not None:
+                limiter.wait()
+            sent.append(time.perf_counter())
+            yield message
 
-        # re-insert the START_BLOCK, which was removed via the split
-        yield START_BLOCK + m
+    with MLLPClient(host, port) as client:
+        for response in client.send_pipelined(timed(), window):
+            stats.record(time.perf_counter() - sent.popleft(), ack_code(response))
+            on_response(response)
 
 
 def mllp_send():
     """Command line tool to send messages to an MLLP server"""
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
     # set up the command line options
     script_name = os.path.basename(sys.argv[0])
     parser = argparse.ArgumentParser(usage=script_name + " [options] <server>")
@@ -191,7 +544,7 @@ def mllp_send():
         "-f",
         "--file",
         dest="filename",
-        help="read from FILE instead of stdin",
+        help="read from FILE instead of stdin (may be gzip, xz or bzip2 compressed)",
         metavar="FILE",
     )
     parser.add_argument(
@@ -213,6 +566,33 @@ def mllp_send():
             '"MSH|^~\\&|". Requires --file option (no stdin)'
         ),
     )
+    parser.add_argument(
+        "-c",
+        "--connections",
+        action="store",
+        type=int,
+        dest="connections",
+        default=1,
+        help="number of concurrent connections to send over",
+    )
+    parser.add_argument(
+        "-w",
+        "--window",
+        action="store",
+        type=int,
+        dest="window",
+        default=1,
+        help="maximum number of messages awaiting an ACK, per connection",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        action="store",
+        type=float,
+        dest="rate",
+        default=None,
+        help="maximum number of messages sent per second, over all connections",
+    )
     parser.add_argument("server", nargs="?")
 
     options = parser.parse_args()
@@ -232,30 +612,60 @@ def mllp_send():
         sys.exit(1)
         return  # for testing when sys.exit mocked
 
-    if options.filename is not None:
-        # Previously set stream to the open() handle, but then we did not
-        # close the open file handle.  This new approach consumes the entire
-        # file into memory before starting to process, which is not required
-        # or ideal, since we can handle a stream
-        with open(options.filename, "rb") as f:
-            stream = io.BytesIO(f.read())
-    else:
-        if options.loose:
-            stderr().write("--loose requires --file\n")
-            sys.exit(1)
-            return  # for testing when sys.exit mocked
+    if options.filename is None and options.loose:
+        stderr().write("--loose requires --file\n")
+        sys.exit(1)
+        return  # for testing when sys.exit mocked
+
+    if options.connections < 1 or options.window < 1:
+        stderr().write("--connections and --window must be at least 1\n")
+        sys.exit(1)
+        return  # for testing when sys.exit mocked
+
+    if options.rate is not None and options.rate <= 0:
+        stderr().write("--rate must be positive\n")
+        sys.exit(1)
+        return  # for testing when sys.exit mocked
+
+    output_lock = threading.Lock()
 
-        stream = stdin()
+    def on_response(response):
+        if options.verbose:
+            with output_lock:
+                stdout(response)
+
+    stats = _SendStats()
+    limiter = _RateLimiter(options.rate) if options.rate else None
+    with ExitStack() as stack:
+        if options.filename is not None:
+            stream = stack.enter_context(open_input(options.filename))
+        else:
+            stream = stdin()
 
-    with MLLPClient(host, options.port) as client:
         message_stream = (
             read_stream(stream) if not options.loose else read_loose(stream)
         )
-
-        for message in message_stream:
-            result = client.send_message(message)
-            if options.verbose:
-                stdout(result)
+        args = (host, options.port)
+        kwargs = dict(
+            window=options.window,
+            limiter=limiter,
+            stats=stats,
+            on_response=on_response,
+        )
+        if options.connections == 1:
+            _send_connection(*args, message_stream, **kwargs)
+        else:
+            messages = _LockedIterator(message_stream)
+            with ThreadPoolExecutor(options.connections) as executor:
+                futures = [
+                    executor.submit(_send_connection, *args, messages, **kwargs)
+                    for _ in range(options.connections)
+                ]
+            for future in futures:
+                future.result()
+
+    # The summary goes to stderr, so it is printed even with --quiet
+    stderr().write(stats.summary(options.connections))
 
 
 if __name__ == "__main__":
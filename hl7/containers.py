@@ -2,6 +2,7 @@ import datetime
 import logging
 
 from .accessor import Accessor
+from .datatypes import convert
 from .exceptions import (
     MalformedBatchException,
     MalformedFileException,
@@ -138,6 +139,14 @@ class Container(Sequence):
     def __str__(self):
         return self.separator.join((str(x) for x in self))
 
+    def memory_usage(self, deep=True):
+        """Return the :py:class:`hl7.memory.MemoryUsage` of this container,
+        see :py:func:`hl7.sizeof`.
+        """
+        from .memory import sizeof
+
+        return sizeof(self, deep)
+
 
 class File(Container):
     """Representation of an HL7 file from the batch protocol.
@@ -464,6 +473,24 @@ class Message(Container):
             segment_num, field_num, repeat_num, component_num, subcomponent_num
         )
 
+    def typed(self, key, datatype):
+        """Return the value at the accessor `key` (a string or
+        :py:class:`hl7.Accessor`) converted to `datatype`, e.g.
+        ``h.typed("OBX.5", "NM")``. See :py:meth:`hl7.Segment.typed`.
+
+        >>> h.typed("MSH.7", "DTM")
+        datetime.datetime(2002, 2, 15, 9, 30)
+        """
+        if not isinstance(key, Accessor):
+            key = Accessor.parse_key(key)
+        return self.segments(key.segment)(key.segment_num).typed(
+            key.field_num or 1,
+            datatype,
+            key.repeat_num or 1,
+            key.component_num or 1,
+            key.subcomponent_num or 1,
+        )
+
     def assign_field(
         self,
         value,
@@ -717,6 +744,38 @@ class Segment(Container):
         else:
             return ""  # Assume non-present optional value
 
+    def typed(
+        self,
+        field_num,
+        datatype,
+        repeat_num=1,
+        component_num=1,
+        subcomponent_num=1,
+    ):
+        """Return the value at the given position converted to `datatype`
+        with :py:func:`hl7.datatypes.convert`, e.g. ``"NM"`` for a float,
+        ``"DTM"`` for a :py:class:`datetime.datetime` or ``"CX"`` for a
+        :py:class:`hl7.datatypes.CX`.
+
+        The result is cached on the segment, so converting the same value
+        again is a dictionary lookup. :py:meth:`assign_field` clears the
+        cache; call :py:meth:`clear_typed` after modifying the segment
+        directly.
+        """
+        key = (field_num, datatype, repeat_num, component_num, subcomponent_num)
+        cache = self.__dict__.setdefault("_typed_cache", {})
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = convert(
+                self, datatype, field_num, repeat_num, component_num, subcomponent_num
+            )
+            return value
+
+    def clear_typed(self):
+        """Clear the values cached by :py:meth:`typed`"""
+        self.__dict__.pop("_typed_cache", None)
+
     def assign_field(
         self,
         value,
@@ -732,7 +791,7 @@ class Segment(Container):
         Extract a field using a future proofed approach, based on rules in:
         http://wiki.medical-objects.com.au/index.php/Hl7v2_parsing
         """
-
+        self.clear_typed()
         while len(self) <= field_num:
             self.append(self.create_field([]))
         field = self(field_num)
@@ -1,5 +1,7 @@
 import datetime
 import re
+from collections import namedtuple
+from functools import lru_cache
 
 DTM_TZ_RE = re.compile(r"(\d+(?:\.\d+)?)(?:([+-]\d{2})(\d{2}))?")
 
@@ -37,60 +39,90 @@ class _UTCOffset(datetime.tzinfo):
         return datetime.timedelta(0)
 
 
+@lru_cache(maxsize=None)
+def _utc_offset(minutes):
+    """Return the shared :py:class:`_UTCOffset` for ``minutes``"""
+    return _UTCOffset(minutes)
+
+
 def parse_datetime(value):
     """Parse hl7 DTM string ``value`` :py:class:`datetime.datetime`.
 
     ``value`` is of the format YYYY[MM[DD[HH[MM[SS[.S[S[S[S]]]]]]]]][+/-HHMM]
     or a ValueError will be raised.
 
+    Results are cached, as the same timestamps (e.g. MSH-7 or OBX-14) tend to
+    repeat within a batch.
+
     :rtype: :py:;class:`datetime.datetime`
     """
     if not value:
         return None
+    if isinstance(value, str):
+        return _parse_datetime_cached(value)
+    return _parse_datetime(value)
+
+
+def parse_datetimes(values, as_numpy=False):
+    """Parse each of the hl7 DTM strings ``values`` with
+    :py:func:`parse_datetime` and return a list.
+
+    With ``as_numpy``, return a tuple of two NumPy arrays instead: the
+    ``datetime64[us]`` date and time as written (without applying the UTC
+    offset) and the ``timedelta64[m]`` UTC offsets. Empty values are ``NaT``
+    in both and values without an offset have a ``NaT`` offset, so
+    ``dates - offsets`` is the UTC time where the offset is known. Requires
+    NumPy.
+    """
+    parsed = [parse_datetime(value) for value in values]
+    if not as_numpy:
+        return parsed
+
+    import numpy
 
+    dates = numpy.array(
+        [None if dt is None else dt.replace(tzinfo=None) for dt in parsed],
+        dtype="datetime64[us]",
+    )
+    offsets = numpy.array(
+        [
+            None if dt is None or dt.tzinfo is None else dt.tzinfo.minutes
+            for dt in parsed
+        ],
+        dtype="timedelta64[m]",
+    )
+    return dates, offsets
+
+
+def _parse_datetime(value):
     # Split off optional timezone
     dt_match = DTM_TZ_RE.match(value)
     if not dt_match:
         raise ValueError("Malformed HL7 datetime {0}".format(value))
-    dtm = dt_match.group(1)
-    tzh = dt_match.group(2)
-    tzm = dt_match.group(3)
+    dtm, tzh, tzm = dt_match.groups()
     if tzh and tzm:
         sign = -1 if tzh.startswith("-") else 1
         minutes = int(tzh) * 60
         minutes += sign * int(tzm)
-        tzinfo = _UTCOffset(minutes)
+        tzinfo = _utc_offset(minutes)
     else:
         tzinfo = None
 
     precision = len(dtm)
 
-    if precision >= 4:
-        year = int(dtm[0:4])
-    else:
+    if precision < 4:
         raise ValueError("Malformed HL7 datetime {0}".format(value))
+    year = int(dtm[0:4])
+    month = int(dtm[4:6]) if precision >= 6 else 1
+    day = int(dtm[6:8]) if precision >= 8 else 1
+    hour = int(dtm[8:10]) if precision >= 10 else 0
+    minute = int(dtm[10:12]) if precision >= 12 else 0
 
-    if precision >= 6:
-        month = int(dtm[4:6])
-    else:
-        month = 1
-
-    if precision >= 8:
-        day = int(dtm[6:8])
-    else:
-        day = 1
-
-    if precision >= 10:
-        hour = int(dtm[8:10])
-    else:
-        hour = 0
-
-    if precision >= 12:
-        minute = int(dtm[10:12])
-    else:
-        minute = 0
-
-    if precision >= 14:
+    if precision == 14 and dtm[12:].isdigit():
+        second = int(dtm[12:14])
+        microsecond = 0
+    elif precision >= 14:
+        # Fractional seconds, rounded like ``datetime.timedelta`` does
         delta = datetime.timedelta(seconds=float(dtm[12:]))
         second = delta.seconds
         microsecond = delta.microseconds
@@ -101,3 +133,176 @@ def parse_datetime(value):
     return datetime.datetime(
         year, month, day, hour, minute, second, microsecond, tzinfo=tzinfo
     )
+
+
+_parse_datetime_cached = lru_cache(maxsize=4096)(_parse_datetime)
+
+
+class CX(
+    namedtuple(
+        "CX",
+        [
+            "id",
+            "check_digit",
+            "check_digit_scheme",
+            "assigning_authority",
+            "identifier_type_code",
+            "assigning_facility",
+        ],
+    )
+):
+    """Extended composite ID with check digit (e.g. PID-3). Composite
+    components, such as the assigning authority, hold their first
+    sub-component.
+    """
+
+    __slots__ = ()
+
+
+class XPN(
+    namedtuple(
+        "XPN",
+        [
+            "family_name",
+            "given_name",
+            "second_name",
+            "suffix",
+            "prefix",
+            "degree",
+            "name_type_code",
+        ],
+    )
+):
+    """Extended person name (e.g. PID-5). Composite components, such as the
+    family name, hold their first sub-component.
+    """
+
+    __slots__ = ()
+
+
+def _parse_number(value):
+    return float(value)
+
+
+def _parse_date(value):
+    return parse_datetime(value).date()
+
+
+def _parse_time(value):
+    if len(value) < 2 or not value[:2].isdigit():
+        raise ValueError("Malformed HL7 time {0}".format(value))
+    return parse_datetime("19700101" + value).timetz()
+
+
+#: Converters of the typed accessors, from the unescaped value of a field to
+#: a Python value, by HL7 datatype. Values are only converted if not empty.
+CONVERTERS = {
+    "NM": _parse_number,
+    "DT": _parse_date,
+    "DTM": parse_datetime,
+    "TS": parse_datetime,
+    "TM": _parse_time,
+}
+
+#: Composite datatypes supported by the typed accessors
+COMPOSITES = {"CX": CX, "XPN": XPN}
+
+
+def _components(segment, field_num, repeat_num):
+    if field_num >= len(segment):
+        return []
+    field = segment(field_num)
+    if repeat_num > len(field):
+        return []
+    repetition = field(repeat_num)
+    if not isinstance(repetition, list):
+        return [segment.extract_field(1, field_num, repeat_num)]
+    return [
+        segment.extract_field(1, field_num, repeat_num, component_num)
+        for component_num in range(1, len(repetition) + 1)
+    ]
+
+
+def convert(
+    segment,
+    datatype,
+    field_num,
+    repeat_num=1,
+    component_num=1,
+    subcomponent_num=1,
+):
+    """Convert the value at the given position of ``segment`` to
+    ``datatype``.
+
+    ``datatype`` is a key of :py:data:`CONVERTERS` (e.g. ``"NM"`` or
+    ``"DTM"``), a composite of :py:data:`COMPOSITES` (``"CX"`` or ``"XPN"``,
+    built from the components of the repetition) or a callable taking the
+    value as a string, such as :py:class:`decimal.Decimal`. Empty values are
+    ``None``.
+
+    Use :py:meth:`hl7.Segment.typed` or :py:meth:`hl7.Message.typed`, which
+    cache the result.
+    """
+    composite = COMPOSITES.get(datatype)
+    if composite is not None:
+        components = _components(segment, field_num, repeat_num)
+        if not any(components):
+            return None
+        components = components[: len(composite._fields)]
+        return composite(
+            *(components + [""] * (len(composite._fields) - len(components)))
+        )
+
+    converter = datatype if callable(datatype) else CONVERTERS[datatype]
+    value = segment.extract_field(
+        1, field_num, repeat_num, component_num, subcomponent_num
+    )
+    if not value:
+        return None
+    return converter(value)
+
+
+class TypedSegment:
+    """Read-only view of a :py:class:`hl7.Segment` whose fields, indexed by
+    field number, are converted with :py:meth:`hl7.Segment.typed`.
+
+    ``types`` maps field numbers to datatypes and defaults to the
+    :py:data:`SEGMENT_TYPES` of the segment. Other fields are returned as
+    strings, like :py:meth:`hl7.Segment.extract_field`. The value of an OBX
+    segment (OBX-5) is converted according to its value type (OBX-2), if it
+    is a datatype of :py:data:`CONVERTERS`.
+    """
+
+    def __init__(self, segment, types=None):
+        self.segment = segment
+        if types is None:
+            types = SEGMENT_TYPES.get(str(segment[0][0]), {})
+        self.types = types
+
+    def datatype(self, field_num):
+        """The datatype of the field ``field_num``, or ``None``"""
+        datatype = self.types.get(field_num)
+        if datatype is None and field_num == 5 and str(self.segment[0][0]) == "OBX":
+            value_type = self.segment.extract_field(1, 2)
+            if value_type in CONVERTERS:
+                datatype = value_type
+        return datatype
+
+    def __getitem__(self, field_num):
+        datatype = self.datatype(field_num)
+        if datatype is None:
+            return self.segment.extract_field(1, field_num)
+        return self.segment.typed(field_num, datatype)
+
+
+#: Default datatypes of :py:class:`TypedSegment`, by segment and field number
+SEGMENT_TYPES = {
+    "MSH": {7: "DTM"},
+    "EVN": {2: "DTM", 6: "DTM"},
+    "PID": {3: "CX", 5: "XPN", 7: "DTM", 29: "DTM"},
+    "NK1": {2: "XPN"},
+    "PV1": {44: "DTM", 45: "DTM"},
+    "ORC": {9: "DTM"},
+    "OBR": {7: "DTM", 8: "DTM", 14: "DTM", 22: "DTM"},
+    "OBX": {14: "DTM", 19: "DTM"},
+}
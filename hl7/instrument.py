@@ -0,0 +1,182 @@
+"""Opt-in timing of the stages of parsing.
+
+When enabled, :py:func:`hl7.parse`, :py:func:`hl7.parse_batch`,
+:py:func:`hl7.parse_file` and :py:meth:`hl7.mllp.HL7StreamReader.readmessage`
+report the time spent in each stage to the registered callbacks, which are
+called as ``callback(stage, seconds, count)``:
+
+``decode``
+    decoding byte strings, `count` is the number of bytes
+``plan``
+    creating the parse plan from the separators of the message
+``batch_split``
+    splitting batches and files into messages, `count` is the number of
+    messages
+``segment_split``
+    splitting messages into segments, `count` is the number of segments
+``field_split``
+    splitting segments, fields, repetitions and components, `count` is the
+    number of parts
+``allocate``
+    creating the containers, `count` is the number of containers
+``unescape``
+    :py:meth:`hl7.Container.unescape` and the unescaping done by
+    :py:meth:`hl7.Message.__getitem__`
+``parse``
+    the whole of :py:func:`hl7.parse`, `count` is 1
+
+Each call of :py:func:`hl7.parse` reports each of its stages once, with the
+totals for the message. Timing every split and container slows parsing down
+noticeably, so enable it while investigating, or for a sample of the traffic.
+
+:py:class:`ParseStats` collects the totals for a block of code::
+
+    with hl7.instrument.ParseStats() as stats:
+        for message in messages:
+            hl7.parse(message)
+    print(stats)
+
+When disabled, which is the default, the parser only checks :py:data:`active`
+once per call. Messages parsed in a :py:class:`~concurrent.futures.ProcessPoolExecutor`
+are reported to the callbacks of the worker processes.
+"""
+
+import threading
+from time import perf_counter
+
+#: ``True`` while at least one callback is registered
+active = False
+
+_callbacks = ()
+_lock = threading.Lock()
+
+
+def enable(callback):
+    """Register `callback` and enable the instrumentation"""
+    global _callbacks, active
+    with _lock:
+        _callbacks = _callbacks + (callback,)
+        active = True
+
+
+def disable(callback=None):
+    """Unregister `callback`, or all the callbacks if it is ``None``. The
+    instrumentation is disabled once no callback is left.
+    """
+    global _callbacks, active
+    with _lock:
+        if callback is None:
+            _callbacks = ()
+        else:
+            callbacks = list(_callbacks)
+            callbacks.remove(callback)
+            _callbacks = tuple(callbacks)
+        active = bool(_callbacks)
+
+
+def record(stage, seconds, count=1):
+    """Report `seconds` spent in `stage` to the registered callbacks"""
+    for callback in _callbacks:
+        callback(stage, seconds, count)
+
+
+class _Timings:
+    """Accumulates the stages of one parse, reported together by
+    :py:meth:`flush`
+    """
+
+    __slots__ = ("stages",)
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds, count=1):
+        totals = self.stages.get(stage)
+        if totals is None:
+            self.stages[stage] = [seconds, count]
+        else:
+            totals[0] += seconds
+            totals[1] += count
+
+    def flush(self):
+        for stage, (seconds, count) in self.stages.items():
+            record(stage, seconds, count)
+        self.stages = {}
+
+
+class StageStats:
+    """The totals of one stage in :py:class:`ParseStats`"""
+
+    __slots__ = ("calls", "seconds", "count")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.count = 0
+
+    def __repr__(self):
+        return "StageStats(calls={0}, seconds={1}, count={2})".format(
+            self.calls, self.seconds, self.count
+        )
+
+
+class ParseStats:
+    """A callback that totals the time, calls and counts of each stage in
+    :py:attr:`stages`, a dict of :py:class:`StageStats` by stage name.
+
+    Used as a context manager, it is enabled on entry and disabled on exit.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, seconds, count):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.count += count
+
+    def __enter__(self):
+        enable(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        disable(self)
+
+    def __getitem__(self, stage):
+        return self.stages[stage]
+
+    def as_dict(self):
+        """The stages as a JSON serializable dict"""
+        return {
+            stage: {"calls": s.calls, "seconds": s.seconds, "count": s.count}
+            for stage, s in self.stages.items()
+        }
+
+    def __str__(self):
+        lines = [
+            "{0:<14} {1:>8} {2:>12} {3:>10}".format(
+                "stage", "calls", "seconds", "count"
+            )
+        ]
+        for stage, stats in sorted(
+            self.stages.items(), key=lambda item: item[1].seconds, reverse=True
+        ):
+            lines.append(
+                "{0:<14} {1:>8} {2:>12.6f} {3:>10}".format(
+                    stage, stats.calls, stats.seconds, stats.count
+                )
+            )
+        return "\n".join(lines)
+
+
+def timed_decode(data, encoding, errors="strict"):
+    """Decode `data`, reporting the ``decode`` stage"""
+    start = perf_counter()
+    text = data.decode(encoding, errors)
+    record("decode", perf_counter() - start, len(data))
+    return text
@@ -0,0 +1,141 @@
+"""Memory footprint of parsed messages.
+
+:py:func:`sizeof` adds up :py:func:`sys.getsizeof` of the containers of a
+:py:class:`hl7.Message`, :py:class:`hl7.Batch` or :py:class:`hl7.File`, their
+attributes and their strings, by level::
+
+    >>> usage = hl7.sizeof(hl7.parse(message))
+    >>> usage.total > len(message)
+    True
+    >>> sorted(usage.levels)
+    ['component', 'field', 'message', 'repetition', 'segment', 'string']
+
+Objects referenced several times, like the separators shared by all the
+containers of a message, are only counted once. Classes, such as the
+:py:class:`hl7.Factory`, are not counted.
+"""
+
+import sys
+from types import FunctionType, ModuleType
+
+from .containers import (
+    Batch,
+    Component,
+    Container,
+    Field,
+    File,
+    Message,
+    Repetition,
+    Segment,
+)
+
+#: The levels of :py:attr:`MemoryUsage.levels`, in the order of the tree
+LEVELS = (
+    "file",
+    "batch",
+    "message",
+    "segment",
+    "field",
+    "repetition",
+    "component",
+    "string",
+    "other",
+)
+
+_CONTAINER_LEVELS = (
+    (File, "file"),
+    (Batch, "batch"),
+    (Message, "message"),
+    (Segment, "segment"),
+    (Field, "field"),
+    (Repetition, "repetition"),
+    (Component, "component"),
+)
+
+# Shared by many objects and not owned by any message
+_SKIPPED = (type, ModuleType, FunctionType, type(None), bool)
+
+
+class MemoryUsage:
+    """Bytes held by a tree of containers: :py:attr:`total`, and the bytes and
+    number of objects of each level in :py:attr:`levels` and
+    :py:attr:`counts`. The ``other`` level holds anything that is neither a
+    container nor a string, such as the caches of the typed accessors.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.levels = {}
+        self.counts = {}
+
+    def add(self, level, size):
+        self.total += size
+        self.levels[level] = self.levels.get(level, 0) + size
+        self.counts[level] = self.counts.get(level, 0) + 1
+
+    def as_dict(self):
+        """A JSON serializable dict of the usage"""
+        return {
+            "total": self.total,
+            "levels": dict(self.levels),
+            "counts": dict(self.counts),
+        }
+
+    def __repr__(self):
+        return "MemoryUsage(total={0}, levels={1!r})".format(self.total, self.levels)
+
+    def __str__(self):
+        lines = ["{0:<12} {1:>10} {2:>12}".format("level", "objects", "bytes")]
+        for level in LEVELS:
+            if level in self.levels:
+                lines.append(
+                    "{0:<12} {1:>10} {2:>12}".format(
+                        level, self.counts[level], self.levels[level]
+                    )
+                )
+        lines.append("{0:<12} {1:>10} {2:>12}".format("total", "", self.total))
+        return "\n".join(lines)
+
+
+def _level(obj):
+    if isinstance(obj, Container):
+        for cls, level in _CONTAINER_LEVELS:
+            if isinstance(obj, cls):
+                return level
+        return "other"
+    if isinstance(obj, (str, bytes)):
+        return "string"
+    return "other"
+
+
+def sizeof(obj, deep=True):
+    """Return the :py:class:`MemoryUsage` of `obj`.
+
+    With `deep`, the children of `obj` and the values of its attributes are
+    included, recursively; otherwise only `obj` and its attribute dict are.
+    """
+    usage = MemoryUsage()
+    seen = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIPPED):
+            continue
+        seen.add(id(obj))
+        level = _level(obj)
+        size = sys.getsizeof(obj)
+        attributes = getattr(obj, "__dict__", None)
+        if attributes is not None and not isinstance(obj, type):
+            seen.add(id(attributes))
+            size += sys.getsizeof(attributes)
+        usage.add(level, size)
+        if not deep:
+            break
+        if attributes is not None:
+            stack.extend(attributes.values())
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+    return usage
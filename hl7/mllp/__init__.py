@@ -1,21 +1,59 @@
-from .exceptions import InvalidBlockError
-from .streams import (
-    HL7StreamProtocol,
-    HL7StreamReader,
-    HL7StreamWriter,
-    MLLPStreamReader,
-    MLLPStreamWriter,
-    open_hl7_connection,
-    start_hl7_server,
-)
+import importlib
 
 __all__ = [
     "open_hl7_connection",
     "start_hl7_server",
+    "send_pipelined",
+    "serve_multiprocess",
+    "HL7ServerPool",
     "HL7StreamProtocol",
     "HL7StreamReader",
     "HL7StreamWriter",
     "MLLPStreamReader",
     "MLLPStreamWriter",
+    "MLLPBufferedProtocol",
     "InvalidBlockError",
 ]
+
+# Imported on first use, like the names of :py:mod:`hl7`, so that only the
+# modules actually used are imported (multiprocessing only for the pool)
+_LAZY = {
+    "open_hl7_connection": "streams",
+    "start_hl7_server": "streams",
+    "send_pipelined": "streams",
+    "serve_multiprocess": "multiprocess",
+    "HL7ServerPool": "multiprocess",
+    "HL7StreamProtocol": "streams",
+    "HL7StreamReader": "streams",
+    "HL7StreamWriter": "streams",
+    "MLLPStreamReader": "streams",
+    "MLLPStreamWriter": "streams",
+    "MLLPBufferedProtocol": "protocol",
+    "InvalidBlockError": "exceptions",
+}
+
+_SUBMODULES = {
+    "capture",
+    "exceptions",
+    "multiprocess",
+    "protocol",
+    "receiver",
+    "streams",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from hl7.client import open_input
+from hl7.mllp.streams import open_hl7_connection
+
+logger = logging.getLogger(__file__)
+
+#: First bytes of a capture file, followed by the records
+CAPTURE_MAGIC = b"HL7MLLPCAP\x00\x01"
+
+# Arrival time (seconds since the epoch), connection id, length of the block
+_RECORD = struct.Struct("<dII")
+
+
+class CaptureRecord(
+    namedtuple("CaptureRecord", ["timestamp", "connection_id", "block"])
+):
+    """A block received over MLLP, with its arrival `timestamp` (seconds since
+    the epoch) and the id of the connection it was received on,
+    `connection_id`.
+    """
+
+    __slots__ = ()
+
+
+class CaptureWriter:
+    """Writes :py:class:`hl7.mllp.capture.CaptureRecord` to the binary file
+    object `fileobj`, writing the :py:data:`CAPTURE_MAGIC` header first if
+    `header` is true. By default the header is written if the file is empty,
+    which cannot be told from `fileobj` when it wraps another file, e.g. a
+    :py:class:`gzip.GzipFile` appending to an existing file.
+
+    Each record is a fixed size header (arrival time, connection id and
+    length, little endian) followed by the raw MLLP block, so writing costs a
+    ``struct.pack`` and two buffered writes.
+    """
+
+    def __init__(self, fileobj, header=None):
+        self.fileobj = fileobj
+        if header is None:
+            header = not fileobj.tell()
+        if header:
+            fileobj.write(CAPTURE_MAGIC)
+
+    def write(self, block, connection_id=0, timestamp=None):
+        """Write a record for `block` and return the number of bytes written"""
+        self.fileobj.write(
+            _RECORD.pack(
+                time.time() if timestamp is None else timestamp,
+                connection_id,
+                len(block),
+            )
+        )
+        self.fileobj.write(block)
+        return _RECORD.size + len(block)
+
+
+def read_capture(fileobj):
+    """Yield the :py:class:`hl7.mllp.capture.CaptureRecord` of the capture in
+    the binary file object `fileobj`.
+
+    A truncated record at the end of the file, e.g. after a crash of the
+    receiver, is logged and ignored. Headers repeated between records, as in
+    concatenated captures, are skipped.
+    """
+    if fileobj.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+        raise ValueError("Not an HL7 MLLP capture file")
+    while True:
+        header = fileobj.read(_RECORD.size)
+        while header.startswith(CAPTURE_MAGIC):
+            header = header[len(CAPTURE_MAGIC) :] + fileobj.read(len(CAPTURE_MAGIC))
+        if not header:
+            return
+        if len(header) < _RECORD.size:
+            logger.warning("Ignoring truncated capture record")
+            return
+        timestamp, connection_id, length = _RECORD.unpack(header)
+        block = fileobj.read(length)
+        if len(block) < length:
+            logger.warning("Ignoring truncated capture record")
+            return
+        yield CaptureRecord(timestamp, connection_id, block)
+
+
+async def replay(records, host, port, *, speed=1.0, ack_timeout=10.0, **kwds):
+    """Re-send the :py:class:`hl7.mllp.capture.CaptureRecord` `records` to
+    `host` and `port`, reproducing the original inter-arrival times divided by
+    `speed` (``None`` or ``0`` sends as fast as possible).
+
+    Each original connection id is replayed over its own connection, opened
+    when its first record is sent. ACKs are read concurrently, so a slow
+    receiver does not delay the schedule; after the last record, each
+    connection waits up to `ack_timeout` seconds for its outstanding ACKs.
+    Extra keyword arguments are passed to
+    :py:func:`hl7.mllp.open_hl7_connection`.
+
+    Returns a dict with the number of ``messages`` sent, ``acks`` received,
+    ``connections``, the elapsed ``seconds`` and ``max_lag``, the largest
+    delay in seconds between the scheduled and the actual send time.
+    """
+    loop = asyncio.get_running_loop()
+    connections = {}
+    readers = []
+    counts = {"messages": 0, "acks": 0}
+    max_lag = 0.0
+    first = None
+    start = loop.time()
+
+    async def read_acks(reader, sent):
+        while True:
+            try:
+                await reader.readblock()
+            except asyncio.IncompleteReadError:
+                return
+            counts["acks"] += 1
+            sent[1] += 1
+            if sent[1] >= sent[0] and sent[2]:
+                return
+
+    for record in records:
+        if first is None:
+            first = record.timestamp
+            start = loop.time()
+        if speed:
+            scheduled = start + (record.timestamp - first) / speed
+            now = loop.time()
+            if scheduled > now:
+                await asyncio.sleep(scheduled - now)
+            max_lag = max(max_lag, loop.time() - scheduled)
+        connection = connections.get(record.connection_id)
+        if connection is None:
+            reader, writer = await open_hl7_connection(host, port, **kwds)
+            # messages sent, ACKs received, all messages sent
+            sent = [0, 0, False]
+            task = loop.create_task(read_acks(reader, sent))
+            connection = connections[record.connection_id] = (writer, sent, task)
+            readers.append(task)
+        writer, sent, task = connection
+        writer.writeblock(record.block)
+        sent[0] += 1
+        counts["messages"] += 1
+        await writer.drain()
+
+    for writer, sent, task in connections.values():
+        sent[2] = True
+        if sent[1] >= sent[0]:
+            task.cancel()
+    if readers:
+        done, pending = await asyncio.wait(readers, timeout=ack_timeout)
+        for task in pending:
+            task.cancel()
+    for writer, sent, task in connections.values():
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    return {
+        "messages": counts["messages"],
+        "acks": counts["acks"],
+        "connections": len(connections),
+        "seconds": loop.time() - start,
+        "max_lag": max_lag,
+    }
+
+
+def _speed(value):
+    import argparse
+
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or max")
+    return speed
+
+
+def mllp_replay():
+    """Command line tool to replay a capture written by ``mllp_recv --format
+    capture`` with its original timing.
+    """
+    import argparse
+
+    script_name = os.path.basename(sys.argv[0])
+    parser = argparse.ArgumentParser(usage=script_name + " [options] <server> FILE")
+    parser.add_argument(
+        "-p", "--port", type=int, dest="port", default=6661, help="port to connect to"
+    )
+    parser.add_argument(
+        "-s",
+        "--speed",
+        type=_speed,
+        dest="speed",
+        default=1.0,
+        help="replay speed factor, e.g. 1, 10 or max",
+    )
+    parser.add_argument("server")
+    parser.add_argument("filename", metavar="FILE")
+    options = parser.parse_args()
+
+    with open_input(options.filename) as f:
+        result = asyncio.run(
+            replay(read_capture(f), options.server, options.port, speed=options.speed)
+        )
+    sys.stderr.write(
+        "replayed {messages} messages over {connections} connections in "
+        "{seconds:.3f} s, {acks} ACKs, max lag {lag:.1f} ms\n".format(
+            lag=result["max_lag"] * 1000, **result
+        )
+    )
+
+
+if __name__ == "__main__":
+    mllp_replay()
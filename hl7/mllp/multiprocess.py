@@ -0,0 +1,257 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from asyncio import iscoroutine
+
+from hl7.mllp.streams import start_hl7_server
+
+# Per worker slots in the shared statistics array
+_CONNECTIONS = 0
+_MESSAGES = 1
+_SLOTS = 2
+
+
+def _reuseport_socket(host, port, backlog):
+    """Create a listening socket bound with ``SO_REUSEPORT``, so that each worker
+    process can bind the same address and the kernel balances incoming
+    connections between them.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise NotImplementedError("SO_REUSEPORT is not supported on this platform")
+    family, type_, proto, _, address = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+async def _serve_worker(
+    index,
+    client_connected_cb,
+    host,
+    port,
+    backlog,
+    shutdown_timeout,
+    stats,
+    ready,
+    kwds,
+):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    offset = index * _SLOTS
+    tasks = set()
+    readers = set()
+    closed_messages = 0
+
+    def publish():
+        messages = closed_messages + sum(
+            r.inline_parses + r.offloaded_parses for r in readers
+        )
+        stats[offset + _MESSAGES] = messages
+
+    async def counting_cb(reader, writer):
+        nonlocal closed_messages
+        stats[offset + _CONNECTIONS] += 1
+        tasks.add(asyncio.current_task())
+        readers.add(reader)
+        try:
+            res = client_connected_cb(reader, writer)
+            if iscoroutine(res):
+                await res
+        finally:
+            readers.discard(reader)
+            tasks.discard(asyncio.current_task())
+            closed_messages += reader.inline_parses + reader.offloaded_parses
+
+    sock = _reuseport_socket(host, port, backlog)
+    server = await start_hl7_server(counting_cb, sock=sock, **kwds)
+    ready.set()
+    while not stop.is_set():
+        publish()
+        try:
+            await asyncio.wait_for(stop.wait(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+    # Graceful shutdown: stop accepting, then give the open connections
+    # shutdown_timeout seconds to finish before cancelling them
+    server.close()
+    if tasks:
+        _, pending = await asyncio.wait(set(tasks), timeout=shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    publish()
+
+
+def _worker_main(*args):
+    asyncio.run(_serve_worker(*args))
+
+
+class HL7ServerPool:
+    """Run :py:func:`hl7.mllp.start_hl7_server` in several worker processes
+    listening on the same `host` and `port`, so parsing is spread over
+    multiple cores.
+
+    Each worker binds its own ``SO_REUSEPORT`` socket and the kernel
+    distributes new connections between them (Linux, BSD and macOS only).
+    `client_connected_cb` is called in the worker process exactly as for
+    :py:func:`hl7.mllp.start_hl7_server` and must be picklable when
+    `mp_context` uses the *spawn* or *forkserver* start method. The remaining
+    keyword arguments are passed to :py:func:`hl7.mllp.start_hl7_server`.
+
+    :py:meth:`stop` sends ``SIGTERM`` to the workers, which stop accepting
+    connections and wait up to `shutdown_timeout` seconds for the open ones
+    to finish. :py:meth:`stats` aggregates the connection and message counts
+    reported by the workers (refreshed every second).
+
+    The pool can be used as a context manager::
+
+        with HL7ServerPool(process_hl7_messages, port=2575, workers=4) as pool:
+            ...
+    """
+
+    def __init__(
+        self,
+        client_connected_cb,
+        host=None,
+        port=None,
+        *,
+        workers=None,
+        backlog=100,
+        shutdown_timeout=10.0,
+        mp_context=None,
+        **kwds,
+    ):
+        self.client_connected_cb = client_connected_cb
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.backlog = backlog
+        self.shutdown_timeout = shutdown_timeout
+        self.kwds = kwds
+        self._context = mp_context or multiprocessing.get_context()
+        self._stats = self._context.RawArray("Q", self.workers * _SLOTS)
+        self._processes = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.stop()
+
+    def start(self, timeout=10.0):
+        """Start the worker processes and wait until all of them are listening."""
+        events = []
+        for index in range(self.workers):
+            ready = self._context.Event()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(
+                    index,
+                    self.client_connected_cb,
+                    self.host,
+                    self.port,
+                    self.backlog,
+                    self.shutdown_timeout,
+                    self._stats,
+                    ready,
+                    self.kwds,
+                ),
+                name="hl7-mllp-worker-{0}".format(index),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            events.append(ready)
+        for process, ready in zip(self._processes, events):
+            if not ready.wait(timeout):
+                self.stop()
+                raise RuntimeError(
+                    "Worker {0} failed to start (exit code {1})".format(
+                        process.name, process.exitcode
+                    )
+                )
+
+    def stop(self, timeout=None):
+        """Gracefully stop the workers, killing any that have not exited after
+        `timeout` seconds (defaults to `shutdown_timeout` plus a margin).
+        """
+        if timeout is None:
+            timeout = self.shutdown_timeout + 5
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def is_alive(self):
+        """``True`` while any of the worker processes is running"""
+        return any(process.is_alive() for process in self._processes)
+
+    def stats(self):
+        """Return the aggregated ``connections`` and ``messages`` counts of all
+        workers, together with the ``per_worker`` values.
+        """
+        values = list(self._stats)
+        per_worker = [
+            {
+                "connections": values[i + _CONNECTIONS],
+                "messages": values[i + _MESSAGES],
+            }
+            for i in range(0, len(values), _SLOTS)
+        ]
+        return {
+            "workers": self.workers,
+            "connections": sum(w["connections"] for w in per_worker),
+            "messages": sum(w["messages"] for w in per_worker),
+            "per_worker": per_worker,
+        }
+
+
+def serve_multiprocess(
+    client_connected_cb, host=None, port=None, *, workers=None, **kwds
+):
+    """Serve `client_connected_cb` on `host` and `port` from `workers` processes
+    (defaults to the number of CPUs) until ``SIGINT`` or ``SIGTERM`` is
+    received, then shut the workers down gracefully and return the aggregated
+    statistics (see :py:meth:`hl7.mllp.HL7ServerPool.stats`).
+
+    Accepts the same keyword arguments as :py:class:`hl7.mllp.HL7ServerPool`.
+    Must be called from the main thread.
+    """
+    stop = threading.Event()
+    previous = {
+        signum: signal.signal(signum, lambda *args: stop.set())
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    pool = HL7ServerPool(client_connected_cb, host, port, workers=workers, **kwds)
+    try:
+        pool.start()
+        while not stop.is_set() and pool.is_alive():
+            stop.wait(1)
+    finally:
+        pool.stop()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    return pool.stats()
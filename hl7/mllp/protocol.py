@@ -0,0 +1,116 @@
+from asyncio import BufferedProtocol
+from asyncio.streams import _DEFAULT_LIMIT
+
+from hl7.mllp.exceptions import InvalidBlockError
+
+START_BLOCK = b"\x0b"
+END_BLOCK = b"\x1c"
+CARRIAGE_RETURN = b"\x0d"
+
+_TERMINATOR = END_BLOCK + CARRIAGE_RETURN
+
+
+class MLLPBufferedProtocol(BufferedProtocol):
+    """Low-copy MLLP framing protocol based on :py:class:`asyncio.BufferedProtocol`.
+
+    The transport reads directly into a preallocated buffer of
+    `buffer_size` bytes. Each complete block (*<VT>data<FS><CR>*) is passed
+    to ``block_received_cb(block, protocol)`` as a :py:class:`memoryview` of
+    that buffer, without the MLLP framing characters and without copying.
+
+    The memoryview is only valid for the duration of the callback, since the
+    buffer is reused for the following blocks. Call ``bytes(block)`` or
+    ``block.tobytes()`` to keep the data.
+
+    Only the partial block left at the end of the buffer is moved back to the
+    start when the buffer fills up. If a single block does not fit, the
+    buffer is doubled, up to `limit` bytes. A block larger than `limit` raises
+    `ValueError` and a block not starting with *<VT>* raises
+    :py:class:`hl7.mllp.InvalidBlockError`; either closes the connection.
+
+    Use with `loop.create_server()` or `loop.create_connection()`::
+
+        def on_block(block, protocol):
+            ack = handle(hl7.parse(block.tobytes()))
+            protocol.write_block(str(ack).encode())
+
+        server = await loop.create_server(
+            lambda: MLLPBufferedProtocol(on_block), port=2575
+        )
+    """
+
+    def __init__(
+        self, block_received_cb, buffer_size=_DEFAULT_LIMIT, limit=_DEFAULT_LIMIT
+    ):
+        self._block_received_cb = block_received_cb
+        self._limit = limit
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        # Unconsumed data lives in self._buffer[self._start:self._end]. The
+        # terminator search resumes at self._scan so each byte is only
+        # scanned once.
+        self._start = 0
+        self._end = 0
+        self._scan = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def get_buffer(self, sizehint):
+        if self._end == len(self._buffer):
+            self._make_room()
+        return self._view[self._end :]
+
+    def buffer_updated(self, nbytes):
+        self._end += nbytes
+        buffer = self._buffer
+        while True:
+            end = buffer.find(_TERMINATOR, self._scan, self._end)
+            if end < 0:
+                # The terminator may straddle the next read
+                self._scan = max(self._end - 1, self._start)
+                if self._end - self._start > self._limit + len(_TERMINATOR) + 1:
+                    raise ValueError("MLLP block exceeds the limit")
+                break
+            if buffer[self._start] != START_BLOCK[0]:
+                raise InvalidBlockError(
+                    "Block does not begin with Start Block character <VT>"
+                )
+            self._block_received_cb(self._view[self._start + 1 : end], self)
+            self._start = self._scan = end + len(_TERMINATOR)
+        if self._start == self._end:
+            # Everything consumed, start again at the beginning of the buffer
+            self._start = self._end = self._scan = 0
+
+    def eof_received(self):
+        # Close the transport
+        return False
+
+    def write_block(self, data):
+        """Write *data* (bytes-like) wrapped in the MLLP framing characters,
+        passed to the transport's ``writelines``. Only on Python 3.12 and later
+        is this a vectored write without concatenating *data* with the framing
+        characters; older versions join them into one buffer.
+        """
+        self.transport.writelines((START_BLOCK, data, _TERMINATOR))
+
+    def _make_room(self):
+        pending = self._end - self._start
+        if self._start > 0:
+            # Move the partial block to the beginning of the buffer
+            self._view[:pending] = bytes(self._view[self._start : self._end])
+        else:
+            size = len(self._buffer)
+            if size >= self._limit + len(_TERMINATOR) + 1:
+                raise ValueError("MLLP block exceeds the limit")
+            buffer = bytearray(min(size * 2, self._limit + len(_TERMINATOR) + 1))
+            buffer[:pending] = self._view[:pending]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        self._scan -= self._start
+        self._start = 0
+        self._end = pending
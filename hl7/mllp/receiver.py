@@ -0,0 +1,441 @@
+import asyncio
+import gzip
+import logging
+import os
+import signal
+import sys
+import time
+from asyncio import IncompleteReadError
+
+from hl7.mllp.capture import CaptureWriter
+from hl7.mllp.streams import (
+    CARRIAGE_RETURN,
+    END_BLOCK,
+    START_BLOCK,
+    start_hl7_server,
+)
+from hl7.parser import parse as hl7_parse
+
+logger = logging.getLogger(__file__)
+
+ACK_CODES = ("AA", "AE", "AR", "CA", "CE", "CR")
+
+
+class RotatingFileSink:
+    """Appends MLLP framed messages (*<VT>message<FS><CR>*, the format read by
+    ``mllp_send``) to files.
+
+    If `path` is a directory (or ends with a path separator), a new file named
+    after the current time is started whenever `max_bytes` of messages have
+    been written to the current one. Otherwise all messages are appended to
+    the file at `path`.
+
+    With `compress`, files are written with gzip (``.gz`` is appended to the
+    generated file names).
+
+    With `format` ``"capture"``, messages are written as
+    :py:class:`hl7.mllp.capture.CaptureWriter` records, keeping their arrival
+    time and connection id so the traffic can be replayed with its original
+    timing (generated file names end with ``.cap``).
+
+    Files are flushed and ``fsync``-ed once `fsync_count` messages have been
+    written or `fsync_interval` seconds have passed since the last sync,
+    instead of after each message. :py:meth:`maybe_sync` should also be
+    called every `fsync_interval` seconds, so the last messages of a burst
+    are not left unsynced while no more messages arrive.
+
+    With `sync_on_write` false, :py:meth:`write` does not sync and the
+    caller syncs when :py:attr:`sync_due`, e.g. with :py:meth:`sync_async`
+    so the ``fsync`` does not block an event loop, as
+    :py:func:`start_receiver` does.
+    """
+
+    def __init__(
+        self,
+        path,
+        max_bytes=100 * 1024 * 1024,
+        compress=False,
+        fsync_count=1000,
+        fsync_interval=1.0,
+        format="mllp",
+        sync_on_write=True,
+    ):
+        if format not in ("mllp", "capture"):
+            raise ValueError("Unknown format: %r" % format)
+        self.path = path
+        self.directory = os.path.isdir(path) or path.endswith(os.sep)
+        if self.directory:
+            os.makedirs(path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.fsync_count = fsync_count
+        self.fsync_interval = fsync_interval
+        self.format = format
+        self.sync_on_write = sync_on_write
+        self.files = []
+        self._file = None
+        self._capture = None
+        self._raw = None
+        self._written = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _filename(self):
+        if not self.directory:
+            return self.path
+        base = time.strftime("hl7-%Y%m%d-%H%M%S")
+        suffix = ".cap" if self.format == "capture" else ".hl7"
+        if self.compress:
+            suffix += ".gz"
+        name = os.path.join(self.path, base + suffix)
+        count = 1
+        while os.path.exists(name) or name in self.files:
+            name = os.path.join(self.path, "{0}-{1}{2}".format(base, count, suffix))
+            count += 1
+        return name
+
+    def _open(self):
+        filename = self._filename()
+        self._raw = open(filename, "ab")
+        # Before GzipFile writes its header; its own position starts at 0
+        empty = not self._raw.tell()
+        if self.compress:
+            self._file = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        else:
+            self._file = self._raw
+        if self.format == "capture":
+            self._capture = CaptureWriter(self._file, header=empty)
+        self.files.append(filename)
+        self._written = 0
+
+    def write(self, block, connection_id=0):
+        """Write the MLLP `block` (without framing characters), received on
+        the connection `connection_id`
+        """
+        if self._file is None:
+            self._open()
+        elif self.directory and self._written >= self.max_bytes:
+            self.close()
+            self._open()
+        if self._capture is not None:
+            self._written += self._capture.write(block, connection_id)
+        else:
+            self._file.write(START_BLOCK)
+            self._file.write(block)
+            self._file.write(END_BLOCK + CARRIAGE_RETURN)
+            self._written += len(block) + 3
+        self._unsynced += 1
+        if self.sync_on_write and self.sync_due:
+            self.sync()
+
+    @property
+    def sync_due(self):
+        """``True`` once `fsync_count` messages have been written since the
+        last sync, or `fsync_interval` seconds have passed since it
+        """
+        return bool(self._unsynced) and (
+            self._unsynced >= self.fsync_count
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        )
+
+    def maybe_sync(self):
+        """Sync if there are unsynced messages older than `fsync_interval`"""
+        if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Flush the written messages and ``fsync`` them to disk"""
+        if self._file is not None:
+            self._flush()
+            os.fsync(self._raw.fileno())
+
+    async def sync_async(self):
+        """:py:meth:`sync`, with the ``fsync`` run in the event loop's default
+        executor. The buffers are flushed on the event loop, so writes may go
+        on while the data is synced.
+        """
+        self._flush()
+        if self._file is None:
+            return
+        # A duplicate, so closing the file when rotating cannot close the
+        # descriptor while it is being synced
+        fd = os.dup(self._raw.fileno())
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, fd)
+        finally:
+            os.close(fd)
+
+    def _flush(self):
+        if self._file is not None:
+            self._file.flush()
+            if self._file is not self._raw:
+                self._raw.flush()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            if self._file is not self._raw:
+                self._file.close()
+            self._raw.close()
+            self._file = self._raw = self._capture = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.close()
+
+
+class ReceiverStats:
+    """Counters updated by the receiver started with :py:func:`start_receiver`"""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+
+
+def _ack(block, ack_code, encoding, encoding_errors):
+    """Create the ACK of `block`. Only the MSH segment is needed, so only the
+    MSH segment is parsed.
+    """
+    end = block.find(CARRIAGE_RETURN)
+    msh = block[:end] if end >= 0 else block
+    message = hl7_parse(bytes(msh).decode(encoding, encoding_errors))
+    return message.create_ack(ack_code)
+
+
+async def start_receiver(
+    sink,
+    host=None,
+    port=None,
+    *,
+    ack_code="AA",
+    stats=None,
+    connections=None,
+    **kwds,
+):
+    """Start an MLLP server writing each received block to `sink` (e.g. a
+    :py:class:`hl7.mllp.receiver.RotatingFileSink`), together with the id of
+    the connection it arrived on, and answering with an ACK
+    with `ack_code`, or no ACK if `ack_code` is ``None``. When the sink has
+    a ``sync_due`` attribute, it is synced with its ``sync_async`` method
+    once that is true.
+
+    The remaining arguments are passed to :py:func:`hl7.mllp.start_hl7_server`.
+    Returns the server; `stats`, if given, is a
+    :py:class:`hl7.mllp.receiver.ReceiverStats` updated as messages arrive.
+    The handler task of each open connection is added to the set
+    `connections`, if given, so they can be closed with
+    :py:func:`close_receiver`.
+    """
+    if stats is None:
+        stats = ReceiverStats()
+    if connections is None:
+        connections = set()
+
+    async def handle(reader, writer):
+        task = asyncio.current_task()
+        connections.add(task)
+        stats.connections += 1
+        connection_id = stats.connections
+        try:
+            while True:
+                block = await reader.readblock()
+                sink.write(block, connection_id)
+                if getattr(sink, "sync_due", False):
+                    await sink.sync_async()
+                stats.messages += 1
+                stats.bytes += len(block)
+                if ack_code is not None:
+                    writer.writemessage(
+                        _ack(block, ack_code, reader.encoding, reader.encoding_errors)
+                    )
+                    await writer.drain()
+        except IncompleteReadError:
+            pass
+        except Exception:
+            logger.exception(
+                "Error receiving from %s", writer.get_extra_info("peername")
+            )
+        finally:
+            connections.discard(task)
+            writer.close()
+
+    return await start_hl7_server(handle, host, port, **kwds)
+
+
+async def close_receiver(server, connections):
+    """Stop `server` from accepting connections, then cancel the handler
+    tasks of its open `connections` (see :py:func:`start_receiver`) and wait
+    for them and the server to close.
+
+    On Python 3.12 and later, ``Server.wait_closed()`` waits for every
+    connection to close, so a sender keeping an idle connection open would
+    otherwise keep the receiver from stopping.
+    """
+    server.close()
+    tasks = set(connections)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks)
+    await server.wait_closed()
+
+
+async def _sync_periodically(sink, interval):
+    """Sync `sink` every `interval` seconds if it has unsynced messages,
+    until cancelled
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if sink.sync_due:
+            await sink.sync_async()
+
+
+async def _receive(options, sink, stop=None):
+    stats = ReceiverStats()
+    connections = set()
+    server = await start_receiver(
+        sink,
+        options.host,
+        options.port,
+        ack_code=None if options.ack == "none" else options.ack,
+        stats=stats,
+        connections=connections,
+        encoding=options.encoding,
+    )
+    loop = asyncio.get_running_loop()
+    if stop is None:
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:  # pragma: no cover
+                pass
+
+    syncer = loop.create_task(_sync_periodically(sink, options.fsync_interval))
+    last_time, last_messages, last_bytes = time.monotonic(), 0, 0
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), options.stats_interval)
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            elapsed = now - last_time
+            if options.verbose and elapsed > 0:
+                sys.stderr.write(
+                    "{0} messages, {1:.1f} msg/s, {2:.2f} MB/s, {3} connections\n".format(
+                        stats.messages,
+                        (stats.messages - last_messages) / elapsed,
+                        (stats.bytes - last_bytes) / elapsed / 1e6,
+                        stats.connections,
+                    )
+                )
+            last_time, last_messages, last_bytes = now, stats.messages, stats.bytes
+    finally:
+        syncer.cancel()
+        await close_receiver(server, connections)
+    return stats
+
+
+def mllp_recv():
+    """Command line tool to receive messages from MLLP senders into files"""
+    import argparse
+
+    script_name = os.path.basename(sys.argv[0])
+    parser = argparse.ArgumentParser(usage=script_name + " [options] --out DIR|FILE")
+    parser.add_argument("--host", dest="host", default=None, help="address to bind")
+    parser.add_argument(
+        "-p", "--port", type=int, dest="port", default=2575, help="port to listen on"
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        dest="out",
+        required=True,
+        metavar="DIR|FILE",
+        help="directory to write rotating files to, or a single file",
+    )
+    parser.add_argument(
+        "--ack",
+        dest="ack",
+        default="AA",
+        choices=ACK_CODES + ("none",),
+        help="acknowledgment code to answer with, or none",
+    )
+    parser.add_argument(
+        "-z", "--gzip", action="store_true", dest="compress", help="gzip the files"
+    )
+    parser.add_argument(
+        "--format",
+        dest="format",
+        default="mllp",
+        choices=("mllp", "capture"),
+        help="write MLLP framed messages, or a capture for mllp_replay",
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        dest="max_bytes",
+        default=100 * 1024 * 1024,
+        help="size at which a new file is started, when writing to a directory",
+    )
+    parser.add_argument(
+        "--fsync-count",
+        type=int,
+        dest="fsync_count",
+        default=1000,
+        help="sync to disk every FSYNC_COUNT messages",
+    )
+    parser.add_argument(
+        "--fsync-interval",
+        type=float,
+        dest="fsync_interval",
+        default=1.0,
+        help="sync to disk at least every FSYNC_INTERVAL seconds",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        dest="stats_interval",
+        default=5.0,
+        help="seconds between throughput reports",
+    )
+    parser.add_argument(
+        "--encoding", dest="encoding", default=None, help="encoding of the messages"
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_false",
+        dest="verbose",
+        default=True,
+        help="do not print throughput statistics to stderr",
+    )
+    options = parser.parse_args()
+
+    with RotatingFileSink(
+        options.out,
+        max_bytes=options.max_bytes,
+        compress=options.compress,
+        fsync_count=options.fsync_count,
+        fsync_interval=options.fsync_interval,
+        format=options.format,
+        sync_on_write=False,
+    ) as sink:
+        stats = asyncio.run(_receive(options, sink))
+    elapsed = time.monotonic() - stats.start
+    sys.stderr.write(
+        "received {0} messages in {1:.1f} s on {2} connections\n".format(
+            stats.messages, elapsed, stats.connections
+        )
+    )
+
+
+if __name__ == "__main__":
+    mllp_recv()
@@ -1,20 +1,27 @@
+import time
 import warnings
 from asyncio import (
+    IncompleteReadError,
     LimitOverrunError,
     StreamReader,
     StreamReaderProtocol,
     StreamWriter,
+    TimeoutError,
     get_event_loop,
+    get_running_loop,
     iscoroutine,
+    wait_for,
 )
 from asyncio.streams import _DEFAULT_LIMIT
 
+from hl7 import instrument
 from hl7.mllp.exceptions import InvalidBlockError
 from hl7.parser import parse as hl7_parse
 
 START_BLOCK = b"\x0b"
 END_BLOCK = b"\x1c"
 CARRIAGE_RETURN = b"\x0d"
+_TERMINATOR = END_BLOCK + CARRIAGE_RETURN
 
 
 async def open_hl7_connection(
@@ -25,6 +32,8 @@ async def open_hl7_connection(
     limit=_DEFAULT_LIMIT,
     encoding=None,
     encoding_errors=None,
+    executor=None,
+    offload_threshold=None,
     **kwds,
 ):
     """A wrapper for `loop.create_connection()` returning a (reader, writer) pair.
@@ -39,8 +48,9 @@ async def open_hl7_connection(
     Additional optional keyword arguments are `loop` (to set the event loop
     instance to use), `limit` (to set the buffer limit passed to the
     :py:class:`hl7.mllp.HL7StreamReader`), `encoding` (to set the encoding on the :py:class:`hl7.mllp.HL7StreamReader`
-    and :py:class:`hl7.mllp.HL7StreamWriter`) and `encoding_errors` (to set the encoding_errors on the :py:class:`hl7.mllp.HL7StreamReader`
-    and :py:class:`hl7.mllp.HL7StreamWriter`).
+    and :py:class:`hl7.mllp.HL7StreamWriter`), `encoding_errors` (to set the encoding_errors on the :py:class:`hl7.mllp.HL7StreamReader`
+    and :py:class:`hl7.mllp.HL7StreamWriter`) and `executor` / `offload_threshold`
+    (passed to the :py:class:`hl7.mllp.HL7StreamReader`).
     """
     if loop is None:
         loop = get_event_loop()
@@ -52,7 +62,12 @@ async def open_hl7_connection(
             stacklevel=2,
         )
     reader = HL7StreamReader(
-        limit=limit, loop=loop, encoding=encoding, encoding_errors=encoding_errors
+        limit=limit,
+        loop=loop,
+        encoding=encoding,
+        encoding_errors=encoding_errors,
+        executor=executor,
+        offload_threshold=offload_threshold,
     )
     protocol = HL7StreamProtocol(
         reader, loop=loop, encoding=encoding, encoding_errors=encoding_errors
@@ -73,6 +88,8 @@ async def start_hl7_server(
     limit=_DEFAULT_LIMIT,
     encoding=None,
     encoding_errors=None,
+    executor=None,
+    offload_threshold=None,
     **kwds,
 ):
     """Start a socket server, call back for each client connected.
@@ -92,8 +109,9 @@ async def start_hl7_server(
 
     The return value is the same as `loop.create_server()`.
     Additional optional keyword arguments are `loop` (to set the event loop
-    instance to use) and `limit` (to set the buffer limit passed to the
-    StreamReader).
+    instance to use), `limit` (to set the buffer limit passed to the
+    StreamReader) and `executor` / `offload_threshold` (passed to each
+    :py:class:`hl7.mllp.HL7StreamReader`).
 
     The return value is the same as `loop.create_server()`, i.e. a
     `Server` object which can be used to stop the service.
@@ -110,7 +128,12 @@ async def start_hl7_server(
 
     def factory():
         reader = HL7StreamReader(
-            limit=limit, loop=loop, encoding=encoding, encoding_errors=encoding_errors
+            limit=limit,
+            loop=loop,
+            encoding=encoding,
+            encoding_errors=encoding_errors,
+            executor=executor,
+            offload_threshold=offload_threshold,
         )
         protocol = HL7StreamProtocol(
             reader,
@@ -186,6 +209,74 @@ class MLLPStreamWriter(StreamWriter):
         """
         self.write(START_BLOCK + data + END_BLOCK + CARRIAGE_RETURN)
 
+    def writeblocks(self, blocks):
+        """Write several blocks of data to the stream, each encapsulated as in
+        :py:meth:`writeblock`.
+
+        The framing characters and the blocks are passed to the transport in
+        a single ``writelines`` call instead of one write per block. On
+        Python 3.12 and later, the selector transports send them with a
+        vectored write (``sendmsg``) without copying them; older versions
+        join them into one buffer first.
+        """
+        parts = []
+        for data in blocks:
+            parts += (START_BLOCK, data, _TERMINATOR)
+        if parts:
+            self.writelines(parts)
+
+    async def sendblocks(self, blocks, batch_size=256):
+        """Write the blocks from the (possibly very long) iterable `blocks`,
+        `batch_size` blocks per :py:meth:`writeblocks` call, and drain the
+        stream after each batch.
+
+        Draining only waits when the transport's write buffer is above its
+        high-water mark, so bursts are written without pausing while the
+        memory used by a large backlog stays bounded.
+        """
+        batch = []
+        for data in blocks:
+            batch.append(data)
+            if len(batch) >= batch_size:
+                self.writeblocks(batch)
+                batch = []
+                await self.drain()
+        self.writeblocks(batch)
+        await self.drain()
+
+
+async def send_pipelined(reader, writer, blocks, window=16):
+    """Write each of `blocks` with :py:meth:`MLLPStreamWriter.writeblock` and
+    yield the blocks read from `reader` in answer, in the same order: the
+    asyncio counterpart of :py:meth:`hl7.client.MLLPClient.send_pipelined`.
+
+    Up to `window` blocks are written before waiting for the first answer.
+    `blocks` may be an iterable or an asynchronous iterable, e.g. one that
+    paces the sends; it is consumed lazily, so it can stop sending based on
+    the answers already yielded.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if not hasattr(blocks, "__aiter__"):
+        blocks = _aiter(blocks)
+    outstanding = 0
+    async for block in blocks:
+        writer.writeblock(block)
+        outstanding += 1
+        if outstanding >= window:
+            await writer.drain()
+            yield await reader.readblock()
+            outstanding -= 1
+    await writer.drain()
+    while outstanding:
+        yield await reader.readblock()
+        outstanding -= 1
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
 
 class HL7StreamProtocol(StreamReaderProtocol):
     def __init__(
@@ -235,13 +326,55 @@ class HL7StreamProtocol(StreamReaderProtocol):
             self._strong_reader = None
 
 
+def _parse_block(block, encoding, encoding_errors):
+    """Decode and parse an MLLP block. Module level so it can be pickled
+    when sent to a :py:class:`concurrent.futures.ProcessPoolExecutor`.
+    """
+    if instrument.active:
+        return hl7_parse(instrument.timed_decode(block, encoding, encoding_errors))
+    return hl7_parse(block.decode(encoding, encoding_errors))
+
+
 class HL7StreamReader(MLLPStreamReader):
+    """A :py:class:`hl7.mllp.MLLPStreamReader` that parses each block into an
+    :py:class:`hl7.Message`.
+
+    Parsing is CPU bound and by default runs on the event loop thread.  If
+    `offload_threshold` is set, blocks of at least that many bytes are
+    decoded and parsed in `executor` instead (``None`` uses the loop's
+    default executor), so one very large message does not stall every other
+    connection.  Use ``offload_threshold=0`` to always offload.  A
+    :py:class:`concurrent.futures.ProcessPoolExecutor` avoids contention on
+    the GIL, at the cost of pickling the parsed message back.
+
+    The time spent parsing on the event loop thread is recorded in
+    :py:attr:`inline_parse_time` (total seconds) and
+    :py:attr:`max_inline_parse_time` (worst single message), which is the
+    event loop lag the reader causes and can be used to tune the threshold.
+    :py:attr:`inline_parses` and :py:attr:`offloaded_parses` count the
+    messages parsed each way.
+    """
+
     def __init__(
-        self, limit=_DEFAULT_LIMIT, loop=None, encoding=None, encoding_errors=None
+        self,
+        limit=_DEFAULT_LIMIT,
+        loop=None,
+        encoding=None,
+        encoding_errors=None,
+        executor=None,
+        offload_threshold=None,
     ):
         super().__init__(limit=limit, loop=loop)
         self.encoding = encoding
         self.encoding_errors = encoding_errors
+        self.executor = executor
+        self.offload_threshold = offload_threshold
+        # Raised by the next read, see readmessages
+        self._deferred_error = None
+        self.inline_parses = 0
+        self.offloaded_parses = 0
+        self.inline_parse_time = 0.0
+        self.max_inline_parse_time = 0.0
 
     @property
     def encoding(self):
@@ -275,9 +408,89 @@ class HL7StreamReader(MLLPStreamReader):
 
         If an invalid MLLP block is encountered, :py:class:`hl7.mllp.InvalidBlockError` will be
         raised.
+
+        Blocks of at least `offload_threshold` bytes are parsed in `executor`
+        rather than on the event loop thread.
         """
+        if self._deferred_error is not None:
+            error, self._deferred_error = self._deferred_error, None
+            raise error
         block = await self.readblock()
-        return hl7_parse(block.decode(self.encoding, self.encoding_errors))
+        return await self._parse(block)
+
+    async def readmessages(self, max_count, max_delay=0.0):
+        """Reads up to `max_count` HL7 messages, returned as a list of
+        :py:class:`hl7.Message`.
+
+        Waits for the first message, then returns the messages whose blocks
+        are already buffered, waiting at most `max_delay` seconds in total for
+        more to arrive. This hands out micro-batches, e.g. for bulk database
+        inserts, without adding latency when traffic is light.
+
+        Returns an empty list if the stream is at EOF. Errors are raised as
+        in :py:meth:`readmessage`; an error reading a message after the first
+        one ends the batch, and is raised by the next read instead, so the
+        messages already read are not lost.
+        """
+        loop = get_running_loop()
+        try:
+            messages = [await self.readmessage()]
+        except IncompleteReadError as e:
+            if e.partial:
+                raise
+            return []
+        deadline = loop.time() + max_delay
+        while len(messages) < max_count:
+            if self._buffer.find(_TERMINATOR) < 0:
+                remaining = deadline - loop.time()
+                if self._eof or self._exception or remaining <= 0:
+                    break
+                try:
+                    # Only wait for data, never cancel a partially consumed
+                    # read
+                    await wait_for(self._wait_for_data("readmessages"), remaining)
+                except TimeoutError:
+                    break
+                continue
+            try:
+                messages.append(await self.readmessage())
+            except Exception as e:
+                self._deferred_error = e
+                break
+        return messages
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Iterate over the messages of the stream with ``async for``, until
+        the stream reaches EOF.
+        """
+        try:
+            return await self.readmessage()
+        except IncompleteReadError as e:
+            if e.partial:
+                raise
+            raise StopAsyncIteration
+
+    async def _parse(self, block):
+        if self.offload_threshold is not None and len(block) >= self.offload_threshold:
+            self.offloaded_parses += 1
+            return await get_running_loop().run_in_executor(
+                self.executor,
+                _parse_block,
+                block,
+                self.encoding,
+                self.encoding_errors,
+            )
+        start = time.perf_counter()
+        message = _parse_block(block, self.encoding, self.encoding_errors)
+        elapsed = time.perf_counter() - start
+        self.inline_parses += 1
+        self.inline_parse_time += elapsed
+        if elapsed > self.max_inline_parse_time:
+            self.max_inline_parse_time = elapsed
+        return message
 
 
 class HL7StreamWriter(MLLPStreamWriter):
@@ -311,3 +524,25 @@ class HL7StreamWriter(MLLPStreamWriter):
     def writemessage(self, message):
         """Writes an :py:class:`hl7.Message` to the stream."""
         self.writeblock(str(message).encode(self.encoding, self.encoding_errors))
+
+    def writemessages(self, messages):
+        """Writes several :py:class:`hl7.Message` to the stream, using a single
+        :py:meth:`writeblocks` call.
+        """
+        self.writeblocks(
+            str(message).encode(self.encoding, self.encoding_errors)
+            for message in messages
+        )
+
+    async def sendmessages(self, messages, batch_size=256):
+        """Writes the :py:class:`hl7.Message` from the iterable `messages`,
+        draining the stream every `batch_size` messages (see
+        :py:meth:`sendblocks`).
+        """
+        await self.sendblocks(
+            (
+                str(message).encode(self.encoding, self.encoding_errors)
+                for message in messages
+            ),
+            batch_size,
+        )
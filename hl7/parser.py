@@ -1,10 +1,23 @@
+import re
 from string import whitespace
+from time import perf_counter
 
+from . import instrument
 from .containers import Factory
 from .exceptions import ParseException
-from .util import isbatch, isfile, ishl7
+from .util import classify
 
 _HL7_WHITESPACE = whitespace.replace("\r", "")
+# Line breaks other than a carriage return, and whitespace starting a line,
+# which the line by line split of batches and files normalizes
+_LINE_BREAKS = "\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+_INDENTED_LINE_RE = re.compile(r"\r[^\S\r]")
+
+
+def _decode(data, encoding):
+    if instrument.active:
+        return instrument.timed_decode(data, encoding)
+    return data.decode(encoding)
 
 
 def parse_hl7(line, encoding="utf-8", factory=Factory):
@@ -42,26 +55,37 @@ def parse_hl7(line, encoding="utf-8", factory=Factory):
     # Ensure we are working with unicode data, decode the bytestring
     # if needed
     if isinstance(line, bytes):
-        line = line.decode(encoding)
+        line = _decode(line, encoding)
+    # Determine the kind of input and its boundaries with a single scan
+    classification = classify(line)
+    kind = classification.kind
     # If it is an HL7 message, parse as normal
-    if ishl7(line):
-        return parse(line, encoding=encoding, factory=factory)
+    if kind == "message":
+        return parse(
+            line, encoding=encoding, factory=factory, classification=classification
+        )
     # If we have a batch, then parse the batch
-    elif isbatch(line):
-        return parse_batch(line, encoding=encoding, factory=factory)
+    elif kind == "batch":
+        return parse_batch(
+            line, encoding=encoding, factory=factory, classification=classification
+        )
     # If we have a file, parse the HL7 file
-    elif isfile(line):
-        return parse_file(line, encoding=encoding, factory=factory)
+    elif kind == "file":
+        return parse_file(
+            line, encoding=encoding, factory=factory, classification=classification
+        )
     # Not an HL7 message
     raise ValueError("line is not HL7")
 
 
-def parse(lines, encoding="utf-8", factory=Factory):
+def parse(lines, encoding="utf-8", factory=Factory, *, classification=None):
     """Returns a instance of the :py:class:`hl7.Message` that allows
     indexed access to the data elements.
 
     A custom :py:class:`hl7.Factory` subclass can be passed in to be used when
-    constructing the message and its components.
+    constructing the message and its components. `classification`, the
+    result of :py:func:`hl7.classify` for the (decoded) `lines`, lets the
+    whitespace around the message be sliced off instead of stripped.
 
     .. note::
 
@@ -90,15 +114,81 @@ def parse(lines, encoding="utf-8", factory=Factory):
     # Ensure we are working with unicode data, decode the bytestring
     # if needed
     if isinstance(lines, bytes):
-        lines = lines.decode(encoding)
+        lines = _decode(lines, encoding)
+    if instrument.active:
+        return _parse_timed(lines, factory, classification)
     # Strip out unnecessary whitespace
-    strmsg = lines.strip()
+    strmsg = _stripped(lines, classification)
     # The method for parsing the message
     plan = create_parse_plan(strmsg, factory)
     # Start splitting the methods based upon the ParsePlan
     return _split(strmsg, plan)
 
 
+def _parse_timed(lines, factory, classification):
+    """:py:func:`parse` reporting its stages to :py:mod:`hl7.instrument`"""
+    timings = instrument._Timings()
+    start = perf_counter()
+    strmsg = _stripped(lines, classification)
+    plan = _TimedPlan.timing(create_parse_plan(strmsg, factory), timings)
+    timings.add("plan", perf_counter() - start)
+    message = _split(strmsg, plan)
+    timings.add("parse", perf_counter() - start)
+    timings.flush()
+    return message
+
+
+def _stripped(lines, classification):
+    """`lines` without its leading and trailing whitespace, sliced at the
+    bounds of its `classification` if there is one
+    """
+    if classification is None:
+        return lines.strip()
+    return lines[classification.start : classification.end]
+
+
+def _batch_lines(lines, classification):
+    """Yield the lines of a batch or file, stripped of whitespace other than
+    the carriage returns.
+
+    When the `classification` of a batch or file is given and the segments
+    are separated by single carriage returns, the text is sliced at the classification offsets
+    instead: each header or trailer segment is yielded, followed by the
+    other segments up to the next offset in one piece.
+    """
+    # Only batches and files are classified with their envelope segments
+    if classification is not None and classification.kind in ("batch", "file"):
+        start, end = classification.start, classification.end
+        offsets = classification.offsets
+        if (
+            offsets
+            and offsets[0] == start
+            and not lines[:start].strip(_HL7_WHITESPACE)
+            and lines.count("\r", end) <= 1
+            and not any(lines.find(char, start, end) >= 0 for char in _LINE_BREAKS)
+            and not _INDENTED_LINE_RE.search(lines, start, end)
+        ):
+            for offset, next_offset in zip(offsets, offsets[1:] + (end,)):
+                line_end = lines.find("\r", offset, next_offset) + 1
+                if not line_end:
+                    yield lines[offset:next_offset]
+                    continue
+                yield lines[offset:line_end]
+                if line_end < next_offset:
+                    yield lines[line_end:next_offset]
+            return
+    # Split the text into lines, retaining the ends
+    for line in lines.strip(_HL7_WHITESPACE).splitlines(keepends=True):
+        # strip out all whitespace MINUS the '\r'
+        yield line.strip(_HL7_WHITESPACE)
+
+
+def _first_line(line):
+    """The first segment of a piece yielded by :py:func:`_batch_lines`"""
+    head, separator, _ = line.partition("\r")
+    return head + separator
+
+
 def _create_batch(batch, messages, encoding, factory):
     """Creates a :py:class:`hl7.Batch`"""
     kwargs = {
@@ -124,12 +214,14 @@ def _create_batch(batch, messages, encoding, factory):
     return parsed
 
 
-def parse_batch(lines, encoding="utf-8", factory=Factory):
+def parse_batch(lines, encoding="utf-8", factory=Factory, *, classification=None):
     """Returns a instance of a :py:class:`hl7.Batch`
     that allows indexed access to the messages.
 
     A custom :py:class:`hl7.Factory` subclass can be passed in to be used when
-    constructing the batch and its components.
+    constructing the batch and its components. `classification`, the result
+    of :py:func:`hl7.classify` for the (decoded) `lines`, lets the batch be
+    sliced at the segment offsets found by it instead of split line by line.
 
     .. note::
 
@@ -158,13 +250,13 @@ def parse_batch(lines, encoding="utf-8", factory=Factory):
     # Ensure we are working with unicode data, decode the bytestring
     # if needed
     if isinstance(lines, bytes):
-        lines = lines.decode(encoding)
+        lines = _decode(lines, encoding)
+    timed = instrument.active
+    if timed:
+        start = perf_counter()
     batch = None
     messages = []
-    # Split the batch into lines, retaining the ends
-    for line in lines.strip(_HL7_WHITESPACE).splitlines(keepends=True):
-        # strip out all whitespace MINUS the '\r'
-        line = line.strip(_HL7_WHITESPACE)
+    for line in _batch_lines(lines, classification):
         if line[:3] == "BHS":
             if batch:
                 raise ParseException("Batch cannot have more than one BHS segment")
@@ -178,9 +270,13 @@ def parse_batch(lines, encoding="utf-8", factory=Factory):
         else:
             if not messages:
                 raise ParseException(
-                    "Segment received before message header {}".format(line)
+                    "Segment received before message header {}".format(
+                        _first_line(line)
+                    )
                 )
             messages[-1] += line
+    if timed:
+        instrument.record("batch_split", perf_counter() - start, len(messages))
     return _create_batch(batch, messages, encoding, factory)
 
 
@@ -207,12 +303,16 @@ def _create_file(file, batches, encoding, factory):
     return parsed
 
 
-def parse_file(lines, encoding="utf-8", factory=Factory):  # noqa: C901
+def parse_file(  # noqa: C901
+    lines, encoding="utf-8", factory=Factory, *, classification=None
+):
     """Returns a instance of the :py:class:`hl7.File` that allows
     indexed access to the batches.
 
     A custom :py:class:`hl7.Factory` subclass can be passed in to be used when
-    constructing the file and its components.
+    constructing the file and its components. `classification`, the result
+    of :py:func:`hl7.classify` for the (decoded) `lines`, lets the file be
+    sliced at the segment offsets found by it instead of split line by line.
 
     .. note::
 
@@ -241,15 +341,15 @@ def parse_file(lines, encoding="utf-8", factory=Factory):  # noqa: C901
     # Ensure we are working with unicode data, decode the bytestring
     # if needed
     if isinstance(lines, bytes):
-        lines = lines.decode(encoding)
+        lines = _decode(lines, encoding)
+    timed = instrument.active
+    if timed:
+        start = perf_counter()
     file = None
     batches = []
     messages = []
     in_batch = False
-    # Split the file into lines, retaining the ends
-    for line in lines.strip(_HL7_WHITESPACE).splitlines(keepends=True):
-        # strip out all whitespace MINUS the '\r'
-        line = line.strip(_HL7_WHITESPACE)
+    for line in _batch_lines(lines, classification):
         if line[:3] == "FHS":
             if file:
                 raise ParseException("File cannot have more than one FHS segment")
@@ -277,17 +377,27 @@ def parse_file(lines, encoding="utf-8", factory=Factory):  # noqa: C901
             if in_batch:
                 if not batches[-1][1]:
                     raise ParseException(
-                        "Segment received before message header {}".format(line)
+                        "Segment received before message header {}".format(
+                            _first_line(line)
+                        )
                     )
                 batches[-1][1][-1] += line
             else:
                 if not messages:
                     raise ParseException(
-                        "Segment received before message header {}".format(line)
+                        "Segment received before message header {}".format(
+                            _first_line(line)
+                        )
                     )
                 messages[-1] += line
     if messages:  # add the default batch, if we have one
         batches.append([None, messages])
+    if timed:
+        instrument.record(
+            "batch_split",
+            perf_counter() - start,
+            sum(len(batch[1]) for batch in batches),
+        )
     return _create_file(file, batches, encoding, factory)
 
 
@@ -314,22 +424,13 @@ def _split(text, plan):
         sep_end_off = text.find(sep0, 4)
         seps = text[4:sep_end_off]
         text = text[sep_end_off + 1 :]
-        data = [
-            plan.factory.create_field(
-                sequence=[seg], esc=plan.esc, separators=plan.separators
-            ),
-            plan.factory.create_field(
-                sequence=[sep0], esc=plan.esc, separators=plan.separators
-            ),
-            plan.factory.create_field(
-                sequence=[seps], esc=plan.esc, separators=plan.separators
-            ),
-        ]
+        data = plan.header_fields(seg, sep0, seps)
     else:
         data = []
 
     if text:
-        data = data + [_split(x, plan.next()) for x in text.split(plan.separator)]
+        next_plan = plan.next()
+        data = data + [_split(x, next_plan) for x in plan.split(text)]
     # Return the instance of the current message part according
     # to the plan
     return plan.container(data)
@@ -339,6 +440,24 @@ def create_parse_plan(strmsg, factory=Factory):
     """Creates a plan on how to parse the HL7 message according to
     the details stored within the message.
     """
+    separators, esc = _separators(strmsg)
+
+    # The ordered list of containers to create
+    containers = [
+        factory.create_message,
+        factory.create_segment,
+        factory.create_field,
+        factory.create_repetition,
+        factory.create_component,
+    ]
+    return _ParsePlan(separators[0], separators, containers, esc, factory)
+
+
+def _separators(strmsg):
+    """Return the separators (segment, field, repetition, component and
+    sub-component) and the escape character declared by the first segment of
+    *strmsg*.
+    """
     # We will always use a carriage return to separate segments
     separators = "\r"
 
@@ -367,16 +486,7 @@ def create_parse_plan(strmsg, factory=Factory):
         esc = seps[3]
     else:
         esc = "\\"
-
-    # The ordered list of containers to create
-    containers = [
-        factory.create_message,
-        factory.create_segment,
-        factory.create_field,
-        factory.create_repetition,
-        factory.create_component,
-    ]
-    return _ParsePlan(separators[0], separators, containers, esc, factory)
+    return separators, esc
 
 
 class _ParsePlan:
@@ -408,6 +518,21 @@ class _ParsePlan:
             factory=self.factory,
         )
 
+    def split(self, text):
+        """Split *text* with the separator of the current plan"""
+        return text.split(self.separator)
+
+    def header_fields(self, *values):
+        """Return the fields holding the segment id and the separators of a
+        MSH, BHS or FHS segment, which are not split.
+        """
+        return [
+            self.factory.create_field(
+                sequence=[value], esc=self.esc, separators=self.separators
+            )
+            for value in values
+        ]
+
     def next(self):
         """Generate the next level of the plan (essentially generates
         a copy of this plan with the level of the container and the
@@ -434,3 +559,51 @@ class _ParsePlan:
             if text.find(s) >= 0:
                 return True
         return False
+
+
+class _TimedPlan(_ParsePlan):
+    """A :py:class:`_ParsePlan` adding the time spent splitting and
+    allocating containers to the :py:class:`hl7.instrument._Timings`
+    `timings`.
+    """
+
+    timings = None
+
+    @classmethod
+    def timing(cls, plan, timings):
+        """Return a copy of `plan` reporting to `timings`"""
+        timed = cls(
+            plan.separator, plan.separators, plan.containers, plan.esc, plan.factory
+        )
+        timed.timings = timings
+        return timed
+
+    def container(self, data):
+        start = perf_counter()
+        container = super().container(data)
+        self.timings.add("allocate", perf_counter() - start)
+        return container
+
+    def split(self, text):
+        start = perf_counter()
+        parts = text.split(self.separator)
+        self.timings.add(
+            "segment_split"
+            if self.containers[0] == self.factory.create_message
+            else "field_split",
+            perf_counter() - start,
+            len(parts),
+        )
+        return parts
+
+    def header_fields(self, *values):
+        start = perf_counter()
+        fields = super().header_fields(*values)
+        self.timings.add("allocate", perf_counter() - start, len(fields))
+        return fields
+
+    def next(self):
+        plan = super().next()
+        if plan is not None:
+            plan.timings = self.timings
+        return plan
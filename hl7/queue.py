@@ -0,0 +1,239 @@
+"""Durable store-and-forward queue for outbound HL7 messages.
+
+Messages are kept in an SQLite database (in WAL mode) until the receiver
+acknowledges them with an ``AA`` ACK, so nothing is lost if the receiver is
+down or the process restarts::
+
+    with OutboundQueue("outbound.db") as queue:
+        queue.enqueue_many(messages)
+        queue.drain("mirth.example.com", 6661)
+
+Delivery is at-least-once: a message whose ACK arrived just before a crash,
+but was not removed yet, is sent again.
+"""
+
+import sqlite3
+import time
+from collections import deque
+
+import hl7
+from hl7.client import MLLPClient, ack_code
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message BLOB NOT NULL,
+    enqueued REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class DeliveryError(Exception):
+    """Raised when the receiver answers a queued message with an ACK code other
+    than ``AA``. The message is kept in the queue and its attempts counter is
+    incremented.
+    """
+
+    def __init__(self, message_id, ack_code, response):
+        super().__init__(
+            "message %d was not accepted (ACK code %r)" % (message_id, ack_code)
+        )
+        self.message_id = message_id
+        self.ack_code = ack_code
+        self.response = response
+
+
+class OutboundQueue:
+    """A first in, first out queue of outbound messages stored in the SQLite
+    database at `path`.
+
+    Messages may be byte strings (assumed to be encoded already), unicode
+    strings or :py:class:`hl7.Message`, encoded with `encoding`.
+    `synchronous` is the SQLite ``synchronous`` pragma; with WAL, ``NORMAL``
+    (the default) only syncs at checkpoints, which is durable across process
+    crashes but may lose the last transactions on a power failure. Use
+    ``FULL`` to sync every transaction.
+    """
+
+    def __init__(self, path, encoding="utf-8", synchronous="NORMAL"):
+        self.path = path
+        self.encoding = encoding
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=%s" % synchronous)
+        self.connection.execute(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM outbound").fetchone()[0]
+
+    def _encode(self, message):
+        if isinstance(message, bytes):
+            return message
+        if isinstance(message, hl7.Message):
+            message = str(message)
+        return message.encode(self.encoding)
+
+    def enqueue(self, message):
+        """Add one message to the end of the queue"""
+        self.enqueue_many([message])
+
+    def enqueue_many(self, messages):
+        """Add `messages` to the end of the queue in a single transaction and
+        return the number of messages added.
+        """
+        now = time.time()
+        with self._transaction():
+            cursor = self.connection.executemany(
+                "INSERT INTO outbound (message, enqueued) VALUES (?, ?)",
+                ((self._encode(message), now) for message in messages),
+            )
+        return cursor.rowcount
+
+    def peek(self, limit=1, after=0):
+        """Return up to `limit` ``(id, message, attempts)`` tuples from the
+        head of the queue, starting after the id `after`.
+        """
+        return self.connection.execute(
+            "SELECT id, message, attempts FROM outbound WHERE id > ? "
+            "ORDER BY id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+
+    def remove(self, ids):
+        """Remove the messages with the given `ids` in a single transaction"""
+        with self._transaction():
+            self.connection.executemany(
+                "DELETE FROM outbound WHERE id = ?", ((id_,) for id_ in ids)
+            )
+
+    def _failed(self, message_id):
+        self.connection.execute(
+            "UPDATE outbound SET attempts = attempts + 1 WHERE id = ?", (message_id,)
+        )
+
+    def _transaction(self):
+        return _Transaction(self.connection)
+
+    def _rows(self, batch_size):
+        after = 0
+        while True:
+            rows = self.peek(batch_size, after)
+            if not rows:
+                return
+            yield from rows
+            after = rows[-1][0]
+
+    def drain(self, host, port, window=16, batch_size=1000, **kwds):
+        """Send the queued messages to `host` and `port` with a
+        :py:class:`hl7.client.MLLPClient` (extra keyword arguments are passed
+        to it) and return the number of messages delivered.
+
+        Up to `window` messages are sent before waiting for an ACK. Messages
+        are removed once their ``AA`` ACK arrives, in transactions of up to
+        `batch_size` messages. Any other ACK stops the drain with a
+        :py:class:`hl7.queue.DeliveryError`, after the ACKs of the messages
+        already sent have been read; the rejected message stays at the head
+        of the queue.
+        """
+        with MLLPClient(host, port, encoding=self.encoding, **kwds) as client:
+            return self.drain_client(client, window, batch_size)
+
+    def drain_client(self, client, window=16, batch_size=1000):
+        """:py:meth:`drain` over an already connected
+        :py:class:`hl7.client.MLLPClient`
+        """
+        drainer = _Drainer(self, batch_size)
+        sent = deque()
+        responses = client.send_pipelined(drainer.messages(sent), window)
+        try:
+            for response in responses:
+                drainer.acknowledge(sent.popleft(), response)
+        finally:
+            drainer.flush()
+        drainer.raise_error()
+        return drainer.delivered
+
+    async def drain_async(self, reader, writer, window=16, batch_size=1000):
+        """:py:meth:`drain` over an asyncio connection opened with
+        :py:func:`hl7.mllp.open_hl7_connection`.
+
+        The SQLite calls are short and run on the event loop.
+        """
+        from hl7.mllp.streams import send_pipelined
+
+        drainer = _Drainer(self, batch_size)
+        sent = deque()
+        responses = send_pipelined(reader, writer, drainer.messages(sent), window)
+        try:
+            async for response in responses:
+                drainer.acknowledge(sent.popleft(), response)
+        finally:
+            drainer.flush()
+        drainer.raise_error()
+        return drainer.delivered
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class _Drainer:
+    """Tracks the ACKs of a drain and removes acknowledged messages in
+    batches
+    """
+
+    def __init__(self, queue, batch_size):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.acknowledged = []
+        self.delivered = 0
+        self.error = None
+
+    def messages(self, sent):
+        """Yield the queued messages, appending their ids to `sent`, until an
+        ACK other than ``AA`` arrives
+        """
+        for message_id, message, _ in self.queue._rows(self.batch_size):
+            if self.error is not None:
+                return
+            sent.append(message_id)
+            yield message
+
+    def acknowledge(self, message_id, response):
+        code = ack_code(response)
+        if code == "AA":
+            self.acknowledged.append(message_id)
+            if len(self.acknowledged) >= self.batch_size:
+                self.flush()
+        elif self.error is None:
+            self.queue._failed(message_id)
+            self.error = DeliveryError(message_id, code, response)
+
+    def flush(self):
+        if self.acknowledged:
+            self.queue.remove(self.acknowledged)
+            self.delivered += len(self.acknowledged)
+            self.acknowledged = []
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
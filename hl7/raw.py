@@ -0,0 +1,136 @@
+"""Parse messages into plain lists of strings, for bulk extraction.
+
+:py:func:`parse_raw` splits a message like :py:func:`hl7.parse`, but returns
+built-in lists instead of :py:class:`hl7.Container` instances, which is
+several times faster and uses a fraction of the memory. A message is a list of
+segments and a segment a list of fields, with the segment id first. A field
+without repetition, component or sub-component separators is a string,
+otherwise a list of repetitions; likewise a repetition is a string or a list
+of components, and a component a string or a list of sub-components::
+
+    >>> raw = hl7.parse_raw(message)
+    >>> raw[1][3]
+    '555-44-4444'
+    >>> raw[1][5]
+    [['EVERYWOMAN', 'EVE', 'E', '', '', '', 'L']]
+    >>> hl7.raw.raw_extract(raw, "PID.5.1.2")
+    'EVE'
+
+Values are not unescaped. There are no per-node separators, so use
+:py:func:`hl7.parse` when messages need to be modified or serialized again.
+"""
+
+from .accessor import Accessor
+from .parser import _decode, _separators
+
+_HEADERS = ("MSH", "BHS", "FHS")
+
+
+def parse_raw(lines, encoding="utf-8"):
+    """Return the message in `lines` as nested lists of strings, see
+    :py:mod:`hl7.raw`. Byte strings are decoded with `encoding`.
+    """
+    if isinstance(lines, bytes):
+        lines = _decode(lines, encoding)
+    text = lines.strip()
+    separators, _ = _separators(text)
+    _, field_sep, rep_sep, comp_sep, sub_sep = separators
+
+    def split_field(value):
+        if rep_sep not in value and comp_sep not in value and sub_sep not in value:
+            return value
+        reps = value.split(rep_sep)
+        for i, rep in enumerate(reps):
+            if comp_sep in rep or sub_sep in rep:
+                components = rep.split(comp_sep)
+                for j, component in enumerate(components):
+                    if sub_sep in component:
+                        components[j] = component.split(sub_sep)
+                reps[i] = components
+        return reps
+
+    message = []
+    for segment in text.split("\r"):
+        if segment[:3] in _HEADERS and len(segment) > 3:
+            # The separators of the header segment are fields of their own
+            sep0 = segment[3]
+            sep_end_off = segment.find(sep0, 4)
+            fields = [segment[:3], sep0, segment[4:sep_end_off]]
+            rest = segment[sep_end_off + 1 :]
+            if rest:
+                fields.extend(split_field(f) for f in rest.split(sep0))
+        elif field_sep in segment:
+            fields = [split_field(f) for f in segment.split(field_sep)]
+        else:
+            fields = [segment]
+        message.append(fields)
+    return message
+
+
+def raw_segments(message, segment_id):
+    """Return the segments of the raw `message` with the id `segment_id`.
+    Raises :py:exc:`KeyError` if there are none, like
+    :py:meth:`hl7.Message.segments`.
+    """
+    matches = [segment for segment in message if segment[0] == segment_id]
+    if not matches:
+        raise KeyError("No %s segments" % segment_id)
+    return matches
+
+
+def raw_field(segment, field_num=1, repeat_num=1, component_num=1, subcomponent_num=1):
+    """Extract a value from a raw `segment` by its 1-based indexes, following
+    the rules of :py:meth:`hl7.Segment.extract_field` (missing optional
+    values are ``""``), but without unescaping it.
+    """
+    if field_num >= len(segment):
+        if repeat_num == 1 and component_num == 1 and subcomponent_num == 1:
+            return ""  # Assume non-present optional value
+        raise IndexError("Field not present: {0}".format(field_num))
+
+    field = segment[field_num]
+    if isinstance(field, str):
+        # leaf
+        if repeat_num == 1 and component_num == 1 and subcomponent_num == 1:
+            return field
+        raise IndexError("Field reaches leaf node before completing path")
+
+    rep = field[repeat_num - 1]
+    if isinstance(rep, str):
+        # A repetition without components, the component is the leaf
+        if component_num > 1:
+            if subcomponent_num == 1:
+                return ""  # Assume non-present optional value
+            raise IndexError("Component not present: {0}".format(component_num))
+        if subcomponent_num == 1:
+            return rep
+        raise IndexError("Field reaches leaf node before completing path")
+
+    if component_num > len(rep):
+        if subcomponent_num == 1:
+            return ""  # Assume non-present optional value
+        raise IndexError("Component not present: {0}".format(component_num))
+
+    component = rep[component_num - 1]
+    if isinstance(component, str):
+        return component if subcomponent_num == 1 else ""
+    if subcomponent_num <= len(component):
+        return component[subcomponent_num - 1]
+    return ""  # Assume non-present optional value
+
+
+def raw_extract(message, key):
+    """Extract a value from the raw `message` by accessor `key`, a string
+    such as ``"PID.3.1.1"`` or an :py:class:`hl7.Accessor`, like
+    :py:meth:`hl7.Message.__getitem__` but without unescaping it.
+    """
+    if not isinstance(key, Accessor):
+        key = Accessor.parse_key(key)
+    segment = raw_segments(message, key.segment)[key.segment_num - 1]
+    return raw_field(
+        segment,
+        key.field_num or 1,
+        key.repeat_num or 1,
+        key.component_num or 1,
+        key.subcomponent_num or 1,
+    )
@@ -0,0 +1,5 @@
+"""Helpers for testing and benchmarking code that handles HL7 messages."""
+
+from .corpus import Corpus
+
+__all__ = ["Corpus"]
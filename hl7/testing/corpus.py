@@ -0,0 +1,375 @@
+"""Reproducible synthetic HL7 messages shaped like production traffic.
+
+Unlike the few small samples of the test suite, the generated messages can be
+as large and as repetitive as real feeds: ADT messages with many patient
+identifiers and next of kin, ORU messages with hundreds of OBX segments,
+formatted text with escape sequences, base64 encoded attachments, non-default
+separators and BHS/FHS-wrapped batches::
+
+    >>> corpus = hl7.testing.Corpus(seed=1)
+    >>> message = hl7.parse(corpus.oru(observations=600))
+    >>> len(message.segments("OBX"))
+    600
+
+The same seed always generates the same messages.
+"""
+
+import base64
+import datetime
+import random
+
+_FAMILY_NAMES = (
+    "SMITH",
+    "JOHNSON",
+    "O'BRIEN",
+    "GARCIA",
+    "NGUYEN",
+    "MÜLLER",
+    "OKAFOR",
+    "KOWALSKI",
+)
+_GIVEN_NAMES = ("JAMES", "MARY", "ROBERT", "ZOË", "WEI", "AMARA", "JOSÉ", "ANNA")
+_RELATIONSHIPS = ("SPO^Spouse", "CHD^Child", "PAR^Parent", "SIB^Sibling")
+_AUTHORITIES = ("HOSP", "CLINIC", "SSA", "LAB", "HIE")
+# (code, name, units, low, high)
+_OBSERVATIONS = (
+    ("2345-7", "GLUCOSE", "mg/dL", 70, 105),
+    ("2951-2", "SODIUM", "mmol/L", 135, 145),
+    ("2823-3", "POTASSIUM", "mmol/L", 3.5, 5.1),
+    ("718-7", "HEMOGLOBIN", "g/dL", 12, 17),
+    ("6690-2", "WBC", "10*3/uL", 4.5, 11),
+    ("2160-0", "CREATININE", "mg/dL", 0.6, 1.3),
+)
+_ORDERS = (("80053", "COMPREHENSIVE METABOLIC PANEL"), ("85025", "CBC W AUTO DIFF"))
+_NOTES = (
+    "Specimen slightly hemolyzed | results may be affected",
+    "Repeat in 2~3 days & compare with baseline",
+    "Ratio A^B within range \\ no action",
+    "Called to Dr. Smith at 14:05, read back & confirmed",
+)
+
+
+class Corpus:
+    """Generator of synthetic HL7 messages, batches and files, as strings.
+
+    `seed` makes the output reproducible; it can also be a
+    :py:class:`random.Random` to draw from. `separators` are the field
+    separator followed by the encoding characters (MSH-1 and MSH-2): the
+    component, repetition, escape and sub-component characters, e.g.
+    ``"#$*!@"``. Text values containing separators are escaped accordingly.
+    """
+
+    def __init__(self, seed=None, separators="|^~\\&"):
+        if len(separators) != 5 or len(set(separators)) != 5:
+            raise ValueError("separators must be 5 distinct characters")
+        if isinstance(seed, random.Random):
+            self.random = seed
+        else:
+            self.random = random.Random(seed)
+        self.separators = separators
+        self.field, self.component, self.repetition, self.esc, self.subcomponent = (
+            separators
+        )
+        self._control_id = 0
+
+    # Rendering
+
+    def escape(self, text):
+        """Escape the separators in `text` with the escape character"""
+        esc = self.esc
+        replacements = {
+            esc: esc + "E" + esc,
+            self.field: esc + "F" + esc,
+            self.component: esc + "S" + esc,
+            self.subcomponent: esc + "T" + esc,
+            self.repetition: esc + "R" + esc,
+        }
+        return "".join(replacements.get(c, c) for c in text)
+
+    def _render(self, value, level):
+        if isinstance(value, str):
+            return value
+        separator = (self.repetition, self.component, self.subcomponent)[level]
+        return separator.join(self._render(v, level + 1) for v in value)
+
+    def segment(self, name, *fields):
+        """Render a segment from `fields`, each a string or a list of
+        repetitions, which are strings or lists of components, which are
+        strings or lists of sub-components. Values are not escaped.
+        """
+        return self.field.join([name] + [self._render(field, 0) for field in fields])
+
+    def _msh(self, message_type, timestamp, control_id=None):
+        self._control_id += 1
+        if control_id is None:
+            control_id = "C{0:010d}".format(self._control_id)
+        return self.field.join(
+            [
+                "MSH",
+                self.separators[1:],
+                "CORPUS",
+                "FACILITY",
+                "RECEIVER",
+                "FACILITY",
+                timestamp,
+                "",
+                self._render([message_type], 0),
+                control_id,
+                "P",
+                "2.5.1",
+            ]
+        )
+
+    def _timestamp(self):
+        moment = datetime.datetime(2024, 1, 1) + datetime.timedelta(
+            seconds=self.random.randrange(365 * 24 * 3600)
+        )
+        return moment.strftime("%Y%m%d%H%M%S")
+
+    def _name(self):
+        rnd = self.random
+        return [
+            self.escape(rnd.choice(_FAMILY_NAMES)),
+            self.escape(rnd.choice(_GIVEN_NAMES)),
+            rnd.choice("ABCDEFGHJKLMNPRSTW"),
+        ]
+
+    def _pid(self, identifiers):
+        rnd = self.random
+        ids = [
+            [
+                str(rnd.randrange(10**9)),
+                "",
+                "",
+                [rnd.choice(_AUTHORITIES), "2.16.840.1.113883.3.{0}".format(i), "ISO"],
+                "MR" if i == 0 else rnd.choice(("PI", "AN", "SS", "PT")),
+            ]
+            for i in range(identifiers)
+        ]
+        birth = datetime.date(1930, 1, 1) + datetime.timedelta(
+            days=rnd.randrange(32000)
+        )
+        return self.segment(
+            "PID",
+            "1",
+            "",
+            ids,
+            "",
+            [self._name(), self._name()],
+            "",
+            birth.strftime("%Y%m%d"),
+            rnd.choice("MFU"),
+            "",
+            "",
+            [["{0} MAIN ST".format(rnd.randrange(1, 9999)), "", "SPRINGFIELD", "IL"]],
+        )
+
+    # Messages
+
+    def adt(self, identifiers=10, next_of_kin=10, control_id=None):
+        """An ADT^A01 message with `identifiers` repetitions of PID-3 and
+        `next_of_kin` NK1 segments. `control_id` is the MSH-10 of the
+        message, a sequence number by default.
+        """
+        rnd = self.random
+        timestamp = self._timestamp()
+        segments = [
+            self._msh(["ADT", "A01", "ADT_A01"], timestamp, control_id),
+            self.segment("EVN", "A01", timestamp),
+            self._pid(identifiers),
+        ]
+        for i in range(next_of_kin):
+            segments.append(
+                self.segment(
+                    "NK1",
+                    str(i + 1),
+                    [self._name()],
+                    [rnd.choice(_RELATIONSHIPS).split("^")],
+                    "",
+                    "(555)555-{0:04d}".format(rnd.randrange(10000)),
+                )
+            )
+        segments.append(
+            self.segment(
+                "PV1",
+                "1",
+                "I",
+                [["WARD{0}".format(rnd.randrange(1, 9)), str(rnd.randrange(100, 400))]],
+            )
+        )
+        return "\r".join(segments) + "\r"
+
+    def oru(
+        self,
+        observations=500,
+        notes=0.1,
+        attachments=0,
+        attachment_size=4096,
+        control_id=None,
+    ):
+        """An ORU^R01 message with `observations` OBX segments.
+
+        A fraction `notes` of the observations are formatted text (FT) with
+        escaped separators and ``.br`` line breaks; `attachments` more OBX
+        segments carry `attachment_size` random bytes, base64 encoded in an
+        ED value. `control_id` is as for :py:meth:`adt`.
+        """
+        rnd = self.random
+        timestamp = self._timestamp()
+        segments = [
+            self._msh(["ORU", "R01", "ORU_R01"], timestamp, control_id),
+            self._pid(2),
+            self.segment(
+                "OBR",
+                "1",
+                str(rnd.randrange(10**6)),
+                str(rnd.randrange(10**6)),
+                [["80053", "COMPREHENSIVE METABOLIC PANEL", "CPT"]],
+                "",
+                "",
+                timestamp,
+            ),
+        ]
+        for i in range(observations):
+            if rnd.random() < notes:
+                segments.append(self._note(i + 1, timestamp))
+                continue
+            code, name, units, low, high = rnd.choice(_OBSERVATIONS)
+            value = round(rnd.uniform(low * 0.8, high * 1.2), 1)
+            flag = "L" if value < low else "H" if value > high else "N"
+            segments.append(
+                self.segment(
+                    "OBX",
+                    str(i + 1),
+                    "NM",
+                    [[code, name, "LN"]],
+                    "",
+                    str(value),
+                    units,
+                    "{0}-{1}".format(low, high),
+                    flag,
+                    "",
+                    "",
+                    "F",
+                    "",
+                    "",
+                    timestamp,
+                )
+            )
+        for i in range(attachments):
+            data = base64.b64encode(rnd.randbytes(attachment_size)).decode("ascii")
+            segments.append(
+                self.segment(
+                    "OBX",
+                    str(observations + i + 1),
+                    "ED",
+                    [["PDF", "REPORT", "L"]],
+                    "",
+                    [["", "application", "pdf", "Base64", data]],
+                    "",
+                    "",
+                    "",
+                    "",
+                    "",
+                    "F",
+                )
+            )
+        return "\r".join(segments) + "\r"
+
+    def orm(self, control_id=None):
+        """An ORM^O01 new order message. `control_id` is as for
+        :py:meth:`adt`.
+        """
+        rnd = self.random
+        timestamp = self._timestamp()
+        code, name = rnd.choice(_ORDERS)
+        segments = [
+            self._msh(["ORM", "O01", "ORM_O01"], timestamp, control_id),
+            self._pid(2),
+            self.segment(
+                "ORC",
+                "NW",
+                str(rnd.randrange(10**6)),
+                "",
+                "",
+                "",
+                "",
+                [["", "", "", timestamp, "", "R"]],
+            ),
+            self.segment(
+                "OBR",
+                "1",
+                str(rnd.randrange(10**6)),
+                "",
+                [[code, name, "CPT"]],
+                "",
+                "",
+                timestamp,
+            ),
+        ]
+        return "\r".join(segments) + "\r"
+
+    def _note(self, set_id, timestamp):
+        rnd = self.random
+        br = self.esc + ".br" + self.esc
+        text = br.join(
+            self.escape(rnd.choice(_NOTES)) for _ in range(rnd.randint(1, 4))
+        )
+        return self.segment(
+            "OBX",
+            str(set_id),
+            "FT",
+            [["NOTE", "COMMENT", "L"]],
+            "",
+            text,
+            "",
+            "",
+            "",
+            "",
+            "",
+            "F",
+            "",
+            "",
+            timestamp,
+        )
+
+    def message(self, kind=None, **kwds):
+        """An ``"ADT"``, ``"ORU"`` or ``"ORM"`` message, an ADT or ORU chosen
+        at random if `kind` is ``None``. `kwds` are passed to :py:meth:`adt`,
+        :py:meth:`oru` or :py:meth:`orm`.
+        """
+        if kind is None:
+            kind = self.random.choice(("ADT", "ORU"))
+        if kind == "ADT":
+            return self.adt(**kwds)
+        elif kind == "ORU":
+            return self.oru(**kwds)
+        elif kind == "ORM":
+            return self.orm(**kwds)
+        raise ValueError("Unknown message kind: {0!r}".format(kind))
+
+    def messages(self, count, kind=None, **kwds):
+        """Return a list of `count` messages, see :py:meth:`message`"""
+        return [self.message(kind, **kwds) for _ in range(count)]
+
+    def batch(self, size, kind=None, **kwds):
+        """A batch of `size` messages wrapped in BHS/BTS segments"""
+        return (
+            self.segment("BHS", self.separators[1:], "CORPUS", "FACILITY")
+            + "\r"
+            + "".join(self.messages(size, kind, **kwds))
+            + self.segment("BTS", str(size))
+            + "\r"
+        )
+
+    def file(self, batches, size, kind=None, **kwds):
+        """A file of `batches` batches (see :py:meth:`batch`) wrapped in
+        FHS/FTS segments
+        """
+        return (
+            self.segment("FHS", self.separators[1:], "CORPUS", "FACILITY")
+            + "\r"
+            + "".join(self.batch(size, kind, **kwds) for _ in range(batches))
+            + self.segment("FTS", str(batches))
+            + "\r"
+        )
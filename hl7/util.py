@@ -1,7 +1,14 @@
-import datetime
 import logging
-import random
+import mmap
+import os
+import re
 import string
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from . import instrument
 
 logger = logging.getLogger(__file__)
 
@@ -44,47 +51,281 @@ def isfile(line):
     return line and (line.strip()[:3] == "FHS" or isbatch(line))
 
 
+_LEADING_WHITESPACE_RE = re.compile(r"\s*")
+
+
+class Classification(namedtuple("Classification", ["kind", "start", "end", "offsets"])):
+    """Result of :py:func:`hl7.classify`.
+
+    ``kind`` is ``"message"``, ``"batch"``, ``"file"`` or ``None`` if the text
+    does not look like HL7. ``text[start:end]`` is the text without its
+    leading and trailing whitespace. ``offsets`` are the positions, in order,
+    of the segments that start a line and are a message header (MSH) or, for
+    batches and files, a batch or file header or trailer (BHS, BTS, FHS and
+    FTS).
+    """
+
+    __slots__ = ()
+
+
+def classify(text):
+    """Determine whether *text* looks like an HL7 message, batch or file,
+    with a single scan of the text, and where its messages start.
+
+    The kind is the same as checking :py:func:`hl7.ishl7`,
+    :py:func:`hl7.isbatch` and :py:func:`hl7.isfile` in turn.
+    :py:func:`hl7.parse_hl7` passes the result to :py:func:`hl7.parse`,
+    :py:func:`hl7.parse_batch` or :py:func:`hl7.parse_file`, which use the
+    offsets instead of stripping and splitting the text again.
+
+    >>> hl7.classify(message).kind
+    'message'
+
+    :rtype: :py:class:`hl7.util.Classification`
+    """
+    if not text:
+        return Classification(None, 0, 0, ())
+    start = _LEADING_WHITESPACE_RE.match(text).end()
+    end = len(text)
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    head = text[start : start + 4]
+
+    # A single pass over the text, without copying it, for every "MSH",
+    # keeping the ones that start a line (the message boundaries) and whether
+    # another message header follows a carriage return with the same field
+    # separator
+    count = 0
+    offsets = []
+    separator = head[3:4]
+    repeated_header = False
+    find = text.find
+    offset = find("MSH", start)
+    while offset >= 0:
+        count += 1
+        previous = text[offset - 1] if offset else None
+        if offset == start or previous in ("\r", "\n"):
+            offsets.append(offset)
+            if previous == "\r" and text[offset + 3 : offset + 4] == separator:
+                repeated_header = True
+        offset = find("MSH", offset + 3)
+
+    if (
+        head[:3] == "MSH"
+        and len(head) == 4
+        and not repeated_header
+        and not (head[3].isspace() and not text[start + 3 :].strip())
+    ):
+        kind = "message"
+    elif head[:3] == "BHS" or (count > 1 and head[:3] != "FHS"):
+        kind = "batch"
+    elif head[:3] == "FHS":
+        kind = "file"
+    else:
+        return Classification(None, start, end, tuple(offsets))
+    if kind != "message":
+        if head[:3] in ("BHS", "FHS"):
+            offsets.append(start)
+        for name in ("BHS", "BTS", "FHS", "FTS"):
+            offset = find(name, start + 1)
+            while offset >= 0:
+                if text[offset - 1] in ("\r", "\n"):
+                    offsets.append(offset)
+                offset = find(name, offset + 3)
+        offsets.sort()
+    return Classification(kind, start, end, tuple(offsets))
+
+
 def split_file(hl7file):
     """
     Given a file, split out the messages.
     Does not do any validation on the message.
     Throws away batch and file segments.
     """
-    rv = []
-    for line in hl7file.split("\r"):
+    return list(iter_split(hl7file))
+
+
+def _iter_lines(source, separator, chunk_size):
+    """Yield the lines of `source` separated by `separator`, like
+    ``source.split(separator)``, holding at most one line in memory.
+    """
+    if isinstance(source, (str, bytes, bytearray, mmap.mmap)):
+        start = 0
+        find = source.find
+        while True:
+            end = find(separator, start)
+            if end < 0:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+
+    # A file object: lines may span several chunks
+    parts = []
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        lines = chunk.split(separator)
+        if len(lines) > 1:
+            parts.append(lines[0])
+            yield chunk[:0].join(parts)
+            yield from lines[1:-1]
+            parts = [lines[-1]]
+        else:
+            parts.append(chunk)
+    yield separator[:0].join(parts)
+
+
+def iter_split(source, chunk_size=64 * 1024):
+    """
+    Lazily split out the messages of `source`, which may be a string, a byte
+    string, a :py:class:`mmap.mmap` or a file object opened in text or
+    binary mode. Byte input yields byte strings, without decoding.
+
+    Like :py:func:`hl7.split_file`, segments are separated by ``\\r`` and
+    stripped, and batch and file segments are thrown away. Only one message
+    is held in memory, so files can be split with constant memory. Open text
+    files with ``newline=""``, so the ``\\r`` are not translated.
+    """
+    if isinstance(source, str) or (
+        not isinstance(source, (bytes, bytearray, mmap.mmap))
+        and isinstance(source.read(0), str)
+    ):
+        separator = "\r"
+        msh = "MSH"
+        skip = ("FHS", "BHS", "FTS", "BTS")
+    else:
+        separator = b"\r"
+        msh = b"MSH"
+        skip = (b"FHS", b"BHS", b"FTS", b"BTS")
+
+    message = None
+    for line in _iter_lines(source, separator, chunk_size):
         line = line.strip()
-        if line[:3] in ["FHS", "BHS", "FTS", "BTS"]:
+        if line[:3] in skip:
             continue
-        if line[:3] == "MSH":
-            newmsg = [line]
-            rv.append(newmsg)
+        if line[:3] == msh:
+            if message is not None:
+                yield _join_message(message, separator)
+            message = [line]
+        elif message is None:
+            logger.error("Segment received before message header [%s]", line)
         else:
-            if len(rv) == 0:
-                logger.error("Segment received before message header [%s]", line)
-                continue
-            rv[-1].append(line)
-    rv = ["\r".join(msg) for msg in rv]
-    for i, msg in enumerate(rv):
-        if not msg[-1] == "\r":
-            rv[i] = msg + "\r"
-    return rv
+            message.append(line)
+    if message is not None:
+        yield _join_message(message, separator)
+
+
+def _join_message(segments, separator):
+    message = separator.join(segments)
+    if message[-1:] != separator:
+        message += separator
+    if isinstance(message, bytearray):
+        message = bytes(message)
+    return message
 
 
 alphanumerics = string.ascii_uppercase + string.digits
+_BASE36 = string.digits + string.ascii_uppercase
+
+
+def _base36(number, width):
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        digits.append(_BASE36[digit])
+    return "".join(reversed(digits))
+
+
+class ControlIdGenerator:
+    """Thread-safe generator of unique 20 character message control ids
+    (MSH-10).
+
+    Each id is made of a 4 character node component, the 8 character base 36
+    time in milliseconds at which the generator was (re)seeded and an 8
+    character hexadecimal counter, so generating an id only increments the
+    counter. The node component defaults to 4 random characters; it can be
+    set, e.g. to a worker number, with `node`. Generators are reseeded in
+    forked child processes and when the counter is exhausted.
+
+    >>> generate = hl7.util.ControlIdGenerator()
+    >>> len(generate())
+    20
+    """
+
+    #: Number of ids generated before the generator is reseeded
+    limit = 16**8
+
+    def __init__(self, node=None):
+        if node is not None and not 0 < len(node) <= 4:
+            raise ValueError("node must be 1 to 4 characters")
+        self.node = node
+        self._lock = threading.Lock()
+        self._last_time = 0
+        self._seed()
+        _generators.add(self)
+
+    def _seed(self):
+        node = self.node
+        if node is None:
+            node = _base36(int.from_bytes(os.urandom(4), "big"), 4)
+        # Never reuse the time of a previous seed of this generator
+        now = max(int(time.time() * 1000), self._last_time + 1)
+        self._last_time = now
+        self._prefix = node.rjust(4, "0") + _base36(now, 8)
+        self._counter = 0
+
+    def _reseed_after_fork(self):
+        self._lock = threading.Lock()
+        self._seed()
+
+    def _reserve(self, count):
+        with self._lock:
+            if self._counter + count > self.limit:
+                self._seed()
+            start = self._counter
+            self._counter += count
+            return self._prefix, start
+
+    def __call__(self):
+        """Return a new control id"""
+        prefix, counter = self._reserve(1)
+        return prefix + format(counter, "08X")
+
+    def batch(self, count):
+        """Reserve and return a list of `count` new control ids"""
+        if not 0 <= count <= self.limit:
+            raise ValueError("count must be between 0 and %d" % self.limit)
+        prefix, start = self._reserve(count)
+        return [
+            prefix + format(counter, "08X") for counter in range(start, start + count)
+        ]
+
+
+_generators = weakref.WeakSet()
+
+
+def _reseed_generators():
+    for generator in list(_generators):
+        generator._reseed_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_generators)
+
+_control_ids = ControlIdGenerator()
 
 
 def generate_message_control_id():
     """Generate a unique 20 character message id.
 
+    Ids come from a shared :py:class:`hl7.util.ControlIdGenerator`, which
+    combines a random node component, a timestamp and a counter.
+
     See http://www.hl7resources.com/Public/index.html?a55433.htm
     """
-    d = datetime.datetime.utcnow()
-    # Strip off the decade, ID only has to be unique for 3 years.
-    # So now we have a 16 char timestamp.
-    timestamp = d.strftime("%y%j%H%M%S%f")[1:]
-    # Add 4 chars of uniqueness
-    unique = "".join(random.sample(alphanumerics, 4))
-    return timestamp + unique
+    return _control_ids()
 
 
 def escape(container, field, app_map=None):
@@ -136,7 +377,7 @@ def escape(container, field, app_map=None):
     return "".join(rv)
 
 
-def unescape(container, field, app_map=None):  # noqa: C901
+def unescape(container, field, app_map=None):
     """
     See: http://www.hl7standards.com/blog/2006/11/02/hl7-escape-sequences/
 
@@ -164,7 +405,15 @@ def unescape(container, field, app_map=None):  # noqa: C901
     """
     if not field or field.find(container.esc) == -1:
         return field
+    if instrument.active:
+        start = time.perf_counter()
+        value = _unescape(container, field, app_map)
+        instrument.record("unescape", time.perf_counter() - start)
+        return value
+    return _unescape(container, field, app_map)
+
 
+def _unescape(container, field, app_map):  # noqa: C901
     DEFAULT_MAP = {
         "H": "_",  # Override using the APP MAP: 2.10.3
         "N": "_",  # Override using the APP MAP
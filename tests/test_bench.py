@@ -0,0 +1,58 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import hl7
+from hl7.bench import (
+    LatencyHistogram,
+    bench_library,
+    generate_messages,
+    run_load,
+)
+
+
+class GenerateMessagesTest(TestCase):
+    def test_reproducible(self):
+        self.assertEqual(
+            list(generate_messages(20, seed=1)), list(generate_messages(20, seed=1))
+        )
+        self.assertNotEqual(
+            list(generate_messages(20, seed=1)), list(generate_messages(20, seed=2))
+        )
+
+    def test_types(self):
+        for message_type in ("ADT", "ORU", "ORM"):
+            for message in generate_messages(10, types=(message_type,), seed=3):
+                h = hl7.parse(message)
+                self.assertEqual(str(h), message)
+                self.assertEqual(str(h["MSH.9.1"]), message_type)
+                self.assertTrue(str(h["PID.3"]))
+
+    def test_bench_library(self):
+        results = bench_library(list(generate_messages(5, seed=1)), number=1)
+        self.assertIn("parse", results)
+        self.assertTrue(all(v > 0 for v in results.values()))
+
+
+class LatencyHistogramTest(TestCase):
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.record(i / 1000.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.max, 0.1)
+        # Buckets are 2 ** (1/4) (~19%) wide
+        self.assertAlmostEqual(histogram.percentile(50), 0.05, delta=0.01)
+        self.assertEqual(histogram.percentile(100), 0.1)
+        self.assertIn("ms |", histogram.format())
+
+    def test_empty(self):
+        self.assertEqual(LatencyHistogram().percentile(50), 0.0)
+
+
+class RunLoadTest(IsolatedAsyncioTestCase):
+    async def test_in_process(self):
+        result = await run_load(
+            list(generate_messages(30, seed=1)), connections=3, window=4
+        )
+        self.assertEqual(result["messages"], 30)
+        self.assertEqual(result["codes"], {"AA": 30})
+        self.assertEqual(result["latency"].count, 30)
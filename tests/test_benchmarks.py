@@ -0,0 +1,92 @@
+import json
+import os
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from benchmarks import compare, import_time, memory, run
+
+
+class BenchmarksTest(TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def run_suite(self, name):
+        path = os.path.join(self.dir, name)
+        with redirect_stderr(StringIO()):
+            run.main(["--count", "5", "--repeat", "2", "-o", path])
+        with open(path) as f:
+            return path, json.load(f)
+
+    def test_run(self):
+        path, results = self.run_suite("results.json")
+        self.assertEqual(set(results["benchmarks"]), set(run.BENCHMARKS))
+        for result in results["benchmarks"].values():
+            self.assertEqual(len(result["samples"]), 2)
+            self.assertGreater(result["median"], 0)
+        self.assertEqual(results["metadata"]["count"], 5)
+
+    def test_selected(self):
+        results = run.run(["parse", "mllp_loopback"], count=3, repeat=1)
+        self.assertEqual(list(results["benchmarks"]), ["parse", "mllp_loopback"])
+
+    def test_missing_api(self):
+        run.benchmark("missing", requires=("hl7.no_such_api",))(run._parse)
+        try:
+            results = run.run(["parse", "missing"], count=3, repeat=1)
+        finally:
+            del run.BENCHMARKS["missing"], run.REQUIRES["missing"]
+        self.assertEqual(list(results["benchmarks"]), ["parse"])
+        self.assertEqual(results["skipped"], {"missing": "missing hl7.no_such_api"})
+        self.assertTrue(run._available("hl7.mllp.HL7StreamWriter.writemessage"))
+        self.assertFalse(run._available("hl7.no_such_module.parse"))
+
+    def test_compare(self):
+        baseline = {"benchmarks": {"parse": {"median": 1.0}, "gone": {"median": 1}}}
+        current = {"benchmarks": {"parse": {"median": 1.5}}}
+        rows, regressions = compare.compare(baseline, current)
+        self.assertEqual(rows, [("parse", 1.0, 1.5, 1.5)])
+        self.assertEqual(regressions, ["parse"])
+        self.assertEqual(compare.compare(current, baseline)[1], [])
+
+    def test_compare_main(self):
+        path, results = self.run_suite("baseline.json")
+        output = StringIO()
+        with redirect_stdout(output):
+            compare.main([path, path])
+        self.assertIn("parse", output.getvalue())
+
+        results["benchmarks"]["parse"]["median"] *= 2
+        slower = os.path.join(self.dir, "slower.json")
+        with open(slower, "w") as f:
+            json.dump(results, f)
+        with redirect_stdout(StringIO()), self.assertRaises(SystemExit):
+            compare.main([path, slower])
+
+    def test_memory(self):
+        path = os.path.join(self.dir, "memory.json")
+        with redirect_stderr(StringIO()):
+            memory.main(["--count", "5", "-o", path])
+        with open(path) as f:
+            results = json.load(f)
+        self.assertEqual(set(results["benchmarks"]), set(memory.workloads(5)))
+        for result in results["benchmarks"].values():
+            self.assertGreater(result["median"], 0)
+            self.assertGreater(result["sizeof"]["total"], result["input_bytes"])
+        output = StringIO()
+        with redirect_stdout(output):
+            compare.main([path, path])
+        self.assertIn("oru_500", output.getvalue())
+
+    def test_import_time(self):
+        results = import_time.run(["hl7"], repeat=1, budgets={"hl7": 60000})
+        result = results["benchmarks"]["hl7"]
+        self.assertGreater(result["median"], 0)
+        self.assertFalse(result["over_budget"])
+        with redirect_stderr(StringIO()), self.assertRaises(SystemExit):
+            import_time.main(["--repeat", "1", "--budget", "hl7=0"])
@@ -0,0 +1,145 @@
+import asyncio
+import gzip
+import io
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from hl7.mllp import open_hl7_connection
+from hl7.mllp.capture import (
+    CAPTURE_MAGIC,
+    CaptureRecord,
+    CaptureWriter,
+    read_capture,
+    replay,
+)
+from hl7.mllp.receiver import ReceiverStats, RotatingFileSink, start_receiver
+
+MESSAGE = b"MSH|^~\\&|GHH LAB|ELAB-3|GHH OE|BLDG4|200202150930||ORU^R01|CNTRL-3456|P|2.4\rPID|||555-44-4444\r"
+
+
+class CaptureFormatTest(TestCase):
+    def test_roundtrip(self):
+        f = io.BytesIO()
+        writer = CaptureWriter(f)
+        self.assertEqual(writer.write(b"one", 1, timestamp=10.5), 16 + 3)
+        writer.write(b"", 2, timestamp=11.0)
+        f.seek(0)
+        self.assertTrue(f.getvalue().startswith(CAPTURE_MAGIC))
+        self.assertEqual(
+            list(read_capture(f)),
+            [CaptureRecord(10.5, 1, b"one"), CaptureRecord(11.0, 2, b"")],
+        )
+
+    def test_append(self):
+        f = io.BytesIO()
+        CaptureWriter(f).write(b"one", 1, timestamp=1.0)
+        CaptureWriter(f).write(b"two", 1, timestamp=2.0)
+        f.seek(0)
+        self.assertEqual([r.block for r in read_capture(f)], [b"one", b"two"])
+
+    def test_repeated_magic(self):
+        first, second = io.BytesIO(), io.BytesIO()
+        CaptureWriter(first).write(b"one", 1, timestamp=1.0)
+        CaptureWriter(second).write(b"two", 1, timestamp=2.0)
+        f = io.BytesIO(first.getvalue() + second.getvalue())
+        self.assertEqual([r.block for r in read_capture(f)], [b"one", b"two"])
+
+    def test_append_gzip(self):
+        directory = mkdtemp()
+        self.addCleanup(rmtree, directory)
+        path = os.path.join(directory, "out.cap.gz")
+        for block in (b"one", b"two"):
+            with RotatingFileSink(path, compress=True, format="capture") as sink:
+                sink.write(block, 1)
+        with gzip.open(path) as f:
+            data = f.read()
+        self.assertEqual(data.count(CAPTURE_MAGIC), 1)
+        self.assertEqual(
+            [r.block for r in read_capture(io.BytesIO(data))], [b"one", b"two"]
+        )
+
+    def test_truncated(self):
+        f = io.BytesIO()
+        writer = CaptureWriter(f)
+        writer.write(b"one", 1, timestamp=1.0)
+        writer.write(b"two", 1, timestamp=2.0)
+        with self.assertLogs(level="WARNING"):
+            records = list(read_capture(io.BytesIO(f.getvalue()[:-1])))
+        self.assertEqual(records, [CaptureRecord(1.0, 1, b"one")])
+
+    def test_not_a_capture(self):
+        with self.assertRaises(ValueError):
+            list(read_capture(io.BytesIO(b"\x0bMSH|^~\\&|\x1c\r")))
+
+
+class CaptureReceiverTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    async def start(self, sink):
+        self.stats = ReceiverStats()
+        server = await start_receiver(sink, "127.0.0.1", 0, stats=self.stats)
+        return server, server.sockets[0].getsockname()[1]
+
+    async def send(self, port, blocks):
+        reader, writer = await open_hl7_connection("127.0.0.1", port)
+        for block in blocks:
+            writer.writeblock(block)
+            await writer.drain()
+            await asyncio.wait_for(reader.readblock(), 5)
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_capture(self):
+        sink = RotatingFileSink(self.dir + os.sep, format="capture", compress=True)
+        with sink:
+            server, port = await self.start(sink)
+            async with server:
+                await self.send(port, [MESSAGE])
+                await self.send(port, [MESSAGE, MESSAGE])
+        (filename,) = sink.files
+        self.assertTrue(filename.endswith(".cap.gz"))
+        with gzip.open(filename, "rb") as f:
+            records = list(read_capture(f))
+        self.assertEqual([r.block for r in records], [MESSAGE] * 3)
+        self.assertEqual([r.connection_id for r in records], [1, 2, 2])
+        self.assertLessEqual(records[0].timestamp, records[2].timestamp)
+
+    async def test_replay(self):
+        records = [
+            CaptureRecord(100.0, 7, MESSAGE),
+            CaptureRecord(100.2, 8, MESSAGE),
+            CaptureRecord(100.4, 7, MESSAGE),
+        ]
+        path = os.path.join(self.dir, "replayed.hl7")
+        with RotatingFileSink(path, format="capture") as sink:
+            server, port = await self.start(sink)
+            async with server:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                result = await replay(records, "127.0.0.1", port, speed=4)
+                elapsed = loop.time() - start
+        self.assertEqual(result["messages"], 3)
+        self.assertEqual(result["acks"], 3)
+        self.assertEqual(result["connections"], 2)
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertEqual(self.stats.connections, 2)
+        with open(path, "rb") as f:
+            replayed = list(read_capture(f))
+        self.assertEqual([r.block for r in replayed], [MESSAGE] * 3)
+        self.assertEqual(replayed[0].connection_id, replayed[2].connection_id)
+
+    async def test_replay_max_speed(self):
+        records = [CaptureRecord(float(i * 3600), 1, MESSAGE) for i in range(5)]
+        sink = RotatingFileSink(os.path.join(self.dir, "out.hl7"))
+        with sink:
+            server, port = await self.start(sink)
+            async with server:
+                result = await replay(records, "127.0.0.1", port, speed=None)
+        self.assertEqual(result["acks"], 5)
+        self.assertLess(result["seconds"], 5)
@@ -1,5 +1,10 @@
+import bz2
+import gzip
+import io
+import lzma
 import os
 import socket
+import time
 from argparse import Namespace
 from shutil import rmtree
 from tempfile import mkdtemp
@@ -8,7 +13,22 @@ from unittest.mock import Mock, patch
 
 import hl7
 from hl7 import __version__ as hl7_version
-from hl7.client import CR, EB, SB, MLLPClient, MLLPException, mllp_send
+from hl7.client import (
+    CR,
+    EB,
+    FF,
+    SB,
+    MLLPClient,
+    MLLPException,
+    MLLPFramer,
+    ack_code,
+    _percentile,
+    mllp_send,
+    read_loose,
+    read_stream,
+)
+
+THANKS = SB + b"thanks" + EB + CR
 
 
 class MLLPClientTest(TestCase):
@@ -32,43 +52,116 @@ class MLLPClientTest(TestCase):
         self.client.socket.close.assert_called_once_with()
 
     def test_send(self):
-        self.client.socket.recv.return_value = "thanks"
+        self.client.socket.recv.return_value = THANKS
 
         result = self.client.send("foobar\n")
-        self.assertEqual(result, "thanks")
+        self.assertEqual(result, THANKS)
 
         self.client.socket.sendall.assert_called_once_with("foobar\n")
         self.client.socket.recv.assert_called_once_with(4096)
 
     def test_send_message_unicode(self):
-        self.client.socket.recv.return_value = "thanks"
+        self.client.socket.recv.return_value = THANKS
 
         result = self.client.send_message("foobar")
-        self.assertEqual(result, "thanks")
+        self.assertEqual(result, THANKS)
 
         self.client.socket.sendall.assert_called_once_with(b"\x0bfoobar\x1c\x0d")
 
     def test_send_message_bytestring(self):
-        self.client.socket.recv.return_value = "thanks"
+        self.client.socket.recv.return_value = THANKS
 
         result = self.client.send_message(b"foobar")
-        self.assertEqual(result, "thanks")
+        self.assertEqual(result, THANKS)
 
         self.client.socket.sendall.assert_called_once_with(b"\x0bfoobar\x1c\x0d")
 
     def test_send_message_hl7_message(self):
-        self.client.socket.recv.return_value = "thanks"
+        self.client.socket.recv.return_value = THANKS
 
         message = hl7.parse(r"MSH|^~\&|GHH LAB|ELAB")
 
         result = self.client.send_message(message)
-        self.assertEqual(result, "thanks")
+        self.assertEqual(result, THANKS)
 
         self.client.socket.sendall.assert_called_once_with(
             b"\x0bMSH|^~\\&|GHH LAB|ELAB\r\x1c\x0d"
         )
 
+    def test_socket_options(self):
+        self.client.socket.setsockopt.assert_called_once_with(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+        )
+        self.assertFalse(self.client.socket.settimeout.called)
+
+    def test_socket_options_keepalive_timeout(self):
+        client = MLLPClient("localhost", 6666, timeout=5, nodelay=False, keepalive=True)
+        client.socket.settimeout.assert_called_with(5)
+        client.socket.setsockopt.assert_called_with(
+            socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1
+        )
+
+    def test_send_partial_response(self):
+        self.client.socket.recv.side_effect = [SB + b"tha", b"nks" + EB, CR]
+
+        result = self.client.send(b"foobar")
+        self.assertEqual(result, THANKS)
+        self.assertEqual(self.client.socket.recv.call_count, 3)
+
+    def test_send_merged_responses(self):
+        self.client.socket.recv.side_effect = [THANKS + SB + b"second" + EB + CR]
+
+        self.assertEqual(self.client.send(b"foo"), THANKS)
+        self.assertEqual(self.client.send(b"bar"), SB + b"second" + EB + CR)
+        self.client.socket.recv.assert_called_once_with(4096)
+
+    def test_send_connection_closed(self):
+        self.client.socket.recv.side_effect = [SB + b"tha", b""]
+
+        self.assertRaises(MLLPException, self.client.send, b"foobar")
+
+    def test_send_many(self):
+        self.client.socket.recv.side_effect = [
+            SB + b"ack1" + EB + CR + SB + b"ack2",
+            EB + CR + SB + b"ack3" + EB + CR,
+        ]
+
+        result = self.client.send_many(["one", b"two", "three"], window=2)
+        self.assertEqual(
+            result,
+            [SB + b"ack1" + EB + CR, SB + b"ack2" + EB + CR, SB + b"ack3" + EB + CR],
+        )
+        self.assertEqual(
+            [c[0][0] for c in self.client.socket.sendall.call_args_list],
+            [SB + b"one" + EB + CR, SB + b"two" + EB + CR, SB + b"three" + EB + CR],
+        )
+
+    def test_send_pipelined(self):
+        self.client.socket.recv.side_effect = [
+            SB + b"ack1" + EB + CR,
+            SB + b"ack2" + EB + CR + SB + b"ack3" + EB + CR,
+        ]
+        sent = []
+
+        def messages():
+            for message in (b"one", b"two", b"three"):
+                sent.append(message)
+                yield message
+
+        responses = self.client.send_pipelined(messages(), window=2)
+        self.assertEqual(next(responses), SB + b"ack1" + EB + CR)
+        # the third message is only taken once the first response is handled
+        self.assertEqual(sent, [b"one", b"two"])
+        self.assertEqual(
+            list(responses), [SB + b"ack2" + EB + CR, SB + b"ack3" + EB + CR]
+        )
+        self.assertEqual(sent, [b"one", b"two", b"three"])
+
+    def test_send_many_invalid_window(self):
+        self.assertRaises(ValueError, self.client.send_many, ["one"], window=0)
+
     def test_context_manager(self):
+        self.client.socket.recv.return_value = THANKS
         with MLLPClient("localhost", 6666) as client:
             client.send("hello world")
 
@@ -89,7 +182,7 @@ class MLLPSendTest(TestCase):
         # patch to avoid touching sys and socket
         self.socket_patch = patch("hl7.client.socket.socket")
         self.mock_socket = self.socket_patch.start()
-        self.mock_socket().recv.return_value = "thanks"
+        self.mock_socket().recv.return_value = THANKS
 
         self.stdout_patch = patch("hl7.client.stdout")
         self.mock_stdout = self.stdout_patch.start()
@@ -114,9 +207,12 @@ class MLLPSendTest(TestCase):
             loose=False,
             version=False,
             server="localhost",
+            connections=1,
+            window=1,
+            rate=None,
         )
 
-        self.options_patch = patch("hl7.client.argparse.ArgumentParser")
+        self.options_patch = patch("argparse.ArgumentParser")
         option_parser = self.options_patch.start()
         self.mock_options = Mock()
         option_parser.return_value = self.mock_options
@@ -143,11 +239,11 @@ class MLLPSendTest(TestCase):
 
         self.mock_socket().connect.assert_called_once_with(("localhost", 6661))
         self.mock_socket().sendall.assert_called_once_with(SB + b"foobar" + EB + CR)
-        self.mock_stdout.assert_called_once_with("thanks")
+        self.mock_stdout.assert_called_once_with(THANKS)
         self.assertFalse(self.mock_exit.called)
 
     def test_send_multiple(self):
-        self.mock_socket().recv.return_value = "thanks"
+        self.mock_socket().recv.return_value = THANKS
         self.write(SB + b"foobar" + EB + CR + SB + b"hello" + EB + CR)
 
         mllp_send()
@@ -166,6 +262,99 @@ class MLLPSendTest(TestCase):
 
         self.mock_socket().sendall.assert_called_once_with(SB + b"foobar" + EB + CR)
 
+    def test_send_compressed(self):
+        content = SB + b"foobar" + EB + CR + SB + b"hello" + EB + CR
+        for compress in (gzip.compress, lzma.compress, bz2.compress):
+            self.mock_socket().sendall.reset_mock()
+            self.write(compress(content))
+
+            mllp_send()
+
+            self.assertEqual(
+                [c[0][0] for c in self.mock_socket().sendall.call_args_list],
+                [SB + b"foobar" + EB + CR, SB + b"hello" + EB + CR],
+            )
+
+    def test_loose_compressed(self):
+        self.option_values.loose = True
+        self.write(gzip.compress(b"MSH|^~\\&|foo\r\nbar\r\n"))
+
+        mllp_send()
+
+        self.mock_socket().sendall.assert_called_once_with(
+            SB + b"MSH|^~\\&|foo\rbar" + EB + CR
+        )
+
+    def test_summary(self):
+        self.mock_socket().recv.return_value = (
+            SB + b"MSH|^~\\&|||||||ACK|1|P|2.3\rMSA|AA|1\r" + EB + CR
+        )
+        self.write((SB + b"foobar" + EB + CR) * 3)
+
+        mllp_send()
+
+        summary = self.mock_stderr().write.call_args[0][0]
+        self.assertIn("sent 3 messages", summary)
+        self.assertIn("ACK codes: AA=3", summary)
+        self.assertIn("ACK latency ms: p50=", summary)
+
+    def test_window(self):
+        self.option_values.window = 2
+        self.mock_socket().recv.return_value = THANKS + THANKS
+        self.write((SB + b"foobar" + EB + CR) * 3)
+
+        mllp_send()
+
+        self.assertEqual(self.mock_socket().sendall.call_count, 3)
+        # Two ACKs arrive in the first read
+        self.assertEqual(self.mock_socket().recv.call_count, 2)
+        self.assertEqual(self.mock_stdout.call_count, 3)
+
+    def test_connections(self):
+        self.option_values.connections = 3
+        self.write(b"".join(SB + b"%d" % i + EB + CR for i in range(10)))
+
+        mllp_send()
+
+        self.assertEqual(
+            sorted(c[0][0] for c in self.mock_socket().sendall.call_args_list),
+            sorted(SB + b"%d" % i + EB + CR for i in range(10)),
+        )
+        self.assertEqual(self.mock_stdout.call_count, 10)
+
+    def test_connections_error(self):
+        self.option_values.connections = 2
+        self.write(SB + b"foobar" + EB + CR + SB + b"stuff")
+
+        self.assertRaises(MLLPException, mllp_send)
+
+    def test_rate(self):
+        self.option_values.rate = 100
+        self.write((SB + b"foobar" + EB + CR) * 3)
+
+        start = time.monotonic()
+        mllp_send()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+        self.assertEqual(self.mock_socket().sendall.call_count, 3)
+
+    def test_invalid_window(self):
+        self.option_values.window = 0
+
+        mllp_send()
+
+        self.assertFalse(self.mock_socket().sendall.called)
+        self.mock_exit.assert_called_with(1)
+
+    def test_invalid_rate(self):
+        for rate in (0, -5):
+            self.option_values.rate = rate
+
+            mllp_send()
+
+            self.assertFalse(self.mock_socket().sendall.called)
+            self.mock_exit.assert_called_with(1)
+
     def test_quiet(self):
         self.option_values.verbose = False
 
@@ -173,6 +362,9 @@ class MLLPSendTest(TestCase):
 
         self.mock_socket().sendall.assert_called_once_with(SB + b"foobar" + EB + CR)
         self.assertFalse(self.mock_stdout.called)
+        # the summary still goes to stderr
+        summary = self.mock_stderr().write.call_args[0][0]
+        self.assertIn("sent 1 messages", summary)
 
     def test_port(self):
         self.option_values.port = 7890
@@ -232,7 +424,7 @@ class MLLPSendTest(TestCase):
 
     def test_loose_send_mutliple(self):
         self.option_values.loose = True
-        self.mock_socket().recv.return_value = "thanks"
+        self.mock_socket().recv.return_value = THANKS
         self.write(b"MSH|^~\\&|1\r\nOBX|1\r\nMSH|^~\\&|2\r\nOBX|2\r\n")
 
         mllp_send()
@@ -279,6 +471,92 @@ class MLLPSendTest(TestCase):
         self.assertFalse(self.mock_stdout.called)
 
 
+class PercentileTest(TestCase):
+    def test_nearest_rank(self):
+        self.assertEqual(_percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(_percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(_percentile([1, 2, 3, 4, 5], 95), 5)
+        self.assertEqual(_percentile([1, 2, 3, 4, 5], 0), 1)
+        self.assertEqual(_percentile([7], 99), 7)
+
+
+class MLLPFramerTest(TestCase):
+    def test_frames(self):
+        framer = MLLPFramer()
+        framer.feed(SB + b"one" + EB)
+        self.assertIsNone(framer.next_frame())
+        framer.feed(CR + SB + b"two" + EB + CR + SB)
+        self.assertEqual(framer.next_frame(), SB + b"one" + EB + CR)
+        self.assertEqual(framer.next_frame(), SB + b"two" + EB + CR)
+        self.assertIsNone(framer.next_frame())
+        self.assertEqual(framer.pending, SB)
+        self.assertEqual(len(framer), 1)
+
+    def test_multiple_terminators(self):
+        framer = MLLPFramer(terminators=(EB, FF))
+        framer.feed(b"one" + FF + b"two" + EB + b"three")
+        self.assertEqual(framer.next_frame(), b"one" + FF)
+        self.assertEqual(framer.next_frame(), b"two" + EB)
+        self.assertIsNone(framer.next_frame())
+        self.assertEqual(framer.pending, b"three")
+
+
+class ReadStreamTest(TestCase):
+    def test_large_message(self):
+        message = b"MSH|" + b"x" * 100000
+        stream = io.BytesIO(SB + message + EB + CR + SB + b"MSH|2" + EB + CR)
+        self.assertEqual(list(read_stream(stream)), [message, b"MSH|2"])
+
+    def test_read_size_grows(self):
+        message = b"x" * 10000
+        stream = Mock(wraps=io.BytesIO(SB + message + EB + CR))
+        self.assertEqual(list(read_stream(stream, read_size=100)), [message])
+        sizes = [c[0][0] for c in stream.read.call_args_list]
+        self.assertEqual(sizes[:4], [100, 200, 400, 800])
+
+    def test_form_feed(self):
+        stream = io.BytesIO(SB + b"one" + EB + CR + FF + SB + b"two" + CR + FF)
+        self.assertEqual(list(read_stream(stream)), [b"one", b"two"])
+
+    def test_not_terminated(self):
+        stream = io.BytesIO(SB + b"one" + EB + CR + SB + b"two")
+        messages = read_stream(stream)
+        self.assertEqual(next(messages), b"one")
+        self.assertRaises(MLLPException, next, messages)
+
+
+class ReadLooseTest(TestCase):
+    def test_chunked(self):
+        data = (
+            b"junk\r\n"
+            + SB
+            + b"MSH|^~\\&|1\r\nPID|1\r"
+            + b"\nOBX|1\n"
+            + EB
+            + CR
+            + FF
+            + b"MSH|^~\\&|2\r\n\r\n"
+        )
+        expected = [
+            b"MSH|^~\\&|junk",
+            b"MSH|^~\\&|1\rPID|1\rOBX|1",
+            b"MSH|^~\\&|2",
+        ]
+        for read_size in (1, 2, 7, 4096):
+            self.assertEqual(
+                list(read_loose(io.BytesIO(data), read_size=read_size)), expected
+            )
+
+
+class AckCodeTest(TestCase):
+    def test_ack_code(self):
+        self.assertEqual(
+            ack_code(SB + b"MSH|^~\\&|A\rMSA|AE|1|Error\r" + EB + CR), "AE"
+        )
+        self.assertEqual(ack_code(b"MSH|^~\\&|A\r\nMSA|CA\r"), "CA")
+        self.assertIsNone(ack_code(THANKS))
+
+
 class FakeStream:
     count = 0
 
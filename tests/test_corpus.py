@@ -0,0 +1,84 @@
+import base64
+import random
+from unittest import TestCase
+
+import hl7
+from hl7.testing import Corpus
+
+
+class CorpusTest(TestCase):
+    def test_reproducible(self):
+        self.assertEqual(Corpus(seed=1).messages(3), Corpus(seed=1).messages(3))
+        self.assertNotEqual(Corpus(seed=1).oru(), Corpus(seed=2).oru())
+
+    def test_adt(self):
+        msg = hl7.parse(Corpus(seed=1).adt(identifiers=25, next_of_kin=12))
+        self.assertEqual(str(msg.segment("MSH")[9]), "ADT^A01^ADT_A01")
+        self.assertEqual(len(msg.segment("PID")[3]), 25)
+        self.assertEqual(len(msg.segments("NK1")), 12)
+
+    def test_oru(self):
+        text = Corpus(seed=1).oru(observations=600, notes=0.5)
+        msg = hl7.parse(text)
+        self.assertEqual(str(msg), text)
+        obx = msg.segments("OBX")
+        self.assertEqual(len(obx), 600)
+        self.assertEqual({str(o[2]) for o in obx}, {"NM", "FT"})
+        notes = [msg.unescape(str(o[5])) for o in obx if str(o[2]) == "FT"]
+        self.assertTrue(any("|" in note for note in notes))
+
+    def test_orm(self):
+        msg = hl7.parse(Corpus(seed=1).orm(control_id="X1"))
+        self.assertEqual(str(msg.segment("MSH")[9]), "ORM^O01^ORM_O01")
+        self.assertEqual(str(msg["MSH.10"]), "X1")
+        self.assertEqual(str(msg["ORC.1"]), "NW")
+        self.assertTrue(str(msg["OBR.4.1.2"]))
+
+    def test_random_instance(self):
+        rnd = random.Random(1)
+        self.assertIs(Corpus(rnd).random, rnd)
+        self.assertEqual(
+            Corpus(random.Random(1)).messages(3), Corpus(seed=1).messages(3)
+        )
+
+    def test_attachments(self):
+        msg = hl7.parse(
+            Corpus(seed=1).oru(observations=1, attachments=2, attachment_size=1000)
+        )
+        attachments = [o for o in msg.segments("OBX") if str(o[2]) == "ED"]
+        self.assertEqual(len(attachments), 2)
+        self.assertEqual(str(attachments[0](5)(1)(4)), "Base64")
+        self.assertEqual(len(base64.b64decode(str(attachments[0](5)(1)(5)))), 1000)
+
+    def test_separators(self):
+        corpus = Corpus(seed=1, separators="#$*!@")
+        text = corpus.oru(observations=20, notes=1)
+        self.assertTrue(text.startswith("MSH#$*!@#"))
+        msg = hl7.parse(text)
+        self.assertEqual(str(msg), text)
+        self.assertEqual(str(msg["MSH.9.1.2"]), "R01")
+        self.assertIn("!.br!", text)
+
+    def test_escape(self):
+        corpus = Corpus(separators="#$*!@")
+        self.assertEqual(corpus.escape("a#b$c*d!e@f|g"), "a!F!b!S!c!R!d!E!e!T!f|g")
+
+    def test_invalid_separators(self):
+        with self.assertRaises(ValueError):
+            Corpus(separators="|^~\\")
+        with self.assertRaises(ValueError):
+            Corpus(separators="||~\\&")
+        with self.assertRaises(ValueError):
+            Corpus().message("XYZ")
+
+    def test_batch(self):
+        batch = hl7.parse_batch(Corpus(seed=1).batch(7, "ADT"))
+        self.assertEqual(len(batch), 7)
+        self.assertEqual(str(batch.trailer[1]), "7")
+
+    def test_file(self):
+        f = hl7.parse_file(Corpus(seed=1).file(3, 4, "ORU", observations=10))
+        self.assertEqual([len(batch) for batch in f], [4, 4, 4])
+        self.assertEqual(str(f.trailer[1]), "3")
+        control_ids = [str(m["MSH.10"]) for batch in f for m in batch]
+        self.assertEqual(len(set(control_ids)), 12)
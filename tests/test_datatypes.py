@@ -0,0 +1,111 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import TestCase
+
+import hl7
+from hl7.datatypes import CX, XPN, TypedSegment, _UTCOffset
+
+MESSAGE = (
+    "MSH|^~\\&|GHH LAB|ELAB-3|GHH OE|BLDG4|200202150930||ORU^R01|CNTRL-3456|P|2.4\r"
+    "PID|||555-44-4444^^^MR&1.2.3&ISO^MR~X1||EVERYWOMAN^EVE^E^^^^L||19620320|F\r"
+    "OBX|1|NM|1554-5^GLUCOSE||182.5|mg/dl|70_105|H|||F|||200202150730-0500\r"
+    "OBX|2|TM|TIME||0930|||||F\r"
+)
+
+
+class TypedTest(TestCase):
+    def setUp(self):
+        self.msg = hl7.parse(MESSAGE)
+
+    def test_number(self):
+        self.assertEqual(self.msg.typed("OBX.5", "NM"), 182.5)
+        self.assertEqual(self.msg.typed("OBX.5", Decimal), Decimal("182.5"))
+
+    def test_datetime(self):
+        self.assertEqual(self.msg.typed("MSH.7", "DTM"), datetime(2002, 2, 15, 9, 30))
+        self.assertEqual(
+            self.msg.typed("OBX.14", "TS"),
+            datetime(2002, 2, 15, 7, 30, tzinfo=_UTCOffset(-300)),
+        )
+        self.assertEqual(self.msg.typed("PID.7", "DT"), date(1962, 3, 20))
+
+    def test_time(self):
+        obx = self.msg.segments("OBX")(2)
+        self.assertEqual(obx.typed(5, "TM"), time(9, 30))
+        self.assertIsNone(self.msg.typed("OBX2.4", "TM"))
+        self.assertEqual(hl7.datatypes.CONVERTERS["TM"]("0930"), time(9, 30))
+        self.assertEqual(
+            hl7.datatypes.CONVERTERS["TM"]("093012.5+0100"),
+            time(9, 30, 12, 500000, tzinfo=_UTCOffset(60)),
+        )
+        with self.assertRaises(ValueError):
+            hl7.datatypes.CONVERTERS["TM"]("9")
+
+    def test_composite(self):
+        self.assertEqual(
+            self.msg.typed("PID.3", "CX"), CX("555-44-4444", "", "", "MR", "MR", "")
+        )
+        self.assertEqual(self.msg.typed("PID.3.2", "CX"), CX("X1", "", "", "", "", ""))
+        self.assertEqual(
+            self.msg.typed("PID.5", "XPN"),
+            XPN("EVERYWOMAN", "EVE", "E", "", "", "", "L"),
+        )
+        self.assertIsNone(self.msg.typed("PID.4", "CX"))
+        self.assertIsNone(self.msg.typed("PID.30", "XPN"))
+
+    def test_empty(self):
+        self.assertIsNone(self.msg.typed("PID.2", "NM"))
+        self.assertIsNone(self.msg.typed("PID.40", "DTM"))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.msg.typed("MSH.3", "NM")
+        with self.assertRaises(KeyError):
+            self.msg.typed("MSH.3", "XYZ")
+
+    def test_cached(self):
+        first = self.msg.typed("MSH.7", "DTM")
+        self.assertIs(self.msg.typed("MSH.7", "DTM"), first)
+        self.assertIs(self.msg.segment("MSH").typed(7, "DTM"), first)
+
+    def test_assign_clears_cache(self):
+        self.assertEqual(self.msg.typed("OBX.5", "NM"), 182.5)
+        self.msg["OBX.5"] = "7"
+        self.assertEqual(self.msg.typed("OBX.5", "NM"), 7.0)
+
+    def test_clear_typed(self):
+        obx = self.msg.segment("OBX")
+        self.assertEqual(obx.typed(5, "NM"), 182.5)
+        obx[5][0] = "8"
+        self.assertEqual(obx.typed(5, "NM"), 182.5)
+        obx.clear_typed()
+        self.assertEqual(obx.typed(5, "NM"), 8.0)
+
+    def test_unchanged(self):
+        self.msg.typed("OBX.5", "NM")
+        self.assertEqual(str(self.msg), MESSAGE)
+        self.assertEqual(self.msg, hl7.parse(MESSAGE))
+
+
+class TypedSegmentTest(TestCase):
+    def setUp(self):
+        self.msg = hl7.parse(MESSAGE)
+
+    def test_default_types(self):
+        pid = TypedSegment(self.msg.segment("PID"))
+        self.assertEqual(pid[3].id, "555-44-4444")
+        self.assertEqual(pid[5].given_name, "EVE")
+        self.assertEqual(pid[7], datetime(1962, 3, 20))
+        self.assertEqual(pid[8], "F")
+
+    def test_obx_value_type(self):
+        obx1, obx2 = (TypedSegment(obx) for obx in self.msg.segments("OBX"))
+        self.assertEqual(obx1[5], 182.5)
+        self.assertEqual(obx1.datatype(14), "DTM")
+        self.assertEqual(obx2[5], time(9, 30))
+
+    def test_types(self):
+        obx = TypedSegment(self.msg.segment("OBX"), {1: "NM"})
+        self.assertEqual(obx[1], 1.0)
+        self.assertEqual(obx[5], 182.5)
+        self.assertEqual(obx[14], "200202150730-0500")
@@ -1,7 +1,12 @@
 from datetime import datetime
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
-from hl7.datatypes import _UTCOffset, parse_datetime
+from hl7.datatypes import _UTCOffset, parse_datetime, parse_datetimes
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 
 class DatetimeTest(TestCase):
@@ -69,3 +74,52 @@ class DatetimeTest(TestCase):
         b = _UTCOffset(45)
         self.assertEqual(hash(a), hash(b))
         self.assertEqual(len({a, b}), 1)
+
+    def test_offset_interned(self):
+        a = parse_datetime("201403111412-0500")
+        b = parse_datetime("201403111413-0500")
+        self.assertIs(a.tzinfo, b.tzinfo)
+
+    def test_cached(self):
+        self.assertIs(
+            parse_datetime("20140311142533.1"), parse_datetime("20140311142533.1")
+        )
+
+    def test_parse_seconds_only_fraction(self):
+        self.assertEqual(
+            datetime(2014, 3, 11, 14, 25, 0, 300000), parse_datetime("201403111425.3")
+        )
+
+    def test_malformed_repeated(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                parse_datetime("201")
+
+
+class ParseDatetimesTest(TestCase):
+    values = ["20140311142533.1+0530", "", "19010213", "20140311142533.1+0530"]
+
+    def test_list(self):
+        self.assertEqual(
+            parse_datetimes(self.values),
+            [
+                datetime(2014, 3, 11, 14, 25, 33, 100000, tzinfo=_UTCOffset(330)),
+                None,
+                datetime(1901, 2, 13),
+                datetime(2014, 3, 11, 14, 25, 33, 100000, tzinfo=_UTCOffset(330)),
+            ],
+        )
+
+    @skipUnless(numpy, "NumPy is not installed")
+    def test_numpy(self):
+        dates, offsets = parse_datetimes(self.values, as_numpy=True)
+        self.assertEqual(dates.dtype, numpy.dtype("datetime64[us]"))
+        self.assertEqual(dates[0], numpy.datetime64("2014-03-11T14:25:33.100000"))
+        self.assertTrue(numpy.isnat(dates[1]))
+        self.assertEqual(dates[2], numpy.datetime64("1901-02-13T00:00:00"))
+        self.assertEqual(offsets.dtype, numpy.dtype("timedelta64[m]"))
+        self.assertEqual(offsets[0], numpy.timedelta64(330, "m"))
+        self.assertTrue(numpy.isnat(offsets[2]))
+        self.assertEqual(
+            (dates - offsets)[0], numpy.datetime64("2014-03-11T08:55:33.100000")
+        )
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+import hl7
+import hl7.mllp
+
+from .samples import sample_hl7
+
+NETWORK_MODULES = ("asyncio", "argparse", "socket")
+
+
+def imported_modules(code):
+    """Run `code` in a fresh interpreter and return the modules it imported"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))"]
+    )
+    return set(output.decode().split())
+
+
+class LazyImportTest(TestCase):
+    def test_import(self):
+        modules = imported_modules("import hl7")
+        self.assertFalse(modules & set(NETWORK_MODULES))
+        self.assertNotIn("hl7.containers", modules)
+
+    def test_parse(self):
+        modules = imported_modules(
+            "import hl7\nm = hl7.parse({0!r})\nm['PID.3']\nm.create_ack()".format(
+                sample_hl7
+            )
+        )
+        self.assertFalse(modules & set(NETWORK_MODULES))
+
+    def test_client(self):
+        modules = imported_modules("import hl7.client")
+        self.assertNotIn("argparse", modules)
+        self.assertNotIn("asyncio", modules)
+
+    def test_mllp(self):
+        modules = imported_modules("import hl7.mllp")
+        self.assertNotIn("asyncio", modules)
+        modules = imported_modules("import hl7.mllp\nhl7.mllp.HL7StreamReader")
+        self.assertIn("asyncio", modules)
+        self.assertNotIn("multiprocessing", modules)
+
+    def test_attributes(self):
+        self.assertIs(hl7.parse, hl7.parser.parse)
+        self.assertIs(hl7.Message, hl7.containers.Message)
+        self.assertIs(hl7.mllp.HL7StreamReader, hl7.mllp.streams.HL7StreamReader)
+        for name in hl7.__all__:
+            self.assertTrue(hasattr(hl7, name), name)
+        for name in hl7.mllp.__all__:
+            self.assertTrue(hasattr(hl7.mllp, name), name)
+        self.assertIn("parse", dir(hl7))
+        self.assertIn("client", dir(hl7))
+
+    def test_unknown(self):
+        with self.assertRaises(AttributeError):
+            hl7.does_not_exist
+        with self.assertRaises(AttributeError):
+            hl7.mllp.does_not_exist
+        with self.assertRaises(ImportError):
+            from hl7 import does_not_exist  # noqa: F401
@@ -0,0 +1,107 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import hl7
+from hl7 import instrument
+from hl7.instrument import ParseStats
+from hl7.mllp import open_hl7_connection, start_hl7_server
+
+from .samples import sample_batch, sample_hl7
+
+ESCAPED = "MSH|^~\\&|\rOBX|1|FT|||a\\F\\b\r"
+
+
+class InstrumentTest(TestCase):
+    def tearDown(self):
+        instrument.disable()
+
+    def test_disabled(self):
+        calls = []
+        instrument.enable(lambda *args: calls.append(args))
+        instrument.disable()
+        self.assertFalse(instrument.active)
+        hl7.parse(sample_hl7)
+        self.assertEqual(calls, [])
+
+    def test_callback(self):
+        calls = []
+        callback = lambda *args: calls.append(args)  # noqa: E731
+        instrument.enable(callback)
+        self.assertTrue(instrument.active)
+        msg = hl7.parse(sample_hl7.encode("utf-8"))
+        instrument.disable(callback)
+        self.assertFalse(instrument.active)
+        stages = {stage: count for stage, _, count in calls}
+        self.assertEqual(
+            set(stages),
+            {"decode", "plan", "segment_split", "field_split", "allocate", "parse"},
+        )
+        self.assertEqual(stages["decode"], len(sample_hl7.encode("utf-8")))
+        self.assertEqual(stages["segment_split"], len(msg))
+        self.assertEqual(stages["parse"], 1)
+        self.assertTrue(all(seconds >= 0 for _, seconds, _ in calls))
+
+    def test_unchanged(self):
+        with ParseStats():
+            msg = hl7.parse(sample_hl7)
+        self.assertEqual(msg, hl7.parse(sample_hl7))
+        self.assertEqual(str(msg), str(hl7.parse(sample_hl7)))
+        self.assertEqual(repr(msg), repr(hl7.parse(sample_hl7)))
+
+    def test_parse_stats(self):
+        with ParseStats() as stats:
+            hl7.parse(sample_hl7)
+            hl7.parse(sample_hl7)
+        self.assertFalse(instrument.active)
+        self.assertEqual(stats["parse"].calls, 2)
+        self.assertEqual(stats["parse"].count, 2)
+        self.assertGreater(stats["allocate"].count, stats["field_split"].calls)
+        self.assertIn("segment_split", str(stats))
+        self.assertEqual(stats.as_dict()["plan"]["calls"], 2)
+
+    def test_batch(self):
+        with ParseStats() as stats:
+            hl7.parse_batch(sample_batch)
+        self.assertEqual(stats["batch_split"].count, 1)
+        # the message and the BHS/BTS header
+        self.assertEqual(stats["parse"].calls, 2)
+
+    def test_unescape(self):
+        msg = hl7.parse(ESCAPED)
+        with ParseStats() as stats:
+            self.assertEqual(msg["OBX.5"], "a|b")
+            self.assertEqual(msg["OBX.2"], "FT")
+        self.assertEqual(stats["unescape"].calls, 1)
+
+    def test_nested(self):
+        with ParseStats() as outer:
+            with ParseStats() as inner:
+                hl7.parse(sample_hl7)
+            self.assertTrue(instrument.active)
+            hl7.parse(sample_hl7)
+        self.assertEqual(inner["parse"].calls, 1)
+        self.assertEqual(outer["parse"].calls, 2)
+
+
+class InstrumentStreamTest(IsolatedAsyncioTestCase):
+    async def test_readmessage(self):
+        received = asyncio.Event()
+
+        async def handle(reader, writer):
+            await reader.readmessage()
+            received.set()
+            writer.close()
+
+        server = await start_hl7_server(handle, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            message = hl7.parse(sample_hl7)
+            with ParseStats() as stats:
+                reader, writer = await open_hl7_connection("127.0.0.1", port)
+                writer.writemessage(message)
+                await writer.drain()
+                await asyncio.wait_for(received.wait(), 5)
+                writer.close()
+                await writer.wait_closed()
+        self.assertEqual(stats["decode"].calls, 1)
+        self.assertEqual(stats["parse"].calls, 1)
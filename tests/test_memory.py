@@ -0,0 +1,53 @@
+import sys
+from unittest import TestCase
+
+import hl7
+from hl7.memory import LEVELS
+
+from .samples import sample_file, sample_hl7
+
+
+class SizeofTest(TestCase):
+    def setUp(self):
+        self.msg = hl7.parse(sample_hl7)
+
+    def test_levels(self):
+        usage = hl7.sizeof(self.msg)
+        self.assertEqual(
+            set(usage.levels),
+            {"message", "segment", "field", "repetition", "component", "string"},
+        )
+        self.assertEqual(usage.total, sum(usage.levels.values()))
+        self.assertEqual(usage.counts["message"], 1)
+        self.assertEqual(usage.counts["segment"], len(self.msg))
+        self.assertGreater(usage.total, len(sample_hl7))
+        self.assertEqual(list(usage.as_dict()), ["total", "levels", "counts"])
+        self.assertTrue(set(usage.levels) <= set(LEVELS))
+
+    def test_shallow(self):
+        usage = self.msg.memory_usage(deep=False)
+        self.assertEqual(
+            usage.total, sys.getsizeof(self.msg) + sys.getsizeof(self.msg.__dict__)
+        )
+        self.assertEqual(list(usage.levels), ["message"])
+        self.assertLess(usage.total, self.msg.memory_usage().total)
+
+    def test_shared_counted_once(self):
+        usage = hl7.sizeof([self.msg, self.msg])
+        self.assertEqual(usage.counts["message"], 1)
+        self.assertEqual(
+            usage.total - usage.levels["other"], self.msg.memory_usage().total
+        )
+
+    def test_file(self):
+        usage = hl7.parse_file(sample_file).memory_usage()
+        self.assertEqual(usage.counts["file"], 1)
+        self.assertIn("batch", usage.levels)
+        self.assertIn("total", str(usage))
+
+    def test_typed_cache(self):
+        before = self.msg.memory_usage().total
+        self.msg.typed("MSH.7", "DTM")
+        usage = self.msg.memory_usage()
+        self.assertIn("other", usage.levels)
+        self.assertGreater(usage.total, before)
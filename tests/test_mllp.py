@@ -1,5 +1,6 @@
 import asyncio
 import asyncio.streams
+from concurrent.futures import ThreadPoolExecutor
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import create_autospec
 
@@ -16,10 +17,11 @@ class MLLPStreamWriterTest(IsolatedAsyncioTestCase):
         self.transport = create_autospec(asyncio.Transport)
 
     async def asyncSetUp(self):
+        self.reader = create_autospec(hl7.mllp.MLLPStreamReader)
         self.writer = hl7.mllp.MLLPStreamWriter(
             self.transport,
             create_autospec(asyncio.streams.StreamReaderProtocol),
-            create_autospec(hl7.mllp.MLLPStreamReader),
+            self.reader,
             asyncio.get_running_loop(),
         )
 
@@ -29,6 +31,32 @@ class MLLPStreamWriterTest(IsolatedAsyncioTestCase):
             START_BLOCK + b"foobar" + END_BLOCK + CARRIAGE_RETURN
         )
 
+    def test_writeblocks(self):
+        self.writer.writeblocks([b"foo", b"bar"])
+        self.transport.writelines.assert_called_once_with(
+            [
+                START_BLOCK,
+                b"foo",
+                END_BLOCK + CARRIAGE_RETURN,
+                START_BLOCK,
+                b"bar",
+                END_BLOCK + CARRIAGE_RETURN,
+            ]
+        )
+
+    def test_writeblocks_empty(self):
+        self.writer.writeblocks([])
+        self.assertFalse(self.transport.writelines.called)
+
+    async def test_sendblocks(self):
+        self.transport.is_closing.return_value = False
+        self.reader.exception.return_value = None
+        await self.writer.sendblocks((b"%d" % i for i in range(5)), batch_size=2)
+        self.assertEqual(
+            [len(c[0][0]) for c in self.transport.writelines.call_args_list],
+            [6, 6, 3],
+        )
+
 
 class MLLPStreamReaderTest(IsolatedAsyncioTestCase):
     def setUp(self):
@@ -66,6 +94,20 @@ class HL7StreamWriterTest(IsolatedAsyncioTestCase):
             START_BLOCK + message.encode() + END_BLOCK + CARRIAGE_RETURN
         )
 
+    def test_writemessages(self):
+        messages = ["MSH|^~\\&|A\r", "MSH|^~\\&|B\r"]
+        self.writer.writemessages(hl7.parse(m) for m in messages)
+        self.transport.writelines.assert_called_once_with(
+            [
+                START_BLOCK,
+                messages[0].encode(),
+                END_BLOCK + CARRIAGE_RETURN,
+                START_BLOCK,
+                messages[1].encode(),
+                END_BLOCK + CARRIAGE_RETURN,
+            ]
+        )
+
 
 class HL7StreamReaderTest(IsolatedAsyncioTestCase):
     def setUp(self):
@@ -79,3 +121,174 @@ class HL7StreamReaderTest(IsolatedAsyncioTestCase):
         )
         hl7_message = await self.reader.readmessage()
         self.assertEqual(str(hl7_message), str(hl7.parse(message)))
+
+    async def test_readmessage_inline_stats(self):
+        message = "MSH|^~\\&|LABADT|DH\r"
+        self.reader.feed_data(
+            START_BLOCK + message.encode() + END_BLOCK + CARRIAGE_RETURN
+        )
+        await self.reader.readmessage()
+        self.assertEqual(self.reader.inline_parses, 1)
+        self.assertEqual(self.reader.offloaded_parses, 0)
+        self.assertGreater(self.reader.inline_parse_time, 0)
+        self.assertEqual(
+            self.reader.max_inline_parse_time, self.reader.inline_parse_time
+        )
+
+    async def test_readmessage_offload(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        reader = hl7.mllp.HL7StreamReader(executor=executor, offload_threshold=20)
+        small = "MSH|^~\\&|A\r"
+        large = "MSH|^~\\&|LABADT|DH|EPICADT|DH\r"
+        for message in (small, large):
+            reader.feed_data(
+                START_BLOCK + message.encode() + END_BLOCK + CARRIAGE_RETURN
+            )
+        self.assertEqual(str(await reader.readmessage()), small)
+        self.assertEqual(str(await reader.readmessage()), large)
+        self.assertEqual(reader.inline_parses, 1)
+        self.assertEqual(reader.offloaded_parses, 1)
+
+
+class MLLPBufferedProtocolTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.blocks = []
+        self.protocol = hl7.mllp.MLLPBufferedProtocol(
+            lambda block, protocol: self.blocks.append(bytes(block)),
+            buffer_size=16,
+            limit=64,
+        )
+        self.transport = create_autospec(asyncio.Transport)
+        self.protocol.connection_made(self.transport)
+
+    def feed(self, data):
+        while data:
+            buf = self.protocol.get_buffer(-1)
+            n = min(len(buf), len(data))
+            buf[:n] = data[:n]
+            self.protocol.buffer_updated(n)
+            data = data[n:]
+
+    def test_blocks(self):
+        self.feed(
+            START_BLOCK
+            + b"foo"
+            + END_BLOCK
+            + CARRIAGE_RETURN
+            + START_BLOCK
+            + b"bar"
+            + END_BLOCK
+            + CARRIAGE_RETURN
+        )
+        self.assertEqual(self.blocks, [b"foo", b"bar"])
+
+    def test_split_terminator(self):
+        self.feed(START_BLOCK + b"foo" + END_BLOCK)
+        self.assertEqual(self.blocks, [])
+        self.feed(CARRIAGE_RETURN + START_BLOCK + b"b")
+        self.assertEqual(self.blocks, [b"foo"])
+        self.feed(b"ar" + END_BLOCK + CARRIAGE_RETURN)
+        self.assertEqual(self.blocks, [b"foo", b"bar"])
+
+    def test_buffer_compaction_and_growth(self):
+        messages = [b"x" * 10, b"y" * 40, b"z" * 5, b"w" * 60]
+        self.feed(
+            b"".join(START_BLOCK + m + END_BLOCK + CARRIAGE_RETURN for m in messages)
+        )
+        self.assertEqual(self.blocks, messages)
+
+    def test_limit(self):
+        with self.assertRaises(ValueError):
+            self.feed(START_BLOCK + b"x" * 100)
+
+    def test_invalid_block(self):
+        with self.assertRaises(hl7.mllp.InvalidBlockError):
+            self.feed(b"foo" + END_BLOCK + CARRIAGE_RETURN)
+
+    def test_write_block(self):
+        self.protocol.write_block(b"ack")
+        self.transport.writelines.assert_called_once_with(
+            (START_BLOCK, b"ack", END_BLOCK + CARRIAGE_RETURN)
+        )
+
+    async def test_server(self):
+        loop = asyncio.get_running_loop()
+
+        def on_block(block, protocol):
+            protocol.write_block(bytes(block).upper())
+
+        server = await loop.create_server(
+            lambda: hl7.mllp.MLLPBufferedProtocol(on_block), "127.0.0.1", 0
+        )
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await hl7.mllp.open_hl7_connection("127.0.0.1", port)
+            writer.writeblock(b"hello")
+            await writer.drain()
+            self.assertEqual(await reader.readblock(), b"HELLO")
+            writer.close()
+            await writer.wait_closed()
+
+
+class HL7StreamReaderBatchTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.reader = hl7.mllp.HL7StreamReader()
+
+    def feed(self, *ids):
+        for id in ids:
+            message = "MSH|^~\\&|||||||ADT^A01|{0}|P|2.3\r".format(id)
+            self.reader.feed_data(
+                START_BLOCK + message.encode() + END_BLOCK + CARRIAGE_RETURN
+            )
+
+    def ids(self, messages):
+        return [str(m["MSH.10"]) for m in messages]
+
+    async def test_async_iteration(self):
+        self.feed("1", "2")
+        self.reader.feed_eof()
+        self.assertEqual(self.ids([m async for m in self.reader]), ["1", "2"])
+
+    async def test_async_iteration_partial(self):
+        self.feed("1")
+        self.reader.feed_data(START_BLOCK + b"MSH")
+        self.reader.feed_eof()
+        with self.assertRaises(asyncio.IncompleteReadError):
+            async for _ in self.reader:
+                pass
+
+    async def test_readmessages_buffered(self):
+        self.feed("1", "2", "3")
+        self.assertEqual(self.ids(await self.reader.readmessages(2)), ["1", "2"])
+        self.assertEqual(self.ids(await self.reader.readmessages(2)), ["3"])
+
+    async def test_readmessages_waits_for_delay(self):
+        self.feed("1")
+        asyncio.get_running_loop().call_later(0.01, self.feed, "2")
+        messages = await self.reader.readmessages(5, max_delay=0.2)
+        self.assertEqual(self.ids(messages[:2]), ["1", "2"])
+
+    async def test_readmessages_partial_block_kept(self):
+        self.feed("1")
+        message = START_BLOCK + b"MSH|^~\\&|||||||ADT^A01|2|P|2.3\r"
+        self.reader.feed_data(message[:10])
+        self.assertEqual(
+            self.ids(await self.reader.readmessages(5, max_delay=0.01)), ["1"]
+        )
+        self.reader.feed_data(message[10:] + END_BLOCK + CARRIAGE_RETURN)
+        self.assertEqual(self.ids(await self.reader.readmessages(5)), ["2"])
+
+    async def test_readmessages_invalid_block(self):
+        self.feed("1")
+        self.reader.feed_data(b"garbage" + END_BLOCK + CARRIAGE_RETURN)
+        self.feed("2")
+        # the message read before the invalid block is returned
+        self.assertEqual(self.ids(await self.reader.readmessages(5)), ["1"])
+        with self.assertRaises(hl7.mllp.InvalidBlockError):
+            await self.reader.readmessages(5)
+        self.assertEqual(self.ids(await self.reader.readmessages(5)), ["2"])
+
+    async def test_readmessages_eof(self):
+        self.reader.feed_eof()
+        self.assertEqual(await self.reader.readmessages(5), [])
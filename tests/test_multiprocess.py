@@ -0,0 +1,56 @@
+import asyncio
+import socket
+from unittest import TestCase, skipUnless
+
+import hl7
+from hl7.mllp import HL7ServerPool, open_hl7_connection
+
+MESSAGE = (
+    "MSH|^~\\&|GHH LAB|ELAB-3|GHH OE|BLDG4|200202150930||ORU^R01|CNTRL-3456|P|2.4\r"
+)
+
+
+async def ack_handler(reader, writer):
+    try:
+        while True:
+            message = await reader.readmessage()
+            writer.writemessage(message.create_ack())
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not supported")
+class HL7ServerPoolTest(TestCase):
+    def test_serve(self):
+        port = free_port()
+
+        async def send():
+            acks = []
+            for _ in range(3):
+                reader, writer = await open_hl7_connection("127.0.0.1", port)
+                writer.writemessage(hl7.parse(MESSAGE))
+                await writer.drain()
+                acks.append(await asyncio.wait_for(reader.readmessage(), 10))
+                writer.close()
+                await writer.wait_closed()
+            return acks
+
+        with HL7ServerPool(
+            ack_handler, "127.0.0.1", port, workers=2, shutdown_timeout=1
+        ) as pool:
+            acks = asyncio.run(send())
+
+        self.assertFalse(pool.is_alive())
+        self.assertEqual([str(ack.segment("MSA")(1)) for ack in acks], ["AA"] * 3)
+        stats = pool.stats()
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(stats["connections"], 3)
+        self.assertEqual(stats["messages"], 3)
+        self.assertEqual(len(stats["per_worker"]), 2)
@@ -229,6 +229,58 @@ class ParseTest(TestCase):
         obj = hl7.parse_hl7(sample_file2)
         self.assertIsInstance(obj, hl7.File)
 
+    def test_parse_classified(self):
+        def outcome(function, text, **kwargs):
+            try:
+                parsed = function(text, **kwargs)
+            except ParseException as e:
+                return e.args
+            return (
+                str(parsed),
+                parsed,
+                getattr(parsed, "header", None),
+                getattr(parsed, "trailer", None),
+            )
+
+        samples = [
+            sample_batch,
+            sample_batch1,
+            sample_batch2,
+            sample_batch3,
+            sample_batch4,
+            sample_bad_batch,
+            sample_bad_batch1,
+            sample_file,
+            sample_file1,
+            sample_file2,
+            sample_file3,
+            sample_file4,
+            sample_file5,
+            sample_file6,
+            sample_bad_file,
+            sample_bad_file1,
+            sample_bad_file2,
+            sample_bad_file3,
+        ]
+        # Irregular line breaks and whitespace are split line by line
+        samples += [sample.replace("\r", "\r\n") for sample in samples[:2]]
+        samples += [sample.replace("\rPID", "\r  PID") for sample in samples[:2]]
+        samples += ["\r" + sample_batch, " \n" + sample_file + "\r\n"]
+        samples += [sample_batch + "\r \r", sample_file1 + "\r\n"]
+        for text in samples:
+            classification = hl7.classify(text)
+            for function in (hl7.parse_batch, hl7.parse_file):
+                self.assertEqual(
+                    outcome(function, text, classification=classification),
+                    outcome(function, text),
+                    repr(text),
+                )
+        classification = hl7.classify(sample_hl7)
+        self.assertEqual(
+            hl7.parse(sample_hl7, classification=classification),
+            hl7.parse(sample_hl7),
+        )
+
     def test_bytestring_converted_to_unicode(self):
         msg = hl7.parse(str(sample_hl7))
         self.assertEqual(len(msg), 5)
@@ -0,0 +1,140 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import Mock, patch
+
+import hl7
+from hl7.client import MLLPClient
+from hl7.mllp import open_hl7_connection
+from hl7.mllp.receiver import start_receiver
+from hl7.queue import DeliveryError, OutboundQueue
+
+MESSAGE = "MSH|^~\\&|GHH LAB|ELAB-3|GHH OE|BLDG4|200202150930||ORU^R01|CNTRL-{0}|P|2.4\rPID|||555-44-4444\r"
+
+
+def ack(code):
+    return b"\x0bMSH|^~\\&|||||||ACK||P|2.4\rMSA|" + code.encode() + b"|1\r\x1c\r"
+
+
+class MemorySink:
+    def __init__(self):
+        self.blocks = []
+
+    def write(self, block, connection_id=0):
+        self.blocks.append(bytes(block))
+
+
+class OutboundQueueTest(TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.path = os.path.join(self.dir, "outbound.db")
+        self.queue = OutboundQueue(self.path)
+
+    def tearDown(self):
+        self.queue.close()
+        rmtree(self.dir)
+
+    def client(self, codes):
+        with patch("hl7.client.socket.socket"):
+            client = MLLPClient("localhost", 6661)
+        client.read_response = Mock(side_effect=[ack(code) for code in codes])
+        return client
+
+    def test_enqueue(self):
+        messages = [b"one", "two", hl7.parse(MESSAGE.format(3))]
+        self.assertEqual(self.queue.enqueue_many(messages), 3)
+        self.queue.enqueue("four")
+        self.assertEqual(len(self.queue), 4)
+        self.assertEqual(
+            [message for _, message, _ in self.queue.peek(10)][:2], [b"one", b"two"]
+        )
+
+    def test_persistent(self):
+        self.queue.enqueue_many(["one", "two"])
+        self.queue.close()
+        self.queue = OutboundQueue(self.path)
+        self.assertEqual(len(self.queue), 2)
+        mode = self.queue.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_drain(self):
+        self.queue.enqueue_many([MESSAGE.format(i) for i in range(5)])
+        client = self.client(["AA"] * 5)
+        self.assertEqual(self.queue.drain_client(client, window=2, batch_size=2), 5)
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(client.socket.sendall.call_count, 5)
+
+    def test_drain_rejected(self):
+        self.queue.enqueue_many([MESSAGE.format(i) for i in range(5)])
+        client = self.client(["AA", "AE", "AA", "AA"])
+        with self.assertRaises(DeliveryError) as cm:
+            self.queue.drain_client(client, window=3)
+        self.assertEqual(cm.exception.ack_code, "AE")
+        # the messages in flight are read, no more messages are sent
+        self.assertEqual(client.socket.sendall.call_count, 4)
+        rows = self.queue.peek(10)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][0], cm.exception.message_id)
+        self.assertEqual([attempts for _, _, attempts in rows], [1, 0])
+
+    def test_drain_connection_lost(self):
+        self.queue.enqueue_many([MESSAGE.format(i) for i in range(3)])
+        client = self.client([])
+        client.read_response.side_effect = [ack("AA"), hl7.client.MLLPException()]
+        with self.assertRaises(hl7.client.MLLPException):
+            self.queue.drain_client(client, window=1)
+        self.assertEqual(len(self.queue), 2)
+
+    def test_drain_connects(self):
+        self.queue.enqueue("one")
+        with patch("hl7.queue.MLLPClient") as mock_client:
+            client = mock_client.return_value.__enter__.return_value
+            client.send_pipelined.side_effect = lambda messages, window: (
+                ack("AA") for _ in messages
+            )
+            self.assertEqual(self.queue.drain("localhost", 6661, timeout=5), 1)
+        mock_client.assert_called_once_with(
+            "localhost", 6661, encoding="utf-8", timeout=5
+        )
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            self.queue.drain_client(self.client([]), window=0)
+
+
+class OutboundQueueAsyncTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.queue = OutboundQueue(os.path.join(self.dir, "outbound.db"))
+
+    def tearDown(self):
+        self.queue.close()
+        rmtree(self.dir)
+
+    async def drain(self, ack_code):
+        sink = MemorySink()
+        server = await start_receiver(sink, "127.0.0.1", 0, ack_code=ack_code)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await open_hl7_connection("127.0.0.1", port)
+            try:
+                return sink, await self.queue.drain_async(reader, writer, window=8)
+            finally:
+                writer.close()
+                await writer.wait_closed()
+
+    async def test_drain(self):
+        messages = [MESSAGE.format(i) for i in range(20)]
+        self.queue.enqueue_many(messages)
+        sink, delivered = await self.drain("AA")
+        self.assertEqual(delivered, 20)
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(sink.blocks, [m.encode() for m in messages])
+
+    async def test_drain_rejected(self):
+        self.queue.enqueue_many([MESSAGE.format(i) for i in range(20)])
+        with self.assertRaises(DeliveryError):
+            await self.drain("AR")
+        self.assertEqual(len(self.queue), 20)
+        self.assertEqual(self.queue.peek()[0][2], 1)
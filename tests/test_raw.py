@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+import hl7
+from hl7.exceptions import ParseException
+from hl7.raw import parse_raw, raw_extract, raw_field, raw_segments
+from hl7.testing import Corpus
+
+from .samples import sample_hl7
+
+MESSAGE = "MSH|^~\\&|A|B\rPID|1||a~b^c&d~^x||e&f|g^h\rOBX|1\rOBX|2|||\\F\\\r"
+
+
+class ParseRawTest(TestCase):
+    def test_structure(self):
+        raw = parse_raw(MESSAGE)
+        self.assertEqual(raw[0], ["MSH", "|", "^~\\&", "A", "B"])
+        self.assertEqual(
+            raw[1],
+            [
+                "PID",
+                "1",
+                "",
+                ["a", ["b", ["c", "d"]], ["", "x"]],
+                "",
+                [[["e", "f"]]],
+                [["g", "h"]],
+            ],
+        )
+        self.assertEqual(raw[3], ["OBX", "2", "", "", "\\F\\"])
+        self.assertIs(type(raw), list)
+        self.assertIs(type(raw[1][3]), list)
+
+    def test_bytes(self):
+        self.assertEqual(parse_raw(MESSAGE.encode("utf-8")), parse_raw(MESSAGE))
+
+    def test_separators(self):
+        raw = parse_raw("MSH#$*!@#A\rPID#1#a*b$c@d\r")
+        self.assertEqual(raw[0][:3], ["MSH", "#", "$*!@"])
+        self.assertEqual(raw[1][2], ["a", ["b", ["c", "d"]]])
+
+    def test_not_hl7(self):
+        with self.assertRaises(ParseException):
+            parse_raw("PID|1")
+
+    def test_segments(self):
+        raw = parse_raw(MESSAGE)
+        self.assertEqual([s[1] for s in raw_segments(raw, "OBX")], ["1", "2"])
+        with self.assertRaises(KeyError):
+            raw_segments(raw, "ZZZ")
+
+    def test_field(self):
+        pid = parse_raw(MESSAGE)[1]
+        self.assertEqual(raw_field(pid, 1), "1")
+        self.assertEqual(raw_field(pid, 3, 2, 2, 2), "d")
+        self.assertEqual(raw_field(pid, 3, 2, 2), "c")
+        self.assertEqual(raw_field(pid, 3, 3, 2), "x")
+        self.assertEqual(raw_field(pid, 3, 1, 2), "")
+        self.assertEqual(raw_field(pid, 30), "")
+        with self.assertRaises(IndexError):
+            raw_field(pid, 1, 1, 2)
+        with self.assertRaises(IndexError):
+            raw_field(pid, 30, 2)
+
+    def test_extract(self):
+        raw = parse_raw(MESSAGE)
+        self.assertEqual(raw_extract(raw, "PID.5.1.1.2"), "f")
+        self.assertEqual(raw_extract(raw, "OBX2.4"), "\\F\\")
+        self.assertEqual(raw_extract(raw, hl7.Accessor("MSH", 1, 2)), "^~\\&")
+
+    def test_same_as_extract_field(self):
+        for text in (sample_hl7, MESSAGE, Corpus(seed=1).adt(identifiers=3)):
+            msg = hl7.parse(text)
+            raw = parse_raw(text)
+            self.assertEqual(len(raw), len(msg))
+            for segment in msg:
+                key = str(segment[0])
+                for field_num in range(1, len(segment) + 1):
+                    for repeat_num in (1, 2):
+                        for component_num in (1, 2, 3):
+                            accessor = hl7.Accessor(
+                                key, 1, field_num, repeat_num, component_num
+                            )
+                            try:
+                                expected = msg.extract_field(*accessor)
+                            except IndexError:
+                                with self.assertRaises(IndexError):
+                                    raw_extract(raw, accessor)
+                                continue
+                            value = raw_extract(raw, accessor)
+                            if not (key == "MSH" and field_num in (1, 2)):
+                                value = msg.unescape(value)
+                            self.assertEqual(value, expected)
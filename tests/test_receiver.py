@@ -0,0 +1,165 @@
+import asyncio
+import gzip
+import os
+import socket
+from argparse import Namespace
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import hl7
+from hl7.mllp import open_hl7_connection
+from hl7.mllp.receiver import (
+    ReceiverStats,
+    RotatingFileSink,
+    _receive,
+    _sync_periodically,
+    start_receiver,
+)
+
+START_BLOCK = b"\x0b"
+END_BLOCK = b"\x1c"
+CARRIAGE_RETURN = b"\x0d"
+
+MESSAGE = "MSH|^~\\&|GHH LAB|ELAB-3|GHH OE|BLDG4|200202150930||ORU^R01|CNTRL-3456|P|2.4\rPID|||555-44-4444\r"
+
+
+def framed(block):
+    return START_BLOCK + block + END_BLOCK + CARRIAGE_RETURN
+
+
+class RotatingFileSinkTest(TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def test_file(self):
+        path = os.path.join(self.dir, "out.hl7")
+        with RotatingFileSink(path) as sink:
+            sink.write(b"one")
+            sink.write(b"two")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), framed(b"one") + framed(b"two"))
+
+    def test_rotation(self):
+        with RotatingFileSink(self.dir, max_bytes=10) as sink:
+            for block in (b"one", b"two", b"three"):
+                sink.write(block)
+        self.assertEqual(len(sink.files), 2)
+        contents = []
+        for filename in sink.files:
+            with open(filename, "rb") as f:
+                contents.append(f.read())
+        self.assertEqual(contents, [framed(b"one") + framed(b"two"), framed(b"three")])
+
+    def test_gzip(self):
+        with RotatingFileSink(self.dir + os.sep, compress=True) as sink:
+            sink.write(b"one")
+            sink.sync()
+            sink.write(b"two")
+        (filename,) = sink.files
+        self.assertTrue(filename.endswith(".hl7.gz"))
+        with gzip.open(filename) as f:
+            self.assertEqual(f.read(), framed(b"one") + framed(b"two"))
+
+    def test_fsync_interval(self):
+        path = os.path.join(self.dir, "out.hl7")
+        with RotatingFileSink(path, fsync_count=1000, fsync_interval=3600) as sink:
+            sink.write(b"one")
+            sink.write(b"two")
+            self.assertEqual(sink._unsynced, 2)
+            # Synced by the next write once the interval has passed
+            sink.fsync_interval = 0
+            sink.write(b"three")
+            self.assertEqual(sink._unsynced, 0)
+
+    def test_no_sync_on_write(self):
+        path = os.path.join(self.dir, "out.hl7")
+        with RotatingFileSink(path, fsync_count=2, sync_on_write=False) as sink:
+            sink.write(b"one")
+            self.assertFalse(sink.sync_due)
+            sink.write(b"two")
+            self.assertTrue(sink.sync_due)
+            self.assertEqual(sink._unsynced, 2)
+            asyncio.run(sink.sync_async())
+            self.assertFalse(sink.sync_due)
+            self.assertEqual(sink._unsynced, 0)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), framed(b"one") + framed(b"two"))
+
+
+class ReceiverTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    async def test_receive(self):
+        path = os.path.join(self.dir, "out.hl7")
+        stats = ReceiverStats()
+        with RotatingFileSink(path) as sink:
+            server = await start_receiver(
+                sink, "127.0.0.1", 0, ack_code="AE", stats=stats
+            )
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await open_hl7_connection("127.0.0.1", port)
+                writer.writemessages([hl7.parse(MESSAGE)] * 2)
+                await writer.drain()
+                acks = [
+                    await asyncio.wait_for(reader.readmessage(), 5) for _ in range(2)
+                ]
+                writer.close()
+                await writer.wait_closed()
+        self.assertEqual([str(ack["MSA.1"]) for ack in acks], ["AE", "AE"])
+        self.assertEqual(str(acks[0]["MSA.2"]), "CNTRL-3456")
+        self.assertEqual(stats.messages, 2)
+        self.assertEqual(stats.connections, 1)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), framed(MESSAGE.encode()) * 2)
+
+    async def test_sync_periodically(self):
+        path = os.path.join(self.dir, "out.hl7")
+        with RotatingFileSink(path, fsync_count=1000, fsync_interval=0.05) as sink:
+            sink.write(b"one")
+            self.assertEqual(sink._unsynced, 1)
+            syncer = asyncio.ensure_future(_sync_periodically(sink, 0.05))
+            await asyncio.sleep(0.2)
+            syncer.cancel()
+            self.assertEqual(sink._unsynced, 0)
+
+    async def test_shutdown_with_idle_connection(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        options = Namespace(
+            host="127.0.0.1",
+            port=port,
+            ack="AA",
+            encoding="ascii",
+            fsync_interval=1.0,
+            stats_interval=3600,
+            verbose=False,
+        )
+        stop = asyncio.Event()
+        with RotatingFileSink(os.path.join(self.dir, "out.hl7")) as sink:
+            receiving = asyncio.ensure_future(_receive(options, sink, stop))
+            for _ in range(50):
+                try:
+                    reader, writer = await open_hl7_connection("127.0.0.1", port)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.02)
+            writer.writemessage(hl7.parse(MESSAGE))
+            await writer.drain()
+            await asyncio.wait_for(reader.readmessage(), 5)
+            # The connection stays open, idle, while the receiver stops
+            stop.set()
+            stats = await asyncio.wait_for(receiving, 5)
+            self.assertEqual(await asyncio.wait_for(reader.read(), 5), b"")
+            writer.close()
+        self.assertEqual(stats.messages, 1)
+        self.assertEqual(stats.connections, 1)
@@ -1,4 +1,9 @@
-from unittest import TestCase
+import io
+import mmap
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, skipUnless
 
 import hl7
 
@@ -56,3 +61,174 @@ class IsHL7Test(TestCase):
         self.assertTrue(hl7.isfile(sample_batch))
         self.assertTrue(hl7.isfile(sample_batch1))
         self.assertTrue(hl7.isfile(sample_batch2))
+
+
+class ClassifyTest(TestCase):
+    def test_classify(self):
+        self.assertEqual(hl7.classify(sample_hl7).kind, "message")
+        self.assertEqual(hl7.classify(sample_msh).kind, "message")
+        for batch in (sample_batch, sample_batch1, sample_batch2):
+            self.assertEqual(hl7.classify(batch).kind, "batch")
+        for file in (sample_file, sample_file1, sample_file2):
+            self.assertEqual(hl7.classify(file).kind, "file")
+
+    def test_not_hl7(self):
+        self.assertEqual(hl7.classify(""), (None, 0, 0, ()))
+        self.assertEqual(hl7.classify(None), (None, 0, 0, ()))
+        self.assertIsNone(hl7.classify(" \r\n").kind)
+        self.assertIsNone(hl7.classify("OBX|1|SN\r").kind)
+        self.assertIsNone(hl7.classify("MSH\r\n").kind)
+
+    def test_offsets(self):
+        message = "MSH|^~\\&|A\rOBX|1|ST|MSH text\r"
+        self.assertEqual(hl7.classify(message), ("message", 0, len(message) - 1, (0,)))
+        self.assertEqual(
+            hl7.classify("\n " + message + message + " \n"),
+            ("batch", 2, 1 + 2 * len(message), (2, 2 + len(message))),
+        )
+        # Like ishl7, only a header after a carriage return is a new message
+        self.assertEqual(
+            hl7.classify("MSH|^~\\&|A\nMSH|^~\\&|B\r"), ("message", 0, 21, (0, 11))
+        )
+
+    def test_envelope_offsets(self):
+        text = "FHS|^~\\&\rBHS|^~\\&\rMSH|^~\\&|A\rPID|BTS\rBTS|1\rFTS|1\r"
+        classification = hl7.classify(text)
+        self.assertEqual(classification.kind, "file")
+        self.assertEqual(
+            [text[offset : offset + 3] for offset in classification.offsets],
+            ["FHS", "BHS", "MSH", "BTS", "FTS"],
+        )
+        self.assertEqual(text[classification.start : classification.end], text.strip())
+
+    def test_matches_ishl7_isbatch_isfile(self):
+        samples = [
+            sample_hl7,
+            sample_msh,
+            sample_batch,
+            sample_batch1,
+            sample_batch2,
+            sample_file,
+            sample_file1,
+            sample_file2,
+            "MSH|^~\\&|\rOBX|MSH\r",
+            "MSH|^~\\&|\rMSH^~\\&|\r",
+            "  FHS|^~\\&|\rMSH|^~\\&|\rMSH|^~\\&|\r",
+            "BHS",
+            "MSHMSH",
+        ]
+        for text in samples:
+            if hl7.ishl7(text):
+                expected = "message"
+            elif hl7.isbatch(text):
+                expected = "batch"
+            elif hl7.isfile(text):
+                expected = "file"
+            else:
+                expected = None
+            self.assertEqual(hl7.classify(text).kind, expected, repr(text))
+
+
+class IterSplitTest(TestCase):
+    def test_split_file(self):
+        messages = hl7.split_file(sample_file2)
+        self.assertEqual(len(messages), 2)
+        for message in messages:
+            self.assertEqual(message[:3], "MSH")
+            self.assertEqual(message[-1], "\r")
+        self.assertEqual(list(hl7.iter_split(sample_file2)), messages)
+
+    def test_lazy(self):
+        messages = hl7.iter_split(sample_batch)
+        self.assertEqual(next(messages)[:3], "MSH")
+
+    def test_bytes(self):
+        expected = [m.encode() for m in hl7.split_file(sample_file2)]
+        self.assertEqual(list(hl7.iter_split(sample_file2.encode())), expected)
+
+    def test_file_objects(self):
+        expected = hl7.split_file(sample_file2)
+        self.assertEqual(
+            list(hl7.iter_split(io.StringIO(sample_file2, newline=""), chunk_size=7)),
+            expected,
+        )
+        self.assertEqual(
+            list(hl7.iter_split(io.BytesIO(sample_file2.encode()), chunk_size=7)),
+            [m.encode() for m in expected],
+        )
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(sample_file2.encode())
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                messages = list(hl7.iter_split(m))
+        self.assertEqual(messages, [m.encode() for m in hl7.split_file(sample_file2)])
+
+    def test_segment_before_header(self):
+        with self.assertLogs(level="ERROR"):
+            messages = list(hl7.iter_split(b"PID|1\rMSH|^~\\&|\rPID|2"))
+        self.assertEqual(messages, [b"MSH|^~\\&|\rPID|2\r"])
+
+    def test_blank_lines(self):
+        self.assertEqual(
+            list(hl7.iter_split("MSH|^~\\&|\r\n\rPID|2\r\r")),
+            ["MSH|^~\\&|\r\rPID|2\r\r"],
+        )
+
+
+class ControlIdGeneratorTest(TestCase):
+    def test_format(self):
+        generate = hl7.util.ControlIdGenerator()
+        first, second = generate(), generate()
+        self.assertEqual(len(first), 20)
+        self.assertTrue(first.isalnum() and first.isupper())
+        self.assertEqual(first[:12], second[:12])
+        self.assertEqual(int(second[12:], 16), int(first[12:], 16) + 1)
+        self.assertEqual(len(hl7.generate_message_control_id()), 20)
+
+    def test_node(self):
+        self.assertEqual(hl7.util.ControlIdGenerator("W7")()[:4], "00W7")
+        with self.assertRaises(ValueError):
+            hl7.util.ControlIdGenerator("WORKER")
+
+    def test_batch(self):
+        generate = hl7.util.ControlIdGenerator()
+        ids = generate.batch(100)
+        self.assertEqual(len(set(ids)), 100)
+        self.assertEqual(generate(), ids[-1][:12] + "00000064")
+        self.assertEqual(generate.batch(0), [])
+
+    def test_threads(self):
+        generate = hl7.util.ControlIdGenerator()
+        with ThreadPoolExecutor(8) as executor:
+            batches = list(
+                executor.map(lambda _: [generate() for _ in range(500)], range(8))
+            )
+        ids = [id_ for batch in batches for id_ in batch]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_reseed(self):
+        generate = hl7.util.ControlIdGenerator()
+        generate.limit = 3
+        ids = generate.batch(2) + [generate(), generate()] + generate.batch(3)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertNotEqual(ids[0][:12], ids[3][:12])
+        self.assertNotEqual(ids[3][:12], ids[4][:12])
+        self.assertTrue(all(len(id_) == 20 for id_ in ids))
+
+    @skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_fork(self):
+        generate = hl7.util.ControlIdGenerator()
+        generate()
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os.write(write, generate().encode())
+            os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        child = os.read(read, 20).decode()
+        os.close(read)
+        self.assertEqual(len(child), 20)
+        self.assertNotEqual(child[:12], generate()[:12])